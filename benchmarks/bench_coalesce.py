@@ -0,0 +1,88 @@
+"""
+benchmarks/bench_coalesce.py - Cold-cache stampede with and without request coalescing
+
+Simulates --threads requests arriving together on a cold page: each thread
+has its own connection and needs the admin reports (compute_reports) or the
+unfiltered /events list. First every thread runs the queries itself, then
+the threads go through SingleFlight so that one computes and the rest share
+its result. Prints how many times the queries ran, the wall time until every
+request had its data, and the mean / worst per-request wait.
+
+Usage (from the project root):
+    python benchmarks/bench_coalesce.py [--threads 32] [--rounds 5]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from loginapp import db
+from loginapp.routes.admin import compute_reports
+from loginapp.routes.events import LIST_EVENTS
+from loginapp.utils import coalesce
+
+
+def list_events(cur):
+    LIST_EVENTS[False, False].execute(cur, (None, None))
+    return cur.fetchall()
+
+
+def stampede(work, threads):
+    """(computations, wall ms, mean wait ms, worst wait ms) for one burst"""
+    conns = [psycopg2.connect(connection_factory=db.AppConnection, **db.connection_params())
+             for _ in range(threads)]
+    flights = coalesce.SingleFlight()
+    barrier = threading.Barrier(threads)
+    waits = [0.0] * threads
+    computations = []
+
+    def compute(cur):
+        computations.append(1)
+        return work(cur)
+
+    def request(i):
+        cur = conns[i].cursor(cursor_factory=RealDictCursor)
+        barrier.wait()
+        started = time.perf_counter()
+        flights.do('page', lambda: compute(cur))
+        waits[i] = time.perf_counter() - started
+        conns[i].rollback()
+
+    workers = [threading.Thread(target=request, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - started
+    for conn in conns:
+        conn.close()
+    return len(computations), wall * 1000, sum(waits) / threads * 1000, max(waits) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.threads} concurrent requests on a cold page, mean of {args.rounds} bursts")
+    print(f"{'page':<14} {'mode':<11} {'queries run':>11} {'wall ms':>8} {'mean wait':>10} {'worst':>8}")
+    for page, work in (('admin reports', compute_reports), ('/events', list_events)):
+        for mode in ('direct', 'coalesced'):
+            coalesce.enabled = mode == 'coalesced'
+            results = [stampede(work, args.threads) for _ in range(args.rounds)]
+            runs, wall, mean, worst = (sum(r[k] for r in results) / args.rounds for k in range(4))
+            print(f"{page:<14} {mode:<11} {runs:>11.0f} {wall:>8.1f} {mean:>9.1f}ms {worst:>6.1f}ms")
+    coalesce.enabled = True
+
+
+if __name__ == '__main__':
+    main()
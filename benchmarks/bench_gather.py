@@ -0,0 +1,158 @@
+"""
+benchmarks/bench_gather.py - Aggregate pages with serial vs gathered queries over a slow network
+
+Starts a TCP proxy in front of the database that delays every packet by half
+of --rtt in each direction, points the app's pools at it, and times:
+
+- admin reports: compute_reports(), the nine report queries
+- event detail: the leader's event_detail view (five queries and the render)
+
+each with the queries one after another on the request's connection
+(db.gather_enabled = False) and spread over pooled connections by gather().
+Prints the mean and p90 time per page for every round-trip time.
+
+Usage (from the project root):
+    python benchmarks/bench_gather.py [--rtt 0 2 10] [--rounds 20]
+"""
+
+import argparse
+import inspect
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import session
+
+import connect
+from loginapp import create_app, db
+from loginapp.routes import leader
+from loginapp.routes.admin import compute_reports
+
+
+class LatencyProxy:
+    """Forwards TCP connections to the database, holding each chunk for delay seconds per direction"""
+
+    def __init__(self, host, port):
+        if host.startswith('/'):
+            self.target = (socket.AF_UNIX, os.path.join(host, f'.s.PGSQL.{port}'))
+        else:
+            self.target = (socket.AF_INET, (host, port))
+        self.delay = 0.0
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.listener.accept()
+            upstream = socket.socket(self.target[0], socket.SOCK_STREAM)
+            upstream.connect(self.target[1])
+            for sock in (client, upstream):
+                if sock.family == socket.AF_INET:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, upstream)
+            self._pipe(upstream, client)
+
+    def _pipe(self, source, sink):
+        chunks = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b''
+                chunks.put((time.perf_counter() + self.delay, data))
+                if not data:
+                    return
+
+        def write():
+            while True:
+                due, data = chunks.get()
+                pause = due - time.perf_counter()
+                if pause > 0:
+                    time.sleep(pause)
+                if not data:
+                    try:
+                        sink.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    return
+                try:
+                    sink.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def busiest_event(app):
+    """(event_id, leader_id) of the event with the most registrations"""
+    with app.app_context():
+        cur = db.get_db().cursor()
+        cur.execute("""
+            SELECT e.event_id, e.event_leader_id
+            FROM events e
+            LEFT JOIN eventregistrations er ON er.event_id = e.event_id
+            GROUP BY e.event_id
+            ORDER BY count(er.volunteer_id) DESC, e.event_id
+            LIMIT 1
+        """)
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+
+def time_page(app, path, page, rounds, user_id, role):
+    """Per-request seconds; each round is one request context (connections returned at the end)"""
+    times = []
+    for _ in range(rounds + 1):
+        with app.test_request_context(path):
+            session['user_id'] = user_id
+            session['role'] = role
+            started = time.perf_counter()
+            page()
+            times.append(time.perf_counter() - started)
+    return times[1:]    # the first round warms the pool and the template cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rtt', type=float, nargs='+', default=[0, 2, 10], help='Round-trip times (ms)')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    proxy = LatencyProxy(connect.dbhost, connect.dbport)
+    connect.dbhost, connect.dbport = '127.0.0.1', proxy.port
+    app = create_app()
+    event_id, leader_id = busiest_event(app)
+    event_detail = inspect.unwrap(leader.event_detail)
+
+    pages = [
+        ('admin reports', '/admin/reports', compute_reports, 1, 'admin'),
+        ('event detail', f'/leader/event_detail/{event_id}', lambda: event_detail(event_id),
+         leader_id, 'event_leader'),
+    ]
+    print(f"{'rtt ms':>6} {'page':<14} {'serial ms':>10} {'p90':>7} {'gathered ms':>12} {'p90':>7} {'speed-up':>9}")
+    for rtt in args.rtt:
+        proxy.delay = rtt / 2000
+        for name, path, page, user_id, role in pages:
+            measured = []
+            for enabled in (False, True):
+                db.gather_enabled = enabled
+                times = sorted(time_page(app, path, page, args.rounds, user_id, role))
+                measured.append((sum(times) / len(times) * 1000, times[int(len(times) * 0.9)] * 1000))
+            (serial, serial_p90), (gathered, gathered_p90) = measured
+            print(f"{rtt:>6g} {name:<14} {serial:>10.1f} {serial_p90:>7.1f} {gathered:>12.1f}"
+                  f" {gathered_p90:>7.1f} {serial / gathered:>8.1f}x")
+    db.gather_enabled = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+benchmarks/bench_prepared.py - Hot queries as plain execute() vs prepared statements
+
+For each registered hot statement (login lookup, registration conflict check,
+home reminders, /events list) this runs the query from several threads, each
+on its own connection, for a fixed time: first as plain SQL (parsed and
+planned on every call), then through the statement registry (PREPAREd once
+per connection, then EXECUTEd by name). It prints throughput and mean latency,
+and the server-side planning time per call reported by EXPLAIN ANALYZE.
+
+Usage (from the project root):
+    python benchmarks/bench_prepared.py [--threads 8] [--seconds 3]
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+
+from loginapp import db, statements
+from loginapp.routes.auth import LOGIN_USER
+from loginapp.routes.events import CONFLICT_CHECK, LIST_EVENTS
+from loginapp import HOME_UPCOMING
+
+PLANNING_TIME = re.compile(r'Planning Time: ([\d.]+) ms')
+
+
+def connect():
+    return psycopg2.connect(connection_factory=db.AppConnection, **db.connection_params())
+
+
+def sample_params():
+    """Parameters taken from the data: the busiest volunteer and one of their events"""
+    conn = connect()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT u.user_id, u.username
+            FROM users u
+            LEFT JOIN eventregistrations er ON er.volunteer_id = u.user_id
+            WHERE u.role = 'volunteer'
+            GROUP BY u.user_id
+            ORDER BY COUNT(er.event_id) DESC, u.user_id
+            LIMIT 1
+        """)
+        user_id, username = cur.fetchone()
+        cur.execute("""
+            SELECT event_date, start_time, duration FROM events
+            ORDER BY event_date DESC LIMIT 1
+        """)
+        event_date, start_time, duration = cur.fetchone()
+    conn.close()
+    return [
+        (LOGIN_USER, (username,)),
+        (CONFLICT_CHECK, (user_id, event_date, start_time, duration, start_time)),
+        (HOME_UPCOMING, (user_id,)),
+        (LIST_EVENTS[False, False], (user_id,)),
+        (LIST_EVENTS[True, False], (user_id, '%beach%')),
+    ]
+
+
+def run(stmt, params, threads, seconds):
+    """Calls per second and mean latency (ms) over 'seconds' with 'threads' connections"""
+    conns = [connect() for _ in range(threads)]
+    counts = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(i):
+        conn = conns[i]
+        cur = conn.cursor()
+        while time.perf_counter() < stop:
+            stmt.execute(cur, params)
+            cur.fetchall()
+            conn.rollback()
+            counts[i] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    for conn in conns:
+        conn.close()
+    total = sum(counts)
+    return total / elapsed, elapsed * threads / total * 1000
+
+
+def planning_ms(stmt, params, rounds=20):
+    """Mean server planning time per call, plain vs prepared (after plan caching)"""
+    conn = connect()
+    cur = conn.cursor()
+    plain_sql = cur.mogrify(stmt.sql, params).decode()
+    results = []
+    for prepared in (False, True):
+        statements.enabled = prepared
+        for _ in range(6):      # the server switches to a cached generic plan after 5 runs
+            stmt.execute(cur, params)
+            cur.fetchall()
+        total = 0.0
+        for _ in range(rounds):
+            if prepared:
+                cur.execute("EXPLAIN (ANALYZE, SUMMARY) " + stmt.execute_sql, params)
+            else:
+                cur.execute("EXPLAIN (ANALYZE, SUMMARY) " + plain_sql)
+            plan = '\n'.join(row[0] for row in cur.fetchall())
+            total += float(PLANNING_TIME.search(plan).group(1))
+        results.append(total / rounds)
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    print(f"{'statement':<28} {'plain q/s':>10} {'prep q/s':>10} {'plain ms':>9} {'prep ms':>8}"
+          f" {'plan plain':>11} {'plan prep':>10}")
+    for stmt, params in sample_params():
+        statements.enabled = False
+        plain_qps, plain_ms = run(stmt, params, args.threads, args.seconds)
+        statements.enabled = True
+        prep_qps, prep_ms = run(stmt, params, args.threads, args.seconds)
+        plan_plain, plan_prep = planning_ms(stmt, params)
+        print(f"{stmt.name:<28} {plain_qps:>10.0f} {prep_qps:>10.0f} {plain_ms:>9.3f} {prep_ms:>8.3f}"
+              f" {plan_plain:>10.3f}ms {plan_prep:>8.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+benchmarks/bench_rows.py - RealDictCursor vs CompactCursor for large result sets
+
+Fetches a synthetic users-like result (generate_series, no tables needed)
+with each cursor, then reads five columns of every row the way a template
+does (Jinja attribute lookup). Prints the memory held by the fetched rows
+(tracemalloc) and the mean time to fetch and to read them.
+
+Usage (from the project root):
+    python benchmarks/bench_rows.py [--rows 20000] [--rounds 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from jinja2 import Environment
+from psycopg2.extras import RealDictCursor
+
+from loginapp.db import CompactCursor, connection_params
+
+QUERY = """
+    SELECT i AS user_id,
+           'user' || i AS username,
+           'Volunteer Number ' || i AS full_name,
+           'user' || i || '@example.com' AS email,
+           CASE WHEN i %% 10 = 0 THEN 'event_leader' ELSE 'volunteer' END AS role,
+           'active' AS status,
+           TIMESTAMP '2026-01-01' + i * interval '1 minute' AS created_at
+    FROM generate_series(1, %s) AS i
+"""
+
+READ = ('user_id', 'username', 'full_name', 'role', 'status')
+
+
+def measure(conn, cursor_factory, rows, rounds):
+    env = Environment()
+    getattr_ = env.getattr
+
+    # Memory held by one materialised result
+    cur = conn.cursor(cursor_factory=cursor_factory)
+    cur.execute(QUERY, (rows,))
+    tracemalloc.start()
+    result = cur.fetchall()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    cur.close()
+
+    fetch = read = 0.0
+    for _ in range(rounds):
+        cur = conn.cursor(cursor_factory=cursor_factory)
+        cur.execute(QUERY, (rows,))
+        started = time.perf_counter()
+        result = cur.fetchall()
+        fetched = time.perf_counter()
+        for row in result:
+            for name in READ:
+                getattr_(row, name)
+        read += time.perf_counter() - fetched
+        fetch += fetched - started
+        cur.close()
+    return held, fetch / rounds * 1000, read / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**connection_params())
+    print(f"{args.rows} rows x 7 columns")
+    print(f"{'cursor':<16} {'memory':>10} {'fetch ms':>9} {'read ms':>8}")
+    for name, factory in (('RealDictCursor', RealDictCursor), ('CompactCursor', CompactCursor)):
+        held, fetch_ms, read_ms = measure(conn, factory, args.rows, args.rounds)
+        print(f"{name:<16} {held / 1024 / 1024:>8.1f}MB {fetch_ms:>9.1f} {read_ms:>8.1f}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
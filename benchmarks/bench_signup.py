@@ -0,0 +1,199 @@
+"""
+benchmarks/bench_signup.py - Concurrent signups for one limited-capacity event
+
+Creates a throwaway event with --capacity places and --volunteers throwaway
+volunteer accounts, then has --threads connections register them all at
+once through seats.register(). Prints throughput and latency percentiles and
+checks the invariants: no overselling, every registration holds exactly one
+seat, everyone else is on the waitlist.
+
+It then removes --cancel registrations concurrently (each followed by
+seats.promote(), as the leader's remove button does) and checks that the
+freed places went to the front of the waitlist in order. Everything created
+is deleted at the end.
+
+Usage (from the project root):
+    python benchmarks/bench_signup.py [--capacity 50] [--volunteers 400] [--threads 16] [--cancel 10]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+
+from loginapp import db, seats
+
+PREFIX = 'bench_signup_'
+
+
+def connect():
+    return psycopg2.connect(connection_factory=db.AppConnection, **db.connection_params())
+
+
+def setup(conn, capacity, volunteers):
+    """Throwaway event (tomorrow, no time clashes) and volunteers; returns (event_id, volunteer_ids)"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT user_id FROM users WHERE role = 'event_leader' ORDER BY user_id LIMIT 1")
+        leader_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO events (event_name, location, event_date, start_time, duration,
+                                event_leader_id, capacity)
+            VALUES (%s, 'Benchmark', CURRENT_DATE + 1, '03:00', 30, %s, %s)
+            RETURNING event_id
+        """, (PREFIX + 'event', leader_id, capacity))
+        event_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO users (username, password_hash, full_name, email)
+            SELECT %(p)s || i, '-', 'Signup Benchmark ' || i, %(p)s || i || '@example.invalid'
+            FROM generate_series(1, %(n)s) AS i
+            RETURNING user_id
+        """, {'p': PREFIX, 'n': volunteers})
+        volunteer_ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return event_id, volunteer_ids
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM events WHERE event_name = %s", (PREFIX + 'event',))
+        cur.execute("DELETE FROM users WHERE username LIKE %s", (PREFIX + '%',))
+    conn.commit()
+
+
+def run_concurrently(threads, items, work):
+    """Split items over threads (one connection each), start together; returns per-call latencies"""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker(chunk):
+        conn = connect()
+        mine = []
+        try:
+            barrier.wait()
+            for item in chunk:
+                started = time.perf_counter()
+                work(conn, item)
+                conn.commit()
+                mine.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=worker, args=(items[i::threads],)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    if errors:
+        raise errors[0]
+    return latencies
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def check_invariants(conn, event_id, capacity, volunteers):
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM eventregistrations WHERE event_id = %s", (event_id,))
+        registered = cur.fetchone()[0]
+        cur.execute("""
+            SELECT count(*), count(registration_id), count(DISTINCT registration_id)
+            FROM event_seats WHERE event_id = %s
+        """, (event_id,))
+        seat_rows, taken, distinct = cur.fetchone()
+        cur.execute("""
+            SELECT count(*) FROM eventregistrations er
+            WHERE er.event_id = %s
+              AND NOT EXISTS (SELECT 1 FROM event_seats s WHERE s.registration_id = er.registration_id)
+        """, (event_id,))
+        seatless = cur.fetchone()[0]
+        cur.execute("SELECT count(*) FROM event_waitlist WHERE event_id = %s", (event_id,))
+        waitlisted = cur.fetchone()[0]
+    conn.rollback()
+
+    expected = min(capacity, volunteers)
+    problems = []
+    if registered != expected:
+        problems.append(f"{registered} registered, expected {expected}")
+    if seat_rows != capacity:
+        problems.append(f"{seat_rows} seat rows for capacity {capacity}")
+    if taken != registered or distinct != taken or seatless:
+        problems.append(f"{taken} seats taken ({distinct} distinct) for {registered} registrations,"
+                        f" {seatless} without a seat")
+    if waitlisted != volunteers - expected:
+        problems.append(f"{waitlisted} waitlisted, expected {volunteers - expected}")
+    print(f"  registered {registered}/{capacity}, waitlisted {waitlisted}: "
+          + ('OK' if not problems else 'FAILED - ' + '; '.join(problems)))
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--capacity', type=int, default=50)
+    parser.add_argument('--volunteers', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--cancel', type=int, default=10)
+    args = parser.parse_args()
+
+    conn = connect()
+    cleanup(conn)
+    event_id, volunteer_ids = setup(conn, args.capacity, args.volunteers)
+    ok = True
+    try:
+        outcomes = {}
+
+        def register(c, volunteer_id):
+            outcomes[volunteer_id] = seats.register(c, event_id, volunteer_id)
+
+        print(f"{args.volunteers} volunteers, {args.capacity} places, {args.threads} connections")
+        started = time.perf_counter()
+        latencies = run_concurrently(args.threads, volunteer_ids, register)
+        elapsed = time.perf_counter() - started
+        print(f"  signups: {len(latencies) / elapsed:.0f}/s, p50 {percentile(latencies, 0.5):.1f} ms,"
+              f" p99 {percentile(latencies, 0.99):.1f} ms, max {max(latencies) * 1000:.1f} ms")
+        ok &= check_invariants(conn, event_id, args.capacity, args.volunteers)
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT volunteer_id FROM event_waitlist WHERE event_id = %s ORDER BY waitlist_id",
+                        (event_id,))
+            queue = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT volunteer_id FROM eventregistrations WHERE event_id = %s LIMIT %s",
+                        (event_id, args.cancel))
+            leaving = [row[0] for row in cur.fetchall()]
+        conn.rollback()
+
+        promoted = []
+
+        def remove(c, volunteer_id):
+            with c.cursor() as cur:
+                cur.execute("DELETE FROM eventregistrations WHERE event_id = %s AND volunteer_id = %s",
+                            (event_id, volunteer_id))
+            promoted.extend(seats.promote(c, event_id))
+
+        run_concurrently(min(args.threads, len(leaving)) or 1, leaving, remove)
+        expected = queue[:len(leaving)]
+        fifo = sorted(promoted) == sorted(expected)
+        print(f"  {len(leaving)} removed, {len(promoted)} promoted from the waitlist: "
+              + ('OK (front of the queue)' if fifo else 'FAILED - not the front of the queue'))
+        ok &= fifo
+        ok &= check_invariants(conn, event_id, args.capacity, args.volunteers - len(leaving))
+    finally:
+        cleanup(conn)
+        conn.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
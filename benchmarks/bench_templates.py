@@ -0,0 +1,110 @@
+"""
+benchmarks/bench_templates.py - Render time per page, fragment cache off vs on
+
+Renders home.html, events.html and admin_reports.html with synthetic data
+(no database queries) inside a request context and prints the mean render
+time per page.
+
+Usage (from the project root):
+    python benchmarks/bench_templates.py [--events 200] [--rounds 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template, session
+
+from loginapp import create_app
+from loginapp.utils.cache import data_fingerprint
+
+
+def fake_events(n):
+    today = date.today()
+    return [{
+        'event_id': i,
+        'event_name': f'Beach Clean-Up #{i}',
+        'location': 'Sumner Beach, Christchurch',
+        'event_date': today + timedelta(days=i % 90),
+        'start_time': dtime(9, 0),
+        'duration': 180,
+        'registered': i % 3 == 0,
+    } for i in range(n)]
+
+
+def fake_reports():
+    stats = {
+        'total_users': 27, 'users_by_role': {'volunteer': 20, 'event_leader': 5, 'admin': 2},
+        'active_users': 27, 'total_events': 25, 'upcoming_events': 10, 'past_events': 15,
+        'total_registrations': 30, 'avg_rating': 4.2,
+    }
+    recent = [{'event_name': f'Event {i}', 'event_date': date.today(), 'location': 'Hagley Park',
+               'registrations': 12, 'num_attendees': 10, 'bags_collected': 20} for i in range(5)]
+    return stats, recent
+
+
+def time_render(app, role, template, context, rounds):
+    with app.test_request_context('/'):
+        session['user_id'] = 1
+        session['role'] = role
+        render_template(template, **context)          # warm up (compile / fill cache)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            render_template(template, **context)
+        return (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--events', type=int, default=200, help='Events on the /events page')
+    parser.add_argument('--rounds', type=int, default=500, help='Renders per measurement')
+    args = parser.parse_args()
+
+    app = create_app()
+    events = fake_events(args.events)
+    stats, recent = fake_reports()
+
+    pages = [
+        ('home.html', 'volunteer', {'upcoming': [], 'show_reminder': False, 'upcoming_events_modal': []}),
+        ('events.html', 'volunteer', {'events': events, 'events_version': data_fingerprint(events),
+                                      'search_location': '', 'search_date': ''}),
+        ('admin_reports.html', 'admin', {'stats': stats, 'recent_events': recent,
+                                         'reports_version': data_fingerprint(stats, recent)}),
+    ]
+
+    print(f"{'Template':<22} {'no cache (ms)':>14} {'fragment cache (ms)':>20} {'speed-up':>9}")
+    for template, role, context in pages:
+        app.jinja_env.fragment_cache_enabled = False
+        cold = time_render(app, role, template, context, args.rounds)
+        app.jinja_env.fragment_cache_enabled = True
+        warm = time_render(app, role, template, context, args.rounds)
+        print(f"{template:<22} {cold:>14.3f} {warm:>20.3f} {cold / warm:>8.1f}x")
+
+    # The route pays for the fingerprint on every request, cached or not
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        data_fingerprint(events)
+    print(f"(data_fingerprint over {len(events)} events: "
+          f"{(time.perf_counter() - started) / args.rounds * 1000:.3f} ms per request)")
+
+    # Bytecode cache: compile time for a fresh environment with and without it
+    loader_env = app.jinja_env
+    started = time.perf_counter()
+    fresh = loader_env.overlay(bytecode_cache=None, cache_size=0)
+    for template, _, _ in pages:
+        fresh.get_template(template)
+    no_bcc = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    fresh = loader_env.overlay(cache_size=0)
+    for template, _, _ in pages:
+        fresh.get_template(template)
+    with_bcc = (time.perf_counter() - started) * 1000
+    print(f"\nTemplate load at worker start: {no_bcc:.1f} ms compiling, {with_bcc:.1f} ms from bytecode cache")
+
+
+if __name__ == '__main__':
+    main()
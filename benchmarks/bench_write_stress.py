@@ -0,0 +1,461 @@
+"""
+benchmarks/bench_write_stress.py - Concurrent interleaved writes through the real routes
+
+Creates throwaway volunteers, a leader and an admin, a day of overlapping
+upcoming events (every other one with limited capacity) and a few past
+events the volunteers attended. Then --threads workers, each with its own
+logged-in Flask test clients, run --ops randomly interleaved requests:
+
+    register_event, mark_attendance, remove_volunteer, submit_feedback,
+    toggle_user_status and (--cancel times) cancel_event
+
+A monitor thread samples pg_stat_activity every --sample-ms for backends
+waiting on a lock, grouped by application_name (the endpoint, see db.py),
+and follows pg_blocking_pids() to spot deadlock cycles while PostgreSQL's
+detector is still waiting out deadlock_timeout. Prints per-route throughput,
+p50 / p99 latency, failures, estimated lock wait and the deadlocks each
+route took part in, the total PostgreSQL reported meanwhile, then checks invariants:
+no overlapping registrations, no oversold events, nobody both registered and
+waitlisted, feedback only with a registration, event_feedback_stats and
+volunteer_stats equal to a recount, and every status change counted once.
+Everything created is deleted at the end; exits 1 if an invariant failed.
+
+Usage (from the project root):
+    python benchmarks/bench_write_stress.py [--threads 16] [--ops 4000] [--volunteers 40] [--events 12]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from flask_bcrypt import generate_password_hash
+
+from loginapp import create_app, db, stats
+
+PREFIX = 'bench_stress_'
+PASSWORD = 'Stress-2026!'
+
+# (route, weight); cancel_event runs exactly --cancel times on top of these
+MIX = [('register_event', 35), ('mark_attendance', 20), ('remove_volunteer', 15),
+       ('submit_feedback', 15), ('toggle_user_status', 10)]
+
+
+def connect():
+    return psycopg2.connect(connection_factory=db.AppConnection, **db.connection_params())
+
+
+def setup(conn, volunteers, events, past_events, toggles):
+    """Throwaway accounts and events; returns a dict of their ids"""
+    # Cheap hash: logging in every worker's clients should not dominate the run
+    password_hash = generate_password_hash(PASSWORD, rounds=4).decode('utf-8')
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO users (username, password_hash, full_name, email, role)
+            VALUES (%(p)s || 'leader', %(h)s, 'Stress Leader', %(p)s || 'leader@example.invalid', 'event_leader'),
+                   (%(p)s || 'admin', %(h)s, 'Stress Admin', %(p)s || 'admin@example.invalid', 'admin')
+            RETURNING user_id
+        """, {'p': PREFIX, 'h': password_hash})
+        leader_id, admin_id = (row[0] for row in cur.fetchall())
+        cur.execute("""
+            INSERT INTO users (username, password_hash, full_name, email)
+            SELECT %(p)s || 'v' || i, %(h)s, 'Stress Volunteer ' || i, %(p)s || 'v' || i || '@example.invalid'
+            FROM generate_series(1, %(n)s) AS i
+            RETURNING user_id, username
+        """, {'p': PREFIX, 'h': password_hash, 'n': volunteers})
+        volunteer_rows = cur.fetchall()
+        # Only ever toggled by the admin, never logged in
+        cur.execute("""
+            INSERT INTO users (username, password_hash, full_name, email)
+            SELECT %(p)s || 't' || i, '-', 'Stress Toggle ' || i, %(p)s || 't' || i || '@example.invalid'
+            FROM generate_series(1, %(n)s) AS i
+            RETURNING user_id, status
+        """, {'p': PREFIX, 'n': toggles})
+        toggle_status = dict(cur.fetchall())
+
+        # Starts 30 minutes apart, 90 minutes long: each overlaps two on either side
+        cur.execute("""
+            INSERT INTO events (event_name, location, event_date, start_time, duration,
+                                event_leader_id, capacity)
+            SELECT %(p)s || 'upcoming_' || i, 'Stress Park', CURRENT_DATE + 2,
+                   time '06:00' + (i - 1) * interval '30 minutes', 90, %(l)s,
+                   CASE WHEN i %% 2 = 0 THEN %(c)s END
+            FROM generate_series(1, %(n)s) AS i
+            RETURNING event_id
+        """, {'p': PREFIX, 'l': leader_id, 'n': events, 'c': max(2, volunteers // 8)})
+        upcoming = [row[0] for row in cur.fetchall()]
+        cur.execute("""
+            INSERT INTO events (event_name, location, event_date, start_time, duration, event_leader_id)
+            SELECT %(p)s || 'past_' || i, 'Stress Park', CURRENT_DATE - i, '09:00', 60, %(l)s
+            FROM generate_series(1, %(n)s) AS i
+            RETURNING event_id
+        """, {'p': PREFIX, 'l': leader_id, 'n': past_events})
+        past = [row[0] for row in cur.fetchall()]
+
+        # Two in three volunteers attended each past event; the rest may not rate it
+        for event_id in past:
+            attended = [vid for i, (vid, _) in enumerate(volunteer_rows) if i % 3]
+            cur.execute("""
+                INSERT INTO eventregistrations (event_id, volunteer_id, attendance)
+                SELECT %s, unnest(%s::int[]), 'attended'
+            """, (event_id, attended))
+            stats.attendance_changed(cur, event_id, [(vid, None, 'attended') for vid in attended])
+    conn.commit()
+    return {
+        'leader': PREFIX + 'leader',
+        'admin': PREFIX + 'admin',
+        'volunteers': volunteer_rows,
+        'toggle_status': toggle_status,
+        'upcoming': upcoming,
+        'past': past,
+    }
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM events WHERE event_name LIKE %s", (PREFIX + '%',))
+        cur.execute("DELETE FROM users WHERE username LIKE %s", (PREFIX + '%',))
+    conn.commit()
+
+
+def plan(data, ops, cancels, seed):
+    """Shuffled list of (route, user, url, form); the same seed gives the same run"""
+    rng = random.Random(seed)
+    routes, weights = zip(*MIX)
+    volunteers = data['volunteers']
+    work = []
+    for route in rng.choices(routes, weights, k=ops):
+        vid, username = rng.choice(volunteers)
+        event_id = rng.choice(data['upcoming'])
+        if route == 'register_event':
+            work.append((route, username, f'/register/{event_id}', None))
+        elif route == 'mark_attendance':
+            event_id = rng.choice(data['upcoming'] + data['past'])
+            work.append((route, data['leader'], f'/leader/mark_attendance/{event_id}/{vid}',
+                         {'attendance': rng.choice(['attended', 'absent', 'pending'])}))
+        elif route == 'remove_volunteer':
+            work.append((route, data['leader'], f'/leader/remove_volunteer/{event_id}/{vid}', None))
+        elif route == 'submit_feedback':
+            work.append((route, username, f"/submit_feedback/{rng.choice(data['past'])}",
+                         {'rating': str(rng.randint(1, 5)), 'comments': 'stress'}))
+        else:
+            work.append((route, data['admin'], f"/admin/toggle_user_status/{rng.choice(list(data['toggle_status']))}",
+                         {'status': rng.choice(['active', 'inactive'])}))
+    # Cancel late enough that registrations pile up on the events first
+    for event_id in rng.sample(data['upcoming'], min(cancels, len(data['upcoming']))):
+        work.insert(rng.randrange(len(work) // 3, len(work) + 1),
+                    ('cancel_event', data['leader'], f'/leader/cancel_event/{event_id}', None))
+    return work
+
+
+def cycles(blocked_by):
+    """Wait-for cycles in {pid: blocking pids}, each as a frozenset of pids"""
+    found = set()
+
+    def walk(pid, path):
+        for blocker in blocked_by.get(pid, ()):
+            if blocker == path[0]:
+                found.add(frozenset(path))
+            elif blocker > path[0] and blocker in blocked_by and blocker not in path:
+                # Only pids above the start: each cycle is walked from its lowest pid
+                walk(blocker, path + [blocker])
+
+    for pid in blocked_by:
+        walk(pid, [pid])
+    return found
+
+
+class LockMonitor(threading.Thread):
+    """
+    Samples backends waiting on a lock: (route, wait_event) -> samples, and
+    the wait-for cycles among them: deadlock key -> routes taking part.
+    A deadlock stays visible for deadlock_timeout (1 s by default) before
+    PostgreSQL cancels one of its transactions, so sampling every few
+    milliseconds sees each one; it is keyed by its backends' transaction
+    start times so it is counted once.
+    """
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self.deadlocks = {}
+        self.peak = 0
+        self._done = threading.Event()
+
+    def run(self):
+        conn = connect()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            while not self._done.is_set():
+                cur.execute("""
+                    SELECT pid, coalesce(nullif(application_name, ''), '?'), wait_event,
+                           xact_start, pg_blocking_pids(pid)
+                    FROM pg_stat_activity
+                    WHERE datname = current_database() AND wait_event_type = 'Lock'
+                """)
+                rows = cur.fetchall()
+                self.peak = max(self.peak, len(rows))
+                backends = {}
+                for pid, route, wait_event, xact_start, _ in rows:
+                    self.samples[route, wait_event] += 1
+                    backends[pid] = (route, xact_start)
+                for cycle in cycles({pid: blockers for pid, _, _, _, blockers in rows}):
+                    key = frozenset((pid, backends[pid][1]) for pid in cycle)
+                    self.deadlocks[key] = [backends[pid][0] for pid in cycle]
+                self._done.wait(self.interval)
+        conn.close()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def deadlocks(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+        count = cur.fetchone()[0]
+    conn.rollback()
+    return count
+
+
+def run(app, work, threads):
+    """Run work on threads; returns [(route, seconds, outcome, flash messages)]"""
+    results = []
+    lock = threading.Lock()
+    cursor = iter(work)
+    barrier = threading.Barrier(threads)
+
+    def login(username):
+        client = app.test_client()
+        response = client.post('/auth/login', data={'username': username, 'password': PASSWORD})
+        assert response.status_code == 302, f"login {username}: {response.status_code}"
+        with client.session_transaction() as s:
+            s.pop('_flashes', None)     # so 'Login successful!' is not read as the first request's outcome
+        return client
+
+    def worker():
+        clients = {}
+        mine = []
+        barrier.wait()
+        while True:
+            with lock:
+                item = next(cursor, None)
+            if item is None:
+                break
+            route, username, url, form = item
+            if username not in clients:
+                clients[username] = login(username)
+            client = clients[username]
+
+            started = time.perf_counter()
+            if form == 'GET':
+                response = client.get(url)
+            else:
+                response = client.post(url, data=form or {})
+            elapsed = time.perf_counter() - started
+
+            with client.session_transaction() as s:
+                flashes = s.pop('_flashes', [])
+            if response.status_code == 503:
+                outcome = 'shed'
+            elif response.status_code >= 500 or any(
+                    category == 'danger' and ('fail' in text.lower() or 'error' in text.lower())
+                    for category, text in flashes):
+                outcome = 'error'
+            else:
+                outcome = 'ok'
+            mine.append((route, elapsed, outcome, flashes, url))
+        with lock:
+            results.extend(mine)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return results
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def report(results, wall, monitor, interval):
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[result[0]].append(result)
+    waits = defaultdict(Counter)
+    for (route, wait_event), n in monitor.samples.items():
+        waits[route.rsplit('.', 1)[-1]][wait_event] += n
+    # A deadlock between two requests of the same route counts once for it
+    deadlocked = Counter()
+    for routes in monitor.deadlocks.values():
+        deadlocked.update({route.rsplit('.', 1)[-1] for route in routes})
+
+    print(f"{'route':<20} {'ops':>5} {'ops/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'errors':>6} {'shed':>5}"
+          f" {'lock wait ms':>12} {'deadlocks':>9}  waiting on")
+    for route in sorted(by_route):
+        rows = by_route[route]
+        latencies = [r[1] for r in rows]
+        outcomes = Counter(r[2] for r in rows)
+        waited = waits.pop(route, Counter())
+        print(f"{route:<20} {len(rows):>5} {len(rows) / wall:>7.0f} {percentile(latencies, 0.5):>7.1f}"
+              f" {percentile(latencies, 0.99):>7.1f} {outcomes['error']:>6} {outcomes['shed']:>5}"
+              f" {sum(waited.values()) * interval * 1000:>12.0f} {deadlocked.pop(route, 0):>9}  "
+              + ', '.join(f"{e} {n}" for e, n in waited.most_common(3)))
+    for route, waited in waits.items():
+        print(f"{route:<20} (other backend) lock wait ~{sum(waited.values()) * interval * 1000:.0f} ms,"
+              f" deadlocks {deadlocked.pop(route, 0)}")
+    print(f"total: {len(results)} requests in {wall:.1f} s ({len(results) / wall:.0f}/s),"
+          f" at most {monitor.peak} backends waiting on a lock at once")
+
+    errors = [r for r in results if r[2] == 'error']
+    for route, _, _, flashes, url in errors[:5]:
+        print(f"  error {route} {url}: {'; '.join(text for _, text in flashes)[:160]}")
+
+
+def check(conn, name, sql, params=None):
+    """Run a query that returns the rows breaking an invariant"""
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        bad = cur.fetchall()
+    conn.rollback()
+    print(f"  {name:<48} " + ('OK' if not bad else f"FAILED - {len(bad)} rows, e.g. {bad[:3]}"))
+    return not bad
+
+
+def check_invariants(conn, data, toggled):
+    like = PREFIX + '%'
+    ok = check(conn, 'no overlapping registrations per volunteer', """
+        SELECT a.volunteer_id, ea.event_id, eb.event_id
+        FROM eventregistrations a
+        JOIN events ea ON ea.event_id = a.event_id
+        JOIN eventregistrations b ON b.volunteer_id = a.volunteer_id AND b.event_id > a.event_id
+        JOIN events eb ON eb.event_id = b.event_id
+        WHERE ea.event_name LIKE %(like)s
+          AND ea.status = 'scheduled' AND eb.status = 'scheduled'
+          AND ea.event_date = eb.event_date
+          AND ea.start_time < eb.start_time + interval '1 minute' * eb.duration
+          AND eb.start_time < ea.start_time + interval '1 minute' * ea.duration
+    """, {'like': like})
+    ok &= check(conn, 'no event over capacity, one seat per registration', """
+        SELECT e.event_id, e.capacity,
+               (SELECT count(*) FROM eventregistrations er WHERE er.event_id = e.event_id) AS registered,
+               (SELECT count(*) FROM event_seats s WHERE s.event_id = e.event_id
+                                                     AND s.registration_id IS NOT NULL) AS seated
+        FROM events e
+        WHERE e.event_name LIKE %(like)s AND e.capacity IS NOT NULL
+          AND ((SELECT count(*) FROM eventregistrations er WHERE er.event_id = e.event_id) > e.capacity
+               OR (SELECT count(*) FROM eventregistrations er WHERE er.event_id = e.event_id)
+                  <> (SELECT count(*) FROM event_seats s WHERE s.event_id = e.event_id
+                                                           AND s.registration_id IS NOT NULL))
+    """, {'like': like})
+    ok &= check(conn, 'nobody both registered and waitlisted', """
+        SELECT w.event_id, w.volunteer_id
+        FROM event_waitlist w
+        JOIN events e ON e.event_id = w.event_id
+        JOIN eventregistrations er ON er.event_id = w.event_id AND er.volunteer_id = w.volunteer_id
+        WHERE e.event_name LIKE %(like)s
+    """, {'like': like})
+    ok &= check(conn, 'feedback only from registered volunteers', """
+        SELECT f.event_id, f.volunteer_id
+        FROM feedback f
+        JOIN events e ON e.event_id = f.event_id
+        WHERE e.event_name LIKE %(like)s
+          AND NOT EXISTS (SELECT 1 FROM eventregistrations er
+                          WHERE er.event_id = f.event_id AND er.volunteer_id = f.volunteer_id)
+    """, {'like': like})
+    ok &= check(conn, 'event_feedback_stats matches a recount', """
+        SELECT e.event_id, s.rating_count, s.rating_sum, f.n, f.total
+        FROM events e
+        LEFT JOIN event_feedback_stats s ON s.event_id = e.event_id
+        LEFT JOIN (SELECT event_id, count(*) AS n, sum(rating) AS total
+                   FROM feedback GROUP BY event_id) f ON f.event_id = e.event_id
+        WHERE e.event_name LIKE %(like)s
+          AND (coalesce(s.rating_count, 0), coalesce(s.rating_sum, 0))
+              IS DISTINCT FROM (coalesce(f.n, 0), coalesce(f.total, 0))
+    """, {'like': like})
+    ok &= check(conn, 'volunteer_stats matches a recount', """
+        SELECT u.user_id, vs.events_attended, vs.minutes_volunteered, a.n, a.minutes
+        FROM users u
+        LEFT JOIN volunteer_stats vs ON vs.volunteer_id = u.user_id
+        LEFT JOIN (SELECT er.volunteer_id, count(*) AS n, sum(e.duration) AS minutes
+                   FROM eventregistrations er JOIN events e ON e.event_id = er.event_id
+                   WHERE er.attendance = 'attended'
+                   GROUP BY er.volunteer_id) a ON a.volunteer_id = u.user_id
+        WHERE u.username LIKE %(like)s AND u.role = 'volunteer'
+          AND (coalesce(vs.events_attended, 0), coalesce(vs.minutes_volunteered, 0))
+              IS DISTINCT FROM (coalesce(a.n, 0), coalesce(a.minutes, 0))
+    """, {'like': like})
+
+    expected = {}
+    for user_id, status in data['toggle_status'].items():
+        flipped = toggled[user_id] % 2
+        expected[user_id] = {'active': 'inactive', 'inactive': 'active'}[status] if flipped else status
+    ok &= check(conn, 'every status change applied exactly once', """
+        SELECT u.user_id, u.status, t.expected
+        FROM users u
+        JOIN unnest(%s::int[], %s::text[]) AS t(user_id, expected) ON t.user_id = u.user_id
+        WHERE u.status::text <> t.expected
+    """, (list(expected), list(expected.values())))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=4000, help='Requests, not counting the cancels')
+    parser.add_argument('--volunteers', type=int, default=40)
+    parser.add_argument('--events', type=int, default=12, help='Overlapping upcoming events')
+    parser.add_argument('--past-events', type=int, default=4)
+    parser.add_argument('--toggles', type=int, default=4, help='Accounts the admin toggles')
+    parser.add_argument('--cancel', type=int, default=2, help='Upcoming events cancelled mid-run')
+    parser.add_argument('--sample-ms', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    app = create_app()
+    conn = connect()
+    cleanup(conn)
+    data = setup(conn, args.volunteers, args.events, args.past_events, args.toggles)
+    ok = False
+    try:
+        work = plan(data, args.ops, args.cancel, args.seed)
+        print(f"{len(work)} requests on {args.threads} threads: {args.volunteers} volunteers,"
+              f" {args.events} overlapping events, {args.past_events} past, {args.cancel} cancelled")
+
+        interval = args.sample_ms / 1000
+        deadlocks_before = deadlocks(conn)
+        monitor = LockMonitor(interval)
+        monitor.start()
+        started = time.perf_counter()
+        results = run(app, work, args.threads)
+        wall = time.perf_counter() - started
+        monitor.stop()
+
+        report(results, wall, monitor, interval)
+        print(f"deadlocks detected by PostgreSQL: {deadlocks(conn) - deadlocks_before}"
+              f" ({len(monitor.deadlocks)} seen by the lock monitor)")
+
+        toggled = Counter()
+        for route, _, _, flashes, url in results:
+            if route == 'toggle_user_status' and any(c == 'success' for c, _ in flashes):
+                toggled[int(url.rsplit('/', 1)[1])] += 1
+        print("invariants:")
+        ok = check_invariants(conn, data, toggled)
+    finally:
+        cleanup(conn)
+        conn.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,14 @@ On PythonAnywhere:
     username + "$". For example, if your username is "user1234" and you named
     your database "loginexample" then your full database name will be
     "user1234$loginexample".
+
+Read replicas (optional):
+- `dbreplicas` lists streaming replicas of the database above, as 'host',
+  'host:port' or a dict overriding any connection setting (e.g.
+  {'host': 'localhost', 'port': 5433}). Read-only pages use them when they
+  are no more than REPLICA_MAX_LAG seconds behind and streaming (the user
+  needs pg_read_all_stats to see that). Leave it empty to send
+  every query to the primary.
 """
 # dbuser = 'postgres'  # PUT YOUR USERNAME HERE - usually "root"
 # dbpass = 'wuwu3839'  # PUT YOUR PASSWORD HERE
@@ -38,4 +46,6 @@ dbuser = 'chenghao_wu'  # PUT YOUR USERNAME HERE - usually "root"
 dbpass = 'WONk1x%q*G(0ru&E'  # PUT YOUR PASSWORD HERE
 dbhost = 'lincolnmac-5080.postgres.pythonanywhere-services.com'
 dbport = 15080
-dbname = 'chenghao_wu_ecu'
\ No newline at end of file
+dbname = 'chenghao_wu_ecu'
+
+dbreplicas = []
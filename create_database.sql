@@ -17,6 +17,16 @@ CREATE TABLE users (
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- A recurring series of events (weekly beach clean-ups etc.).
+-- Occurrences are ordinary rows in events linked by series_id.
+CREATE TABLE eventseries (
+  series_id SERIAL PRIMARY KEY,
+  event_leader_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  recurrence VARCHAR(20) NOT NULL CHECK (recurrence IN ('weekly', 'fortnightly', 'monthly')),
+  repeat_until DATE NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE events (
   event_id SERIAL PRIMARY KEY,
   event_name VARCHAR(100) NOT NULL,
@@ -28,7 +38,11 @@ CREATE TABLE events (
   supplies TEXT,
   safety_instructions TEXT,
   event_leader_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  series_id INTEGER REFERENCES eventseries(series_id) ON DELETE SET NULL,
+  status VARCHAR(20) NOT NULL DEFAULT 'scheduled' CHECK (status IN ('scheduled', 'cancelled')),
+  cancelled_at TIMESTAMP,
+  capacity INTEGER CHECK (capacity > 0) -- NULL: no limit
 );
 
 CREATE TABLE eventregistrations (
@@ -42,7 +56,7 @@ CREATE TABLE eventregistrations (
 
 CREATE TABLE eventoutcomes (
   outcome_id SERIAL PRIMARY KEY,
-  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  event_id INTEGER NOT NULL UNIQUE REFERENCES events(event_id) ON DELETE CASCADE,
   num_attendees INTEGER DEFAULT 0,
   bags_collected INTEGER DEFAULT 0,
   recyclables_sorted INTEGER DEFAULT 0,
@@ -60,4 +74,468 @@ CREATE TABLE feedback (
   UNIQUE(event_id, volunteer_id)
 );
 
-CREATE INDEX idx_events_date ON events(event_date);
\ No newline at end of file
+-- Route-driven indexes (see loginapp/routes/*)
+-- events.list_events / home(): upcoming events ordered by date and time
+CREATE INDEX idx_events_date_time ON events(event_date, start_time);
+
+-- leader.my_events: a leader's own events, newest first
+CREATE INDEX idx_events_leader_date ON events(event_leader_id, event_date DESC);
+
+-- home(), user.my_participation, events.register_event (conflict check):
+-- registrations of one volunteer; attendance is carried so the history page
+-- can be answered from the index
+CREATE INDEX idx_eventregistrations_volunteer
+  ON eventregistrations(volunteer_id, event_id) INCLUDE (attendance);
+
+-- eventoutcomes(event_id) is served by its UNIQUE constraint (one outcome per event)
+
+-- leader.edit_event / cancel_series: all occurrences of a series
+CREATE INDEX idx_events_series ON events(series_id) WHERE series_id IS NOT NULL;
+
+-- Cancelled events waiting for 'flask purge-cancelled-events'
+CREATE INDEX idx_events_cancelled ON events(cancelled_at) WHERE status = 'cancelled';
+
+-- feedback(event_id) is already served by UNIQUE(event_id, volunteer_id);
+-- this one covers the volunteer side (ON DELETE CASCADE from users)
+CREATE INDEX idx_feedback_volunteer ON feedback(volunteer_id);
+
+-- admin.manage_users: newest users first
+CREATE INDEX idx_users_created_at ON users(created_at DESC);
+
+-- =============================================
+-- Cold storage for completed events (see loginapp/archive.py)
+-- Past events, their registrations, outcomes and feedback are moved here by
+-- 'flask archive-events' so the hot tables only hold recent/upcoming data.
+-- No foreign keys: rows arrive here after their parents have been moved.
+-- =============================================
+CREATE TABLE events_archive (LIKE events);
+ALTER TABLE events_archive ADD PRIMARY KEY (event_id);
+ALTER TABLE events_archive ADD COLUMN archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE eventregistrations_archive (LIKE eventregistrations);
+ALTER TABLE eventregistrations_archive ADD PRIMARY KEY (registration_id);
+ALTER TABLE eventregistrations_archive ADD COLUMN archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE eventoutcomes_archive (LIKE eventoutcomes);
+ALTER TABLE eventoutcomes_archive ADD PRIMARY KEY (outcome_id);
+ALTER TABLE eventoutcomes_archive ADD COLUMN archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE feedback_archive (LIKE feedback);
+ALTER TABLE feedback_archive ADD PRIMARY KEY (feedback_id);
+ALTER TABLE feedback_archive ADD COLUMN archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX idx_eventregistrations_archive_volunteer
+  ON eventregistrations_archive(volunteer_id, event_id) INCLUDE (attendance);
+CREATE INDEX idx_eventoutcomes_archive_event ON eventoutcomes_archive(event_id);
+CREATE INDEX idx_feedback_archive_event_volunteer ON feedback_archive(event_id, volunteer_id);
+
+-- History views: hot + archived rows, used by pages that show the past
+-- (user.my_participation, admin.reports)
+CREATE VIEW events_history AS
+  SELECT event_id, event_name, location, event_date, start_time, duration,
+         event_leader_id, FALSE AS archived, status
+  FROM events
+  UNION ALL
+  SELECT event_id, event_name, location, event_date, start_time, duration,
+         event_leader_id, TRUE AS archived, status
+  FROM events_archive;
+
+CREATE VIEW eventregistrations_history AS
+  SELECT registration_id, event_id, volunteer_id, registered_at, attendance FROM eventregistrations
+  UNION ALL
+  SELECT registration_id, event_id, volunteer_id, registered_at, attendance FROM eventregistrations_archive;
+
+CREATE VIEW eventoutcomes_history AS
+  SELECT outcome_id, event_id, num_attendees, bags_collected, recyclables_sorted,
+         other_achievements, recorded_at FROM eventoutcomes
+  UNION ALL
+  SELECT outcome_id, event_id, num_attendees, bags_collected, recyclables_sorted,
+         other_achievements, recorded_at FROM eventoutcomes_archive;
+
+CREATE VIEW feedback_history AS
+  SELECT feedback_id, event_id, volunteer_id, rating, comments, submitted_at FROM feedback
+  UNION ALL
+  SELECT feedback_id, event_id, volunteer_id, rating, comments, submitted_at FROM feedback_archive;
+
+-- =============================================
+-- Background jobs (see loginapp/jobs.py, 'flask worker')
+-- =============================================
+CREATE TABLE jobs (
+  job_id BIGSERIAL PRIMARY KEY,
+  task VARCHAR(100) NOT NULL,
+  payload JSONB NOT NULL DEFAULT '{}',
+  dedupe_key VARCHAR(100),
+  status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP,
+  finished_at TIMESTAMP,
+  duration_ms INTEGER,
+  last_error TEXT,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  heartbeat_at TIMESTAMP -- renewed while a worker runs the job
+);
+
+-- Workers claim the oldest due job; only queued/running rows are indexed
+CREATE INDEX idx_jobs_ready ON jobs(run_at) WHERE status = 'queued';
+CREATE INDEX idx_jobs_running ON jobs(started_at) WHERE status = 'running';
+CREATE UNIQUE INDEX idx_jobs_dedupe ON jobs(task, dedupe_key) WHERE status = 'queued';
+CREATE INDEX idx_jobs_finished ON jobs(finished_at);
+
+-- Results of expensive queries, refreshed by jobs (e.g. admin reports)
+CREATE TABLE report_snapshots (
+  name VARCHAR(50) PRIMARY KEY,
+  data JSONB NOT NULL,
+  computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Reminders claimed and sent (see loginapp/reminders.py); the primary key makes
+-- 'flask send-reminders' idempotent. sent_at stays NULL until the message is
+-- out; an unsent claim older than the lease is taken over by the next run.
+-- Rows go away with the event.
+CREATE TABLE reminder_sends (
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  volunteer_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  kind VARCHAR(20) NOT NULL DEFAULT 'day_before',
+  sent_at TIMESTAMP,
+  claimed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (event_id, volunteer_id, kind)
+);
+CREATE INDEX idx_reminder_sends_volunteer ON reminder_sends(volunteer_id);
+
+-- =============================================
+-- Calendar feeds (see loginapp/routes/calendar.py)
+-- 'version' changes whenever anything in the user's feed may have changed;
+-- the feed ETag is built from it, so polls can answer 304 from one PK lookup.
+-- =============================================
+CREATE TABLE calendar_feeds (
+  user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+  token VARCHAR(64) NOT NULL UNIQUE,
+  version BIGINT NOT NULL DEFAULT 0,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Registrations added / removed: bump those volunteers (once per statement)
+CREATE FUNCTION calendar_bump_volunteers() RETURNS trigger AS $$
+BEGIN
+  UPDATE calendar_feeds f
+  SET version = f.version + 1
+  FROM (SELECT DISTINCT volunteer_id FROM changed_rows) c
+  WHERE f.user_id = c.volunteer_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Events created / changed / removed: bump their leaders and registered volunteers
+CREATE FUNCTION calendar_bump_events() RETURNS trigger AS $$
+BEGIN
+  UPDATE calendar_feeds f
+  SET version = f.version + 1
+  FROM (
+    SELECT event_leader_id AS user_id FROM changed_rows
+    UNION
+    SELECT er.volunteer_id FROM eventregistrations er JOIN changed_rows c ON c.event_id = er.event_id
+  ) u
+  WHERE f.user_id = u.user_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER calendar_registrations_insert AFTER INSERT ON eventregistrations
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_volunteers();
+CREATE TRIGGER calendar_registrations_delete AFTER DELETE ON eventregistrations
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_volunteers();
+CREATE TRIGGER calendar_events_insert AFTER INSERT ON events
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_events();
+CREATE TRIGGER calendar_events_update AFTER UPDATE ON events
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_events();
+CREATE TRIGGER calendar_events_delete AFTER DELETE ON events
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_events();
+
+-- =============================================
+-- Incrementally maintained aggregates (see loginapp/stats.py)
+-- Updated in the same transaction as submit_feedback, mark_attendance and
+-- outcome recording; 'flask rebuild-stats' recomputes them from history.
+-- No foreign key to events: the numbers outlive archiving.
+-- =============================================
+CREATE TABLE event_feedback_stats (
+  event_id INTEGER PRIMARY KEY,
+  rating_count INTEGER NOT NULL DEFAULT 0,
+  rating_sum INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE volunteer_stats (
+  volunteer_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+  events_attended INTEGER NOT NULL DEFAULT 0,
+  minutes_volunteered INTEGER NOT NULL DEFAULT 0,
+  bags_collected INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- admin.reports: top volunteers by time given
+CREATE INDEX idx_volunteer_stats_minutes ON volunteer_stats(minutes_volunteered DESC);
+
+-- Recorded outcomes per location, leader and month (leader.record_outcome)
+CREATE TABLE outcome_leaderboard (
+  month DATE NOT NULL,
+  location VARCHAR(255) NOT NULL,
+  event_leader_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  events_recorded INTEGER NOT NULL DEFAULT 0,
+  bags_collected INTEGER NOT NULL DEFAULT 0,
+  recyclables_sorted INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (month, location, event_leader_id)
+);
+
+-- users ON DELETE CASCADE
+CREATE INDEX idx_outcome_leaderboard_leader ON outcome_leaderboard(event_leader_id);
+
+-- =============================================
+-- Server-side login sessions (see loginapp/sessions.py)
+-- The signed cookie holds session_id; role and status are read from users
+-- on every request, so admin changes apply without logging out.
+-- =============================================
+CREATE TABLE user_sessions (
+  session_id VARCHAR(64) PRIMARY KEY,
+  user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  expires_at TIMESTAMP NOT NULL
+);
+
+-- Revoking every session of one user; purging expired sessions
+CREATE INDEX idx_user_sessions_user ON user_sessions(user_id);
+CREATE INDEX idx_user_sessions_expires ON user_sessions(expires_at);
+
+-- Role / status / name changes: tell every app process to drop its cached
+-- principal (NOTIFY is delivered on commit); deactivated users are logged out
+CREATE FUNCTION users_principal_changed() RETURNS trigger AS $$
+DECLARE
+  changed_user_id INTEGER;
+BEGIN
+  FOR changed_user_id IN
+    SELECT n.user_id
+    FROM new_rows n
+    JOIN old_rows o ON o.user_id = n.user_id
+    WHERE (n.username, n.full_name, n.role, n.status)
+          IS DISTINCT FROM (o.username, o.full_name, o.role, o.status)
+  LOOP
+    PERFORM pg_notify('principal_changed', changed_user_id::text);
+  END LOOP;
+
+  DELETE FROM user_sessions s
+  USING new_rows n
+  WHERE s.user_id = n.user_id AND n.status <> 'active';
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_principal_update AFTER UPDATE ON users
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION users_principal_changed();
+
+-- =============================================
+-- Event capacity and waitlist (see loginapp/seats.py)
+-- A limited event has one event_seats row per seat, kept in step with
+-- events.capacity by trigger. Signups claim a free seat with
+-- FOR UPDATE SKIP LOCKED, so concurrent signups lock different seat rows
+-- instead of queueing on the event row. Deleting a registration frees its
+-- seat (ON DELETE SET NULL). Overflow waits in event_waitlist in arrival order.
+-- =============================================
+CREATE TABLE event_seats (
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  seat_no INTEGER NOT NULL,
+  registration_id INTEGER UNIQUE REFERENCES eventregistrations(registration_id) ON DELETE SET NULL,
+  PRIMARY KEY (event_id, seat_no)
+);
+
+-- Free seats of one event, lowest seat first
+CREATE INDEX idx_event_seats_free ON event_seats(event_id, seat_no) WHERE registration_id IS NULL;
+
+CREATE TABLE event_waitlist (
+  waitlist_id SERIAL PRIMARY KEY,
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  volunteer_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (event_id, volunteer_id)
+);
+
+-- Front of the queue of one event; a volunteer's waitlist entries (users ON DELETE CASCADE)
+CREATE INDEX idx_event_waitlist_queue ON event_waitlist(event_id, waitlist_id);
+CREATE INDEX idx_event_waitlist_volunteer ON event_waitlist(volunteer_id);
+
+-- One seat row per seat of events.capacity; refuses to drop below the seats in use
+CREATE FUNCTION sync_event_seats() RETURNS trigger AS $$
+DECLARE
+  seat_count INTEGER;
+  removed INTEGER;
+BEGIN
+  IF NEW.capacity IS NULL THEN
+    DELETE FROM event_seats WHERE event_id = NEW.event_id;
+    RETURN NULL;
+  END IF;
+
+  SELECT count(*) INTO seat_count FROM event_seats WHERE event_id = NEW.event_id;
+  IF seat_count = 0 THEN
+    IF TG_OP = 'UPDATE' THEN
+      -- Wait for signups in flight (they hold KEY SHARE on this row), then
+      -- give the current registrations the first seats in signup order
+      PERFORM 1 FROM events WHERE event_id = NEW.event_id FOR UPDATE;
+      IF (SELECT count(*) FROM eventregistrations WHERE event_id = NEW.event_id) > NEW.capacity THEN
+        RAISE EXCEPTION 'Capacity % is below the number of registered volunteers', NEW.capacity
+          USING ERRCODE = 'check_violation';
+      END IF;
+    END IF;
+    INSERT INTO event_seats (event_id, seat_no, registration_id)
+    SELECT NEW.event_id, s.n, r.registration_id
+    FROM generate_series(1, NEW.capacity) AS s(n)
+    LEFT JOIN (
+      SELECT registration_id, row_number() OVER (ORDER BY registration_id) AS n
+      FROM eventregistrations
+      WHERE event_id = NEW.event_id
+    ) r ON r.n = s.n;
+  ELSIF NEW.capacity > seat_count THEN
+    INSERT INTO event_seats (event_id, seat_no)
+    SELECT NEW.event_id, m.top + s.n
+    FROM (SELECT max(seat_no) AS top FROM event_seats WHERE event_id = NEW.event_id) m,
+         generate_series(1, NEW.capacity - seat_count) AS s(n);
+  ELSIF NEW.capacity < seat_count THEN
+    DELETE FROM event_seats
+    WHERE event_id = NEW.event_id
+      AND seat_no IN (
+        SELECT seat_no FROM event_seats
+        WHERE event_id = NEW.event_id AND registration_id IS NULL
+        ORDER BY seat_no DESC
+        LIMIT seat_count - NEW.capacity
+        FOR UPDATE
+      );
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    IF removed < seat_count - NEW.capacity THEN
+      RAISE EXCEPTION 'Capacity % is below the number of registered volunteers', NEW.capacity
+        USING ERRCODE = 'check_violation';
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER events_seats_insert AFTER INSERT ON events
+  FOR EACH ROW WHEN (NEW.capacity IS NOT NULL) EXECUTE FUNCTION sync_event_seats();
+CREATE TRIGGER events_seats_update AFTER UPDATE OF capacity ON events
+  FOR EACH ROW WHEN (OLD.capacity IS DISTINCT FROM NEW.capacity) EXECUTE FUNCTION sync_event_seats();
+
+-- =============================================
+-- Interest-based recommendations (see loginapp/recommendations.py)
+-- users.environmental_interests and the name, location and description of
+-- events are reduced to English word stems ('beach cleanups, recycling' ->
+-- beach, cleanup, recycl) in user_tags / event_tags; only volunteers are
+-- tagged. event_recommendations holds matching upcoming events per volunteer,
+-- scored by the shared tags, so a volunteer's suggestions are read with one
+-- index scan. A trigger rescores a volunteer whose interests change; new and
+-- edited events are scored by a background job.
+-- =============================================
+CREATE TABLE user_tags (
+  user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  tag TEXT NOT NULL,
+  PRIMARY KEY (user_id, tag)
+);
+
+CREATE INDEX idx_user_tags_tag ON user_tags(tag);
+
+CREATE TABLE event_tags (
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  tag TEXT NOT NULL,
+  weight SMALLINT NOT NULL, -- 2 when the tag is in the event name, otherwise 1
+  PRIMARY KEY (event_id, tag)
+);
+
+CREATE INDEX idx_event_tags_tag ON event_tags(tag);
+
+CREATE TABLE event_recommendations (
+  volunteer_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  score INTEGER NOT NULL,
+  PRIMARY KEY (volunteer_id, event_id)
+);
+
+-- A volunteer's best matches first; rescoring one event (events ON DELETE CASCADE)
+CREATE INDEX idx_event_recommendations_score ON event_recommendations(volunteer_id, score DESC, event_id);
+CREATE INDEX idx_event_recommendations_event ON event_recommendations(event_id);
+
+-- Word stems of free text; 'clean-up' and 'cleanups' both become 'cleanup'
+CREATE FUNCTION text_tags(txt TEXT) RETURNS SETOF TEXT AS $$
+  SELECT lexeme
+  FROM unnest(to_tsvector('english', regexp_replace(coalesce(txt, ''), '(\w)-(\w)', '\1\2', 'g')))
+  WHERE lexeme ~ '^[a-z]{3,}$'
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION event_text_tags(event_name TEXT, location TEXT, description TEXT)
+RETURNS TABLE (tag TEXT, weight SMALLINT) AS $$
+  SELECT t.tag, max(t.weight)::SMALLINT
+  FROM (
+    SELECT text_tags(event_name) AS tag, 2 AS weight
+    UNION ALL
+    SELECT text_tags(location || ' ' || coalesce(description, '')), 1
+  ) t
+  GROUP BY t.tag
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION users_refresh_tags() RETURNS trigger AS $$
+BEGIN
+  DELETE FROM user_tags WHERE user_id = NEW.user_id;
+  DELETE FROM event_recommendations WHERE volunteer_id = NEW.user_id;
+  -- Only volunteers are shown suggestions
+  IF NEW.role <> 'volunteer' THEN
+    RETURN NULL;
+  END IF;
+
+  INSERT INTO user_tags (user_id, tag)
+  SELECT DISTINCT NEW.user_id, t FROM text_tags(NEW.environmental_interests) t;
+
+  INSERT INTO event_recommendations (volunteer_id, event_id, score)
+  SELECT NEW.user_id, et.event_id, sum(et.weight)
+  FROM user_tags ut
+  JOIN event_tags et ON et.tag = ut.tag
+  JOIN events e ON e.event_id = et.event_id
+  WHERE ut.user_id = NEW.user_id
+    AND e.status = 'scheduled'
+    AND e.event_date >= CURRENT_DATE
+  GROUP BY et.event_id
+  ON CONFLICT (volunteer_id, event_id) DO UPDATE SET score = EXCLUDED.score;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_tags_insert AFTER INSERT ON users
+  FOR EACH ROW WHEN (NEW.environmental_interests IS NOT NULL AND NEW.role = 'volunteer')
+  EXECUTE FUNCTION users_refresh_tags();
+CREATE TRIGGER users_tags_update AFTER UPDATE OF environmental_interests, role ON users
+  FOR EACH ROW
+  WHEN ((OLD.environmental_interests, OLD.role) IS DISTINCT FROM (NEW.environmental_interests, NEW.role))
+  EXECUTE FUNCTION users_refresh_tags();
+
+-- Tags only: scoring an event against every volunteer is left to the
+-- score_events job the routes queue (see loginapp/recommendations.py)
+CREATE FUNCTION events_refresh_tags() RETURNS trigger AS $$
+BEGIN
+  DELETE FROM event_tags WHERE event_id = NEW.event_id;
+  INSERT INTO event_tags (event_id, tag, weight)
+  SELECT NEW.event_id, t.tag, t.weight
+  FROM event_text_tags(NEW.event_name, NEW.location, NEW.description) t;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER events_tags_insert AFTER INSERT ON events
+  FOR EACH ROW EXECUTE FUNCTION events_refresh_tags();
+CREATE TRIGGER events_tags_update AFTER UPDATE OF event_name, location, description ON events
+  FOR EACH ROW
+  WHEN ((OLD.event_name, OLD.location, OLD.description)
+        IS DISTINCT FROM (NEW.event_name, NEW.location, NEW.description))
+  EXECUTE FUNCTION events_refresh_tags();
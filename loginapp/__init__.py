@@ -7,22 +7,57 @@ All extensions, configurations, and blueprints are registered here.
 
 from flask import Flask, render_template, session, send_from_directory
 from flask_bcrypt import Bcrypt
+from jinja2 import FileSystemBytecodeCache
 from psycopg2.extras import RealDictCursor
 import os
 
 # Relative imports (all files are inside the same package)
+from .admission import init_admission
 from .db import init_db, get_db
+from .recommendations import recommended_events
+from .sessions import init_sessions
+from .statements import init_statements, statement
 from .routes.auth import auth_bp
 from .routes.user import user_bp
 from .routes.events import events_bp
 from .routes.leader import leader_bp
 from .routes.admin import admin_bp
+from .routes.api import api_bp
+from .routes.calendar_feed import calendar_bp
+from .routes.health import health_bp
+from .cli import register_commands
 from .utils.decorators import login_required, role_required
 from .utils.helpers import allowed_file
+from .utils.cache import FragmentCacheExtension
+from .utils.coalesce import flights
+from .utils.serialization import AppJSONProvider
 
 # Global bcrypt instance
 bcrypt = Bcrypt()
 
+# Reminder box on the home page (every volunteer page view)
+HOME_UPCOMING = statement('home_upcoming', """
+    SELECT e.event_id, e.event_name, e.event_date, e.start_time, e.location
+    FROM events e
+    JOIN eventregistrations er ON e.event_id = er.event_id
+    WHERE er.volunteer_id = %s
+      AND e.event_date >= CURRENT_DATE
+      AND e.status = 'scheduled'
+    ORDER BY e.event_date, e.start_time
+    LIMIT 5
+""")
+
+
+def _home_events(user_id):
+    """(upcoming registrations, recommended events) for the volunteer's home page"""
+    cur = get_db().cursor(cursor_factory=RealDictCursor)
+    try:
+        HOME_UPCOMING.execute(cur, (user_id,))
+        upcoming = cur.fetchall()
+        return upcoming, recommended_events(cur, user_id)
+    finally:
+        cur.close()
+
 
 def create_app(config_name='default'):
     """
@@ -36,13 +71,38 @@ def create_app(config_name='default'):
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'profile_images')
     app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}
     app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024  # 2MB max upload size
+    app.config['ARCHIVE_AFTER_DAYS'] = 90  # events older than this move to *_archive tables
+
+    # Event reminders: 'file' writes .eml files to REMINDER_OUTBOX, 'smtp' uses SMTP_*
+    app.config['REMINDER_TRANSPORT'] = os.environ.get('REMINDER_TRANSPORT', 'file')
+    app.config['REMINDER_OUTBOX'] = os.path.join(app.instance_path, 'outbox')
+    app.config['REMINDER_SENDER'] = 'EcoCleanUp Hub <no-reply@ecocleanup.example>'
+    app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST', 'localhost')
+    app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 587))
+    app.config['SMTP_USERNAME'] = os.environ.get('SMTP_USERNAME')
+    app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD')
 
     # Create upload folder if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+    # Templates: compiled bytecode is kept on disk so new workers skip
+    # recompiling, and {% cache %} fragments are kept in memory.
+    # (Must be set before the Jinja environment is first used.)
+    jinja_cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(jinja_cache_dir, exist_ok=True)
+    app.jinja_options = dict(app.jinja_options,
+                             bytecode_cache=FileSystemBytecodeCache(jinja_cache_dir),
+                             extensions=[FragmentCacheExtension])
+
+    # Compact, date/time-aware JSON for jsonify()
+    app.json = AppJSONProvider(app)
+
     # Initialize extensions
     bcrypt.init_app(app)
     init_db(app)  # Initialize PostgreSQL connection pool
+    init_sessions(app)  # g.principal from the server-side session
+    init_statements(app)  # Prepared statements for the hot queries
+    init_admission(app)  # Per-route DB time budgets and load shedding
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -50,29 +110,27 @@ def create_app(config_name='default'):
     app.register_blueprint(events_bp)
     app.register_blueprint(leader_bp, url_prefix='/leader')
     app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+    app.register_blueprint(calendar_bp, url_prefix='/calendar')
+    app.register_blueprint(health_bp)
+
+    # Maintenance commands (flask --app run <command>)
+    register_commands(app)
 
     # Home page route (shows upcoming events reminder for volunteers)
     @app.route('/')
     def home():
         upcoming = []
+        recommended = []
         show_reminder = False
         upcoming_events_modal = []  # Data for the modal popup
 
         if 'user_id' in session and session.get('role') == 'volunteer':
             try:
-                conn = get_db()
-                cur = conn.cursor(cursor_factory=RealDictCursor)
-                cur.execute("""
-                    SELECT e.event_id, e.event_name, e.event_date, e.start_time, e.location
-                    FROM events e
-                    JOIN eventregistrations er ON e.event_id = er.event_id
-                    WHERE er.volunteer_id = %s
-                      AND e.event_date >= CURRENT_DATE
-                    ORDER BY e.event_date, e.start_time
-                    LIMIT 5
-                """, (session['user_id'],))
-                upcoming = cur.fetchall()
-                cur.close()
+                # Repeated loads by the same user (reloads, double clicks) share one query
+                user_id = session['user_id']
+                upcoming, recommended = flights.do(('home_events', user_id),
+                                                   lambda: _home_events(user_id))
 
                 show_reminder = len(upcoming) > 0
                 if show_reminder:
@@ -83,6 +141,7 @@ def create_app(config_name='default'):
 
         return render_template('home.html',
                                upcoming=upcoming,
+                               recommended=recommended,
                                show_reminder=show_reminder,
                                upcoming_events_modal=upcoming_events_modal)
 
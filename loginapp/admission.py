@@ -0,0 +1,157 @@
+"""
+loginapp/admission.py - Database time budgets and priority admission control
+
+This module provides:
+- request_policy(): (priority, time budget in ms) of the current request
+- AdmissionGate: priority-aware limit on requests holding a primary connection
+- Overloaded: raised when a request is shed
+- init_admission(app): config defaults and the 503 responses
+
+Every route has a priority ('high', 'normal' or 'low') and a database time
+budget, looked up in DB_PRIORITIES / DB_TIME_BUDGETS by endpoint
+('admin.reports'), then blueprint ('admin'), then 'default'. get_db()
+applies the budget as statement_timeout on the connection it checks out and
+close_db() resets it, so one slow admin query cannot hold a connection for
+long.
+
+When the primary pool is busy, a request of a given priority only gets a
+connection while fewer than ADMISSION_SHARES[priority] of the pool is in use
+and no higher-priority request is waiting. Otherwise it queues for up to
+ADMISSION_WAIT[priority] seconds and is then answered with 503 and
+Retry-After. With the defaults, admin pages stop getting connections once
+half the pool is busy, keeping the rest for logins and registrations.
+
+A query cancelled by the budget (QueryCanceled) is also answered with 503;
+routes that turn database errors into a flash message roll back and
+re-raise it instead, so a blown budget is never reported as a failed save.
+"""
+
+import threading
+import time
+
+import psycopg2.errors
+from flask import current_app, has_request_context, jsonify, render_template, request
+
+PRIORITIES = ('high', 'normal', 'low')
+
+RETRY_AFTER = 5  # seconds, sent with 503 responses
+
+
+class Overloaded(Exception):
+    """No database connection could be granted within the request's wait limit"""
+
+
+def _lookup(table, default):
+    endpoint = request.endpoint or ''
+    for key in (endpoint, endpoint.rpartition('.')[0], 'default'):
+        if key in table:
+            return table[key]
+    return default
+
+
+def request_policy():
+    """(priority, budget_ms) of the current request; budget None leaves the server default"""
+    if not has_request_context():
+        return 'normal', None
+    config = current_app.config
+    return (_lookup(config['DB_PRIORITIES'], 'normal'),
+            _lookup(config['DB_TIME_BUDGETS'], None) or None)
+
+
+class AdmissionGate:
+    """Counts requests holding a primary connection, admitting them by priority"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.in_use = 0
+        self.waiting = dict.fromkeys(PRIORITIES, 0)
+        self.shed = dict.fromkeys(PRIORITIES, 0)
+        self._cond = threading.Condition()
+
+    def _may_enter(self, priority, limit):
+        higher = PRIORITIES[:PRIORITIES.index(priority)]
+        return self.in_use < limit and not any(self.waiting[p] for p in higher)
+
+    def acquire(self, priority):
+        """Take a slot or raise Overloaded after this priority's wait limit"""
+        config = current_app.config
+        limit = max(1, int(self.capacity * config['ADMISSION_SHARES'][priority]))
+        with self._cond:
+            if self._may_enter(priority, limit):
+                self.in_use += 1
+                return
+            deadline = time.monotonic() + config['ADMISSION_WAIT'][priority]
+            self.waiting[priority] += 1
+            try:
+                while not self._may_enter(priority, limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed[priority] += 1
+                        raise Overloaded(priority)
+                    self._cond.wait(remaining)
+                self.in_use += 1
+            finally:
+                self.waiting[priority] -= 1
+                # Lower priorities may have been held back only by this waiter
+                self._cond.notify_all()
+
+    def try_acquire(self, priority):
+        """Take a slot only if this priority may have one right now (never queues)"""
+        limit = max(1, int(self.capacity * current_app.config['ADMISSION_SHARES'][priority]))
+        with self._cond:
+            if not self._may_enter(priority, limit):
+                return False
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify_all()
+
+    def pressure(self):
+        with self._cond:
+            return {
+                'in_use': self.in_use,
+                'capacity': self.capacity,
+                'waiting': dict(self.waiting),
+                'shed': dict(self.shed),
+            }
+
+
+def _busy(message):
+    if request.path.startswith('/api/'):
+        response = jsonify(error=message)
+    else:
+        response = current_app.make_response(render_template('busy.html', message=message))
+    response.status_code = 503
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
+def init_admission(app):
+    """Default budgets and priorities; 503 for shed requests and blown budgets"""
+    app.config.setdefault('DB_TIME_BUDGETS', {
+        'default': 5000,
+        'admin': 3000,
+        'admin.reports': 10000,         # recomputes the snapshot when it is stale
+        'admin.import_users': 60000,    # bulk COPY of a whole CSV file
+    })
+    app.config.setdefault('DB_PRIORITIES', {
+        'default': 'normal',
+        'auth': 'high',
+        'events': 'high',
+        'health': 'high',
+        'admin': 'low',
+    })
+    app.config.setdefault('ADMISSION_SHARES', {'high': 1.0, 'normal': 0.9, 'low': 0.5})
+    app.config.setdefault('ADMISSION_WAIT', {'high': 3.0, 'normal': 1.0, 'low': 0.25})
+
+    @app.errorhandler(Overloaded)
+    def overloaded(error):
+        return _busy('The site is busy right now. Please try again in a few seconds.')
+
+    @app.errorhandler(psycopg2.errors.QueryCanceled)
+    def query_canceled(error):
+        print(f"Query cancelled ({request.endpoint}): {error}")
+        return _busy('That request took too long. Please try again in a moment.')
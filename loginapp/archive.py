@@ -0,0 +1,192 @@
+"""
+loginapp/archive.py - Move completed events into cold storage
+
+This module provides:
+- archive_past_events(conn, ...): move old events and everything hanging off
+  them (feedback, outcomes, registrations) into the *_archive tables
+- purge_cancelled_events(conn, ...): the same move for cancelled events,
+  a few hundred dependent rows per transaction
+
+Hot tables (events, eventregistrations, ...) then only hold recent and
+upcoming rows, so the indexes used by list_events / register_event / home()
+stay small. Pages that show history read the *_history views instead.
+
+Run it from cron via the Flask CLI:
+    flask --app run archive-events --older-than-days 90
+    flask --app run purge-cancelled-events
+"""
+
+import time
+
+# Children first, so foreign keys are never violated mid-batch
+ARCHIVED_TABLES = ('feedback', 'eventoutcomes', 'eventregistrations', 'events')
+PRIMARY_KEYS = {'feedback': 'feedback_id', 'eventoutcomes': 'outcome_id',
+                'eventregistrations': 'registration_id', 'events': 'event_id'}
+
+
+def _shared_columns(cur, table):
+    """
+    Columns that exist in both the hot table and its archive, in hot-table order.
+    Naming them explicitly keeps the move working even if the two tables got
+    their columns added in a different order by migrations.
+    """
+    cur.execute("""
+        SELECT h.column_name
+        FROM information_schema.columns h
+        JOIN information_schema.columns a
+          ON a.table_schema = h.table_schema
+         AND a.table_name = %s
+         AND a.column_name = h.column_name
+        WHERE h.table_schema = current_schema()
+          AND h.table_name = %s
+        ORDER BY h.ordinal_position
+    """, (f"{table}_archive", table))
+    return [row[0] for row in cur.fetchall()]
+
+
+def archive_past_events(conn, older_than_days=90, batch_size=100, pause=0.0):
+    """
+    Move events that ended more than 'older_than_days' ago into cold storage.
+
+    Works in batches of 'batch_size' events, one short transaction each, and
+    skips rows another transaction has locked, so it can run while the site
+    is live. Returns the number of events archived.
+    """
+    total = 0
+
+    with conn.cursor() as cur:
+        columns = {table: ', '.join(_shared_columns(cur, table)) for table in ARCHIVED_TABLES}
+    conn.commit()
+
+    while True:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT event_id
+                FROM events
+                WHERE event_date < CURRENT_DATE - %s
+                ORDER BY event_date, event_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (older_than_days, batch_size))
+            event_ids = [row[0] for row in cur.fetchall()]
+
+            if not event_ids:
+                conn.commit()
+                break
+
+            for table in ARCHIVED_TABLES:
+                cols = columns[table]
+                cur.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM {table}
+                        WHERE event_id = ANY(%s)
+                        RETURNING {cols}
+                    )
+                    INSERT INTO {table}_archive ({cols})
+                    SELECT {cols} FROM moved
+                """, (event_ids,))
+
+            conn.commit()
+            total += len(event_ids)
+            print(f"Archived {total} events so far (last batch: {len(event_ids)})")
+
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        if pause:
+            time.sleep(pause)
+
+    return total
+
+
+def purge_cancelled_events(conn, batch_size=500, pause=0.0):
+    """
+    Move cancelled events and their dependent rows into cold storage.
+
+    Cancelling only flips events.status, so the request never touches the
+    registrations. Here each transaction moves at most 'batch_size' rows per
+    child table for one cancelled event; the event row itself goes last,
+    once nothing references it any more. Events locked by another worker are
+    skipped. Returns the number of events purged.
+    """
+    purged = 0
+    busy = []   # events whose children are locked elsewhere; left for the next run
+
+    with conn.cursor() as cur:
+        columns = {table: ', '.join(_shared_columns(cur, table)) for table in ARCHIVED_TABLES}
+    conn.commit()
+
+    while True:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT event_id
+                FROM events
+                WHERE status = 'cancelled'
+                  AND event_id <> ALL(%s)
+                ORDER BY cancelled_at, event_id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """, (busy,))
+            row = cur.fetchone()
+
+            if not row:
+                conn.commit()
+                break
+            event_id = row[0]
+
+            moved = 0
+            for table in ARCHIVED_TABLES[:-1]:
+                cols, key = columns[table], PRIMARY_KEYS[table]
+                cur.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM {table}
+                        WHERE {key} IN (
+                            SELECT {key} FROM {table}
+                            WHERE event_id = %s
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING {cols}
+                    )
+                    INSERT INTO {table}_archive ({cols})
+                    SELECT {cols} FROM moved
+                """, (event_id, batch_size))
+                moved += cur.rowcount
+
+            if moved == 0:
+                cols = columns['events']
+                cur.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM events
+                        WHERE event_id = %(id)s
+                          AND NOT EXISTS (SELECT 1 FROM eventregistrations WHERE event_id = %(id)s)
+                          AND NOT EXISTS (SELECT 1 FROM eventoutcomes WHERE event_id = %(id)s)
+                          AND NOT EXISTS (SELECT 1 FROM feedback WHERE event_id = %(id)s)
+                        RETURNING {cols}
+                    )
+                    INSERT INTO events_archive ({cols})
+                    SELECT {cols} FROM moved
+                """, {'id': event_id})
+                if cur.rowcount:
+                    purged += 1
+                    print(f"Purged {purged} cancelled events so far")
+                else:
+                    busy.append(event_id)
+
+            conn.commit()
+
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        if pause:
+            time.sleep(pause)
+
+    return purged
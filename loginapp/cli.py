@@ -0,0 +1,122 @@
+"""
+loginapp/cli.py - Flask CLI commands for scheduled / maintenance jobs
+
+Run from the project root, e.g.:
+    flask --app run archive-events
+    flask --app run worker --concurrency 4
+"""
+
+import json
+
+import click
+from flask import current_app
+
+from .db import get_db
+from .archive import archive_past_events, purge_cancelled_events
+from .jobs import enqueue, run_worker, job_stats, TASKS
+from .reminders import dispatch_reminders
+from .recommendations import rebuild_recommendations
+from .stats import rebuild_stats
+from .uploads import collect_garbage
+from . import tasks  # noqa: F401  (registers the job handlers)
+
+
+def register_commands(app):
+    """Attach all maintenance commands to app.cli"""
+
+    @app.cli.command('archive-events')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Archive events that ended more than N days ago (default: ARCHIVE_AFTER_DAYS)')
+    @click.option('--batch-size', type=int, default=100, help='Events moved per transaction')
+    @click.option('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+    def archive_events_command(older_than_days, batch_size, pause):
+        """Move completed events and their registrations/feedback to cold storage."""
+        if older_than_days is None:
+            older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+        moved = archive_past_events(get_db(), older_than_days, batch_size, pause)
+        click.echo(f"Archived {moved} event(s) older than {older_than_days} days.")
+
+    @app.cli.command('purge-cancelled-events')
+    @click.option('--batch-size', type=int, default=500,
+                  help='Registrations / feedback / outcomes moved per transaction')
+    @click.option('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+    def purge_cancelled_events_command(batch_size, pause):
+        """Move cancelled events and their dependent rows to cold storage."""
+        purged = purge_cancelled_events(get_db(), batch_size, pause)
+        click.echo(f"Purged {purged} cancelled event(s).")
+
+    @app.cli.command('worker')
+    @click.option('--concurrency', type=int, default=2, help='Jobs run in parallel (threads)')
+    @click.option('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+    @click.option('--burst', is_flag=True, help='Exit once the queue is empty (e.g. from cron)')
+    def worker_command(concurrency, poll_interval, burst):
+        """Run queued background jobs until stopped (Ctrl+C)."""
+        click.echo(f"Worker started: {concurrency} thread(s), tasks: {', '.join(sorted(TASKS))}")
+        counts = run_worker(current_app._get_current_object(), concurrency, poll_interval, burst)
+        click.echo(f"Worker stopped: {counts['done']} done, {counts['failed']} failed.")
+
+    @app.cli.command('enqueue-job')
+    @click.argument('task_name')
+    @click.option('--payload', default='{}', help='JSON arguments for the task')
+    @click.option('--delay', type=int, default=0, help='Seconds before the job may run')
+    def enqueue_job_command(task_name, payload, delay):
+        """Queue a background job (e.g. archive_events from cron)."""
+        if task_name not in TASKS:
+            raise click.BadParameter(f"unknown task; choose from: {', '.join(sorted(TASKS))}")
+        conn = get_db()
+        with conn.cursor() as cur:
+            job_id = enqueue(cur, task_name, json.loads(payload), delay=delay)
+        conn.commit()
+        click.echo(f"Queued job {job_id} ({task_name}).")
+
+    @app.cli.command('jobs-stats')
+    def jobs_stats_command():
+        """Queue depth, failures and job durations per task (last 24 hours)."""
+        rows = job_stats(get_db())
+        if not rows:
+            click.echo("No jobs in the last 24 hours.")
+            return
+        click.echo(f"{'task':<26}{'queued':>8}{'running':>9}{'done':>7}{'failed':>8}"
+                   f"{'avg ms':>9}{'p95 ms':>9}{'max ms':>9}")
+        for r in rows:
+            click.echo(f"{r['task']:<26}{r['queued']:>8}{r['running']:>9}{r['done']:>7}{r['failed']:>8}"
+                       f"{r['avg_ms'] or 0:>9.0f}{r['p95_ms'] or 0:>9.0f}{r['max_ms'] or 0:>9}")
+
+    @app.cli.command('send-reminders')
+    @click.option('--date', 'target_date', type=click.DateTime(['%Y-%m-%d']), default=None,
+                  help='Event date to remind about (default: tomorrow)')
+    @click.option('--batch-size', type=int, default=500, help='Reminders fetched and rendered per batch')
+    @click.option('--workers', type=int, default=4, help='Sending threads')
+    @click.option('--rate', type=float, default=50, help='Maximum messages per second (0 = unlimited)')
+    def send_reminders_command(target_date, batch_size, workers, rate):
+        """Send day-before reminders to registered volunteers (safe to rerun)."""
+        counts = dispatch_reminders(current_app._get_current_object(),
+                                    target_date=target_date.date() if target_date else None,
+                                    batch_size=batch_size, workers=workers, rate=rate)
+        click.echo(f"Reminders: {counts['sent']} sent, {counts['skipped']} already sent, "
+                   f"{counts['failed']} failed.")
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Recompute the feedback and volunteer impact aggregates from scratch."""
+        events, volunteers, leaderboard = rebuild_stats(get_db())
+        click.echo(f"Rebuilt rating stats for {events} event(s), impact stats for {volunteers} volunteer(s) "
+                   f"and {leaderboard} leaderboard row(s).")
+
+    @app.cli.command('rebuild-recommendations')
+    def rebuild_recommendations_command():
+        """Rebuild the interest tag index and recommendation scores from scratch."""
+        users, events, scores = rebuild_recommendations(get_db())
+        click.echo(f"Indexed {users} interest tag(s) and {events} event tag(s); "
+                   f"{scores} recommendation(s) for upcoming events.")
+
+    @app.cli.command('gc-uploads')
+    @click.option('--grace-hours', type=float, default=24,
+                  help='Only remove files older than this (uploads still being saved are younger)')
+    @click.option('--dry-run', is_flag=True, help='Report what would be removed without deleting')
+    def gc_uploads_command(grace_hours, dry_run):
+        """Delete profile images that no user refers to any more."""
+        counts = collect_garbage(get_db(), grace_hours * 3600, dry_run=dry_run)
+        verb = 'would remove' if dry_run else 'removed'
+        click.echo(f"Scanned {counts['scanned']} upload(s): {verb} {counts['removed']} "
+                   f"({counts['reclaimed_bytes'] / 1024 / 1024:.1f} MB), kept {counts['kept']}.")
@@ -2,43 +2,327 @@
 loginapp/db.py - PostgreSQL database connection utilities
 
 This module provides:
-- init_db(app): Initialize connection pool at app startup
-- get_db(): Get a connection from the pool (per-request)
-- close_db(exception): Close connection at end of request
+- connection_params(): psycopg2.connect() arguments from connect.py
+- init_db(app): Initialize connection pools at app startup
+- get_db(readonly=False): Get a connection for the current request
+- gather(*work, readonly=False): Run independent reads concurrently on
+  separate pooled connections (fetchone() / fetchall() build the work items)
+- close_db(exception): Return connections at the end of the request
+- listen(channel, handler): Run handler(payload) for every NOTIFY on channel
+- CompactCursor / CompactRow: light rows for large result sets
+
+Read replicas (connect.dbreplicas) are optional. get_db(readonly=True)
+hands out a replica connection when one is healthy and no more than
+REPLICA_MAX_LAG seconds behind; otherwise it falls back to the primary.
+After a request commits on the primary, that user's reads stay on the
+primary for REPLICA_MAX_LAG seconds so they always see their own writes.
+
+Inside a request, checking out the primary connection passes the admission
+gate (see admission.py) and every checked-out connection gets the route's
+time budget as statement_timeout until close_db(). Its application_name is
+set to the endpoint, so pg_stat_activity and lock monitoring show which
+route each backend is serving.
+
+Pages that run several independent queries (admin reports, the leader's
+event detail) pay one round trip per query on a single connection. gather()
+deals them round-robin over the request's connection and up to
+GATHER_CONNECTIONS extra ones from the same pool (a replica's, when one
+serves this request's reads); pool threads run the extra lanes while the
+calling thread runs its own. Extra primary connections take admission slots
+without queueing, so when the pool is busy a page gets fewer lanes and
+degrades to the serial path instead of holding more of it. Extra lanes run
+in autocommit, so each query reads its own snapshot and nothing they do is
+part of the request's transaction.
+
+Each process runs one listener thread (started on its first request) that
+LISTENs on every channel registered with listen(), so in-process caches can
+be invalidated by changes made in other processes or by migrate.py.
 """
 
+import os
+import select
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+
 import psycopg2
-from psycopg2.pool import SimpleConnectionPool
-from flask import current_app, g
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.pool import ThreadedConnectionPool
+from flask import current_app, g, has_request_context, request, session
+from psycopg2.extras import RealDictCursor
 
 # 從 connect.py 匯入資料庫連線參數
 import connect
 
-# Global connection pool
+from .admission import AdmissionGate, Overloaded, request_policy
+
+# Global connection pool (primary)
 pool = None
 
+# Replica pools, empty when connect.py lists no replicas
+replicas = None
 
-def init_db(app):
+# Priority admission to the primary pool (requests only)
+gate = None
+
+REPLICA_CHECK_INTERVAL = 5  # seconds between lag checks of one replica
+REPLICA_CONNECT_TIMEOUT = 2 # seconds to wait for a replica connection
+LISTEN_RETRY = 5            # seconds before the listener reconnects after an error
+LISTEN_IDLE = 60            # seconds the listener blocks waiting for a notification
+GATHER_CONNECTIONS = 4      # extra connections one gather() call may use
+
+# Run gather() work on the request's connection only when False (for benchmarks)
+gather_enabled = True
+
+# Runs gather()'s extra lanes; threads start on first use (after any fork)
+_gather_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='db-gather')
+
+# A replica whose WAL receiver is not streaming has replayed everything it
+# received, which says nothing about how far behind the primary it is: treat
+# it as unusable. (pg_stat_wal_receiver.status is only visible to superusers
+# and members of pg_read_all_stats / pg_monitor.)
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming')
+            THEN 'Infinity'::float8
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8,
+                      'Infinity'::float8)
+    END
+"""
+
+
+class AppConnection(psycopg2.extensions.connection):
     """
-    Initialize PostgreSQL connection pool when app starts.
-    Pool is created once and reused for all requests.
+    Connection that notes commits made during a request (read-your-writes)
+    and remembers which registered statements it has prepared.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()           # statement names PREPAREd on this connection
+        self.prepared_generation = 0    # statements.generation when they were prepared
+        self.time_budget = None         # statement_timeout (ms) set for the current request
+        self.route = None               # application_name: the endpoint using it
+
+    def commit(self):
+        super().commit()
+        if has_request_context():
+            g.db_committed = True
+
+
+class CompactRow(tuple):
+    """
+    Tuple-backed row: row['col'], row.col and row.get('col') like a
+    RealDictRow, but the column names live once on a class shared by every
+    row of the result instead of in a dict per row.
+
+    Iterating a row yields values (it is a tuple); use keys() / items() for names.
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return f"CompactRow({self._asdict()!r})"
+
+
+@lru_cache(maxsize=256)
+def compact_row_class(fields):
+    """CompactRow subclass for one column list (one property per column, like a namedtuple)"""
+    index = {name: i for i, name in enumerate(fields)}
+    namespace = {'__slots__': (), '_fields': fields, '_index': index}
+    for name, i in index.items():
+        if name.isidentifier() and not name.startswith('_'):
+            namespace[name] = property(itemgetter(i))
+    return type('CompactRow', (CompactRow,), namespace)
+
+
+class CompactCursor(psycopg2.extensions.cursor):
     """
-    global pool
+    Cursor returning CompactRow instances.
+    Use it for pages that materialise many rows (admin lists); JSON
+    responses should keep RealDictCursor, as a CompactRow encodes as a list.
+    """
+
+    _row_class = None
+
+    def execute(self, query, vars=None):
+        self._row_class = None
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars):
+        self._row_class = None
+        return super().executemany(query, vars)
+
+    def callproc(self, procname, vars=None):
+        self._row_class = None
+        return super().callproc(procname, vars)
 
+    def _rows(self):
+        if self._row_class is None:
+            self._row_class = compact_row_class(tuple(d[0] for d in self.description))
+        return self._row_class
+
+    def fetchone(self):
+        t = super().fetchone()
+        return None if t is None else self._rows()(t)
+
+    def fetchmany(self, size=None):
+        ts = super().fetchmany() if size is None else super().fetchmany(size)
+        return list(map(self._rows(), ts))
+
+    def fetchall(self):
+        return list(map(self._rows(), super().fetchall()))
+
+    def __iter__(self):
+        it = super().__iter__()
+        try:
+            first = next(it)
+        except StopIteration:
+            return
+        row_class = self._rows()
+        yield row_class(first)
+        for t in it:
+            yield row_class(t)
+
+
+def connection_params(overrides=None):
+    """Connection keyword arguments for psycopg2.connect()"""
     # 使用 connect.py 裡定義的參數
-    db_params = {
+    params = {
         'dbname': connect.dbname,
         'user': connect.dbuser,
         'password': connect.dbpass,
         'host': connect.dbhost,
         'port': connect.dbport
     }
+    params.update(overrides or {})
+    return params
+
+
+def _replica_params(entry):
+    """connect.dbreplicas entry ('host', 'host:port' or a dict of overrides)"""
+    # connect_timeout: an unreachable replica must fail fast, not hang the request checking it
+    overrides = {'connect_timeout': REPLICA_CONNECT_TIMEOUT}
+    if isinstance(entry, dict):
+        overrides.update(entry)
+    else:
+        host, _, port = entry.partition(':')
+        overrides.update(host=host, port=int(port) if port else connect.dbport)
+    return connection_params(overrides)
+
+
+class ReplicaSet:
+    """
+    Replica pools with a cached lag measurement per replica.
+    choose() returns a replica that is reachable and within max_lag, or None.
+    When a measurement is stale one caller refreshes it; concurrent callers
+    use the cached value instead of waiting for (or repeating) the check.
+    """
+
+    def __init__(self, entries, max_lag, maxconn=20):
+        self.max_lag = max_lag
+        self.replicas = []
+        for entry in entries:
+            params = _replica_params(entry)
+            # minconn=0: an unreachable replica must not stop the app starting
+            self.replicas.append({
+                'name': f"{params['host']}:{params['port']}/{params['dbname']}",
+                'pool': ThreadedConnectionPool(0, maxconn, connection_factory=AppConnection, **params),
+                'lag': None,
+                'checked_at': 0.0,
+                'checking': threading.Lock(),
+            })
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _check(self, replica):
+        conn = None
+        try:
+            conn = replica['pool'].getconn()
+            with conn.cursor() as cur:
+                cur.execute(REPLICA_LAG_QUERY)
+                replica['lag'] = cur.fetchone()[0]
+            conn.rollback()
+        except psycopg2.Error as e:
+            print(f"Replica {replica['name']} unavailable: {e}")
+            replica['lag'] = None
+            if conn is not None:
+                replica['pool'].putconn(conn, close=True)
+                conn = None
+        finally:
+            if conn is not None:
+                replica['pool'].putconn(conn)
+        replica['checked_at'] = time.monotonic()
 
-    pool = SimpleConnectionPool(
-        minconn=1,
+    def choose(self):
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if (time.monotonic() - replica['checked_at'] > REPLICA_CHECK_INTERVAL
+                    and replica['checking'].acquire(blocking=False)):
+                try:
+                    if time.monotonic() - replica['checked_at'] > REPLICA_CHECK_INTERVAL:
+                        self._check(replica)
+                finally:
+                    replica['checking'].release()
+            if replica['lag'] is not None and replica['lag'] <= self.max_lag:
+                return replica
+        return None
+
+
+def init_db(app):
+    """
+    Initialize PostgreSQL connection pool when app starts.
+    Pool is created once and reused for all requests.
+    """
+    global pool, replicas, gate
+
+    # Thread-safe: threaded servers and 'flask worker' threads share it
+    # Connections beyond minconn are closed when returned, so keep enough
+    # idle ones for a gather() call's extra lanes to reuse
+    pool = ThreadedConnectionPool(
+        minconn=1 + GATHER_CONNECTIONS,
         maxconn=20,
-        **db_params
+        connection_factory=AppConnection,
+        **connection_params()
     )
+    gate = AdmissionGate(pool.maxconn)
+
+    app.config.setdefault('REPLICA_MAX_LAG', 5)
+    replicas = ReplicaSet(getattr(connect, 'dbreplicas', []), app.config['REPLICA_MAX_LAG'])
 
     # Optional: test connection on startup
     try:
@@ -53,18 +337,202 @@ def init_db(app):
 
     # Register teardown function
     app.teardown_appcontext(close_db)
+    app.before_request(ensure_listener)
+    app.after_request(_remember_write)
+
+
+def _remember_write(response):
+    """Keep this user's reads on the primary for a while after they commit"""
+    if g.get('db_committed'):
+        session['primary_until'] = time.time() + current_app.config['REPLICA_MAX_LAG']
+    return response
 
 
-def get_db():
+def get_db(readonly=False):
     """
     Get a database connection for the current request.
     Uses Flask's g to cache the connection per request.
+
+    Args:
+        readonly (bool): The caller only reads; a replica may serve it
     """
+    if readonly and replicas.replicas and 'db_replica' not in g:
+        # Read-your-writes: this request or a recent one committed on the primary
+        recent_write = g.get('db_committed') or (
+            has_request_context() and session.get('primary_until', 0) > time.time())
+        replica = None if recent_write else replicas.choose()
+        if replica is not None:
+            conn = None
+            try:
+                conn = replica['pool'].getconn()
+                conn.set_session(readonly=True)
+                _set_time_budget(conn, request_policy()[1], _route())
+                g.db_replica = (replica['pool'], conn)
+            except psycopg2.Error as e:
+                print(f"Replica {replica['name']} unavailable: {e}")
+                replica['lag'] = None
+                g.db_replica = None
+                if conn is not None:
+                    replica['pool'].putconn(conn, close=True)
+        else:
+            g.db_replica = None
+
+    if readonly and g.get('db_replica'):
+        return g.db_replica[1]
+
     if 'db' not in g:
-        g.db = pool.getconn()
+        priority, budget = request_policy()
+        admitted = has_request_context()
+        if admitted:
+            gate.acquire(priority)
+        try:
+            conn = pool.getconn()
+        except psycopg2.pool.PoolError:
+            # Pool also used outside requests (e.g. reminder threads)
+            if admitted:
+                gate.release()
+            raise Overloaded(priority)
+        g.db_admitted = admitted
+        g.db = conn
+        try:
+            _set_time_budget(conn, budget, _route())
+        except psycopg2.Error:
+            close_db()
+            raise
     return g.db
 
 
+def fetchone(sql, params=None):
+    """gather() work item: run sql, return its first row"""
+    def work(cur):
+        cur.execute(sql, params)
+        return cur.fetchone()
+    return work
+
+
+def fetchall(sql, params=None):
+    """gather() work item: run sql, return all rows"""
+    def work(cur):
+        cur.execute(sql, params)
+        return cur.fetchall()
+    return work
+
+
+def _gather_lane(conn_pool, conn, admitted, budget, route, items, done):
+    """
+    Run [(index, work)] on an extra connection and hand the [(index, result)]
+    to done (a Future) before returning the connection, so the reset in
+    _release() is not on the page's critical path.
+    """
+    try:
+        _set_time_budget(conn, budget, route)
+        # Plain reads: no BEGIN / ROLLBACK round trips
+        conn.autocommit = True
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                done.set_result([(index, work(cur)) for index, work in items])
+        finally:
+            conn.autocommit = False
+    except BaseException as e:
+        if not done.done():
+            done.set_exception(e)
+    finally:
+        _release(conn_pool, conn)
+        if admitted:
+            gate.release()
+
+
+def gather(*work, readonly=False):
+    """
+    Run independent reads concurrently and return their results in order.
+
+    Args:
+        work: callables taking a RealDictCursor (see fetchone / fetchall).
+              Those on extra connections run outside the request context:
+              pass in what they need instead of using session or get_db().
+        readonly (bool): as for get_db(); the extra connections come from the
+              same pool as the request's
+    """
+    conn = get_db(readonly)
+    items = list(enumerate(work))
+    wanted = min(len(items) - 1, GATHER_CONNECTIONS) if gather_enabled and has_request_context() else 0
+
+    replica = readonly and bool(g.get('db_replica'))
+    conn_pool = g.db_replica[0] if replica else pool
+    priority, budget = request_policy()
+    extra = []
+    while len(extra) < wanted:
+        if not replica and not gate.try_acquire(priority):
+            break
+        try:
+            extra.append(conn_pool.getconn())
+        except psycopg2.pool.PoolError:
+            if not replica:
+                gate.release()
+            break
+
+    lanes = len(extra) + 1
+    route = _route()
+    futures = []
+    for i, c in enumerate(extra):
+        futures.append(Future())
+        _gather_executor.submit(_gather_lane, conn_pool, c, not replica, budget, route,
+                                items[i + 1::lanes], futures[-1])
+
+    results = [None] * len(items)
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        for index, fn in items[0::lanes]:
+            results[index] = fn(cur)
+    for future in futures:
+        for index, value in future.result():
+            results[index] = value
+    return results
+
+
+def _route():
+    """Endpoint of the current request, shown as application_name in pg_stat_activity"""
+    return (request.endpoint or None) if has_request_context() else None
+
+
+def _set_time_budget(conn, budget_ms, route=None):
+    """
+    SET (or RESET for None) statement_timeout and application_name at session
+    level, outside any transaction, in one round trip
+    """
+    if (budget_ms, route) == (conn.time_budget, conn.route):
+        return
+    if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            if budget_ms is None:
+                sql, params = "RESET statement_timeout;", []
+            else:
+                sql, params = "SET statement_timeout = %s;", [int(budget_ms)]
+            if route is None:
+                sql += " RESET application_name"
+            else:
+                sql += " SET application_name = %s"
+                params.append(route[:63])
+            cur.execute(sql, params)
+    finally:
+        conn.autocommit = False
+    conn.time_budget = budget_ms
+    conn.route = route
+
+
+def _release(conn_pool, conn):
+    """Reset the request's time budget and return conn to its pool"""
+    try:
+        # application_name stays until the next checkout (idle backends show the last route)
+        _set_time_budget(conn, None, conn.route)
+    except psycopg2.Error:
+        conn_pool.putconn(conn, close=True)
+        return
+    conn_pool.putconn(conn)
+
+
 def close_db(exception=None):
     """
     Close the database connection at the end of the request.
@@ -72,4 +540,76 @@ def close_db(exception=None):
     """
     db = g.pop('db', None)
     if db is not None:
-        pool.putconn(db)
\ No newline at end of file
+        _release(pool, db)
+        if g.pop('db_admitted', False):
+            gate.release()
+
+    replica = g.pop('db_replica', None)
+    if replica is not None:
+        _release(*replica)
+
+
+# channel -> [handler, ...]; register at app creation, before the first request
+_listeners = {}
+_listener_lock = threading.Lock()
+_listener_pid = None
+
+
+def listen(channel, handler):
+    """
+    Call handler(payload) for every NOTIFY on channel.
+
+    Handlers run on the listener thread. handler(None) means notifications
+    may have been missed (the listener (re)connected), so anything derived
+    from them should be dropped.
+    """
+    handlers = _listeners.setdefault(channel, [])
+    if handler not in handlers:
+        handlers.append(handler)
+
+
+def _reset_listeners():
+    for handlers in _listeners.values():
+        for handler in handlers:
+            handler(None)
+
+
+def _listen():
+    """Dispatch notifications to the registered handlers (runs forever)"""
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**connection_params())
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                for channel in _listeners:
+                    cur.execute(f"LISTEN {channel}")
+            # Anything sent while we were not listening is unknown
+            _reset_listeners()
+            while True:
+                if select.select([conn], [], [], LISTEN_IDLE) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    for handler in _listeners.get(notify.channel, ()):
+                        handler(notify.payload)
+        except Exception as e:
+            print(f"Database listener error: {e}")
+            _reset_listeners()
+            time.sleep(LISTEN_RETRY)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def ensure_listener():
+    """Start this process's listener thread (once per process, after any fork)"""
+    global _listener_pid
+    if _listener_pid == os.getpid() or not _listeners:
+        return
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            _reset_listeners()
+            threading.Thread(target=_listen, name='db-listener', daemon=True).start()
+            _listener_pid = os.getpid()
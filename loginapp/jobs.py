@@ -0,0 +1,345 @@
+"""
+loginapp/jobs.py - Persistent background job queue (PostgreSQL, SKIP LOCKED)
+
+This module provides:
+- task(name): decorator registering a job handler, handler(conn, payload)
+- enqueue(cur, name, payload, ...): queue a job in the caller's transaction
+- run_worker(app, concurrency, ...): claim and run jobs until stopped
+- job_stats(conn): per-task counts and durations (last 24 hours)
+
+Routes enqueue with the cursor they already hold, so a job is committed or
+rolled back together with the change that triggered it. Workers claim jobs
+with FOR UPDATE SKIP LOCKED, so any number of them can run side by side.
+Failed jobs are retried with exponential backoff until max_attempts.
+While a job runs, its worker renews jobs.heartbeat_at; a running job whose
+heartbeat stops (the worker died) is put back in the queue by the periodic
+sweep of any worker.
+
+Run a worker from the project root:
+    flask --app run worker --concurrency 4
+"""
+
+import random
+import threading
+import time
+import traceback
+
+import psycopg2.errors
+from psycopg2.extras import Json, RealDictCursor
+
+# name -> handler(conn, payload)
+TASKS = {}
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 10        # seconds before the first retry, doubled after each failure
+BACKOFF_MAX = 60 * 60
+HEARTBEAT_INTERVAL = 30  # seconds between heartbeats of the jobs a worker is running
+STALE_AFTER = 3 * 60     # running jobs with no heartbeat for this long belong to a dead worker
+SWEEP_INTERVAL = 60      # seconds between sweeps for stale jobs
+KEEP_FINISHED_DAYS = 7
+
+
+def task(name):
+    """Register a function as the handler for jobs called 'name'"""
+    def decorator(f):
+        TASKS[name] = f
+        return f
+    return decorator
+
+
+def enqueue(cur, name, payload=None, delay=0, dedupe_key=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Queue a job using the caller's cursor (the caller commits).
+
+    Args:
+        cur: psycopg2 cursor inside the transaction that triggered the job
+        name (str): Registered task name
+        payload (dict): JSON-serialisable arguments for the handler
+        delay (int): Seconds before the job may run
+        dedupe_key (str): Skip if a job with the same name and key is still queued
+
+    Returns:
+        int or None: job_id, or None when an identical job was already queued
+    """
+    cur.execute("""
+        INSERT INTO jobs (task, payload, dedupe_key, max_attempts, run_at)
+        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP + %s * interval '1 second')
+        ON CONFLICT (task, dedupe_key) WHERE status = 'queued' DO NOTHING
+        RETURNING job_id
+    """, (name, Json(payload or {}), dedupe_key, max_attempts, delay))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return row['job_id'] if isinstance(row, dict) else row[0]
+
+
+def claim_job(conn):
+    """Take the oldest due job, mark it running and commit; None if the queue is empty"""
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1,
+                started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP,
+                finished_at = NULL
+            WHERE job_id = (
+                SELECT job_id FROM jobs
+                WHERE status = 'queued' AND run_at <= CURRENT_TIMESTAMP
+                ORDER BY run_at, job_id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING job_id, task, payload, attempts, max_attempts
+        """)
+        job = cur.fetchone()
+        conn.commit()
+        return job
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay + random.uniform(0, delay / 10)
+
+
+def run_job(conn, job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    handler = TASKS.get(job['task'])
+    started = time.perf_counter()
+    error = None
+
+    try:
+        if handler is None:
+            raise LookupError(f"no handler registered for task '{job['task']}'")
+        handler(conn, job['payload'])
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+
+    duration_ms = int((time.perf_counter() - started) * 1000)
+
+    retry = error is not None and job['attempts'] < job['max_attempts'] and job['task'] in TASKS
+    with conn.cursor() as cur:
+        if error is None:
+            cur.execute("""
+                UPDATE jobs
+                SET status = 'done', finished_at = CURRENT_TIMESTAMP,
+                    duration_ms = %s, last_error = NULL
+                WHERE job_id = %s
+            """, (duration_ms, job['job_id']))
+        elif retry:
+            # Back in the queue, unless an identical job is already waiting there
+            try:
+                cur.execute("""
+                    UPDATE jobs j
+                    SET status = CASE WHEN EXISTS (
+                            SELECT 1 FROM jobs d
+                            WHERE d.task = j.task AND d.dedupe_key = j.dedupe_key
+                              AND d.status = 'queued'
+                        ) THEN 'failed' ELSE 'queued' END,
+                        run_at = CURRENT_TIMESTAMP + %s * interval '1 second',
+                        finished_at = CURRENT_TIMESTAMP, duration_ms = %s, last_error = %s
+                    WHERE job_id = %s
+                """, (_backoff(job['attempts']), duration_ms, error, job['job_id']))
+            except psycopg2.errors.UniqueViolation:
+                # The identical job was enqueued after the EXISTS check ran
+                conn.rollback()
+                retry = False
+        if error is not None and not retry:
+            cur.execute("""
+                UPDATE jobs
+                SET status = 'failed', finished_at = CURRENT_TIMESTAMP,
+                    duration_ms = %s, last_error = %s
+                WHERE job_id = %s
+            """, (duration_ms, error, job['job_id']))
+    conn.commit()
+
+    status = 'done' if error is None else f"failed (attempt {job['attempts']}/{job['max_attempts']})"
+    print(f"Job {job['job_id']} {job['task']} {status} in {duration_ms} ms")
+    if error:
+        print(error)
+    return error is None
+
+
+def heartbeat(conn, job_ids):
+    """Mark the given running jobs as still alive"""
+    if job_ids:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                WHERE job_id = ANY(%s) AND status = 'running'
+            """, (list(job_ids),))
+    conn.commit()
+
+
+# Stale 'running' jobs (no heartbeat within the lease): the first of each (task, dedupe_key) goes back in the
+# queue unless an identical job is already queued there; the rest are failed,
+# since idx_jobs_dedupe allows only one queued copy
+REQUEUE_STALE = """
+    WITH stale AS (
+        SELECT job_id, task, dedupe_key, started_at
+        FROM jobs
+        WHERE status = 'running'
+          AND COALESCE(heartbeat_at, started_at) < CURRENT_TIMESTAMP - %s * interval '1 second'
+        FOR UPDATE SKIP LOCKED
+    ),
+    requeue AS (
+        SELECT job_id FROM stale WHERE dedupe_key IS NULL
+        UNION ALL
+        (SELECT DISTINCT ON (task, dedupe_key) job_id
+         FROM stale s
+         WHERE dedupe_key IS NOT NULL
+           AND NOT EXISTS (SELECT 1 FROM jobs q
+                           WHERE q.task = s.task AND q.dedupe_key = s.dedupe_key
+                             AND q.status = 'queued')
+         ORDER BY task, dedupe_key, started_at, job_id)
+    )
+    UPDATE jobs j
+    SET status = CASE WHEN r.job_id IS NULL THEN 'failed' ELSE 'queued' END,
+        run_at = CURRENT_TIMESTAMP,
+        finished_at = CASE WHEN r.job_id IS NULL THEN CURRENT_TIMESTAMP END,
+        last_error = CASE WHEN r.job_id IS NULL
+                          THEN 'worker stopped while running this job; an identical job is queued'
+                          ELSE 'worker stopped while running this job' END
+    FROM stale s
+    LEFT JOIN requeue r ON r.job_id = s.job_id
+    WHERE j.job_id = s.job_id
+    RETURNING j.status
+"""
+
+
+def requeue_stale(conn, stale_after=STALE_AFTER, attempts=3):
+    """Put back jobs left 'running' by a worker that died mid-job; returns how many were requeued"""
+    requeued = 0
+    with conn.cursor() as cur:
+        for attempt in range(attempts):
+            try:
+                cur.execute(REQUEUE_STALE, (stale_after,))
+                requeued = sum(1 for (status,) in cur.fetchall() if status == 'queued')
+                break
+            except psycopg2.errors.UniqueViolation:
+                # An identical job was enqueued after the NOT EXISTS check; look again
+                conn.rollback()
+                if attempt == attempts - 1:
+                    raise
+        cur.execute("""
+            DELETE FROM jobs
+            WHERE status = 'done'
+              AND finished_at < CURRENT_TIMESTAMP - %s * interval '1 day'
+        """, (KEEP_FINISHED_DAYS,))
+    conn.commit()
+    return requeued
+
+
+def run_worker(app, concurrency=2, poll_interval=1.0, burst=False, stop_event=None):
+    """
+    Run jobs in 'concurrency' threads, each with its own app context and
+    database connection. One more thread renews the heartbeat of the jobs
+    they are running and sweeps for stale jobs every SWEEP_INTERVAL.
+
+    Args:
+        app: Flask application (handlers may use current_app / get_db)
+        concurrency (int): Number of worker threads
+        poll_interval (float): Seconds to sleep when the queue is empty
+        burst (bool): Return once the queue is empty instead of polling forever
+        stop_event (threading.Event): Set it to stop the worker
+
+    Returns:
+        dict: {'done': n, 'failed': n}
+    """
+    from .db import get_db
+
+    stop_event = stop_event or threading.Event()
+    counts = {'done': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+    running = set()      # job_ids claimed by this worker's threads
+    finished = threading.Event()
+
+    with app.app_context():
+        requeue_stale(get_db())
+
+    def supervise():
+        with app.app_context():
+            conn = get_db()
+            last_sweep = time.monotonic()
+            while not finished.wait(HEARTBEAT_INTERVAL):
+                try:
+                    with counts_lock:
+                        job_ids = list(running)
+                    heartbeat(conn, job_ids)
+                    if time.monotonic() - last_sweep >= SWEEP_INTERVAL:
+                        last_sweep = time.monotonic()
+                        requeued = requeue_stale(conn)
+                        if requeued:
+                            print(f"Requeued {requeued} stale job(s)")
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    print(f"Job heartbeat error: {e}")
+
+    def loop():
+        with app.app_context():
+            conn = get_db()
+            while not stop_event.is_set():
+                job = claim_job(conn)
+                if job is None:
+                    if burst:
+                        return
+                    stop_event.wait(poll_interval)
+                    continue
+                with counts_lock:
+                    running.add(job['job_id'])
+                try:
+                    ok = run_job(conn, job)
+                finally:
+                    with counts_lock:
+                        running.discard(job['job_id'])
+                with counts_lock:
+                    counts['done' if ok else 'failed'] += 1
+
+    threads = [threading.Thread(target=loop, name=f"job-worker-{i}", daemon=True)
+               for i in range(concurrency)]
+    supervisor = threading.Thread(target=supervise, name="job-heartbeat", daemon=True)
+    for t in threads:
+        t.start()
+    supervisor.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for t in threads:
+            t.join()
+    finally:
+        finished.set()
+        supervisor.join()
+    return counts
+
+
+def job_stats(conn):
+    """Per-task queue depth, failures and run times over the last 24 hours"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("""
+            SELECT task,
+                   COUNT(*) FILTER (WHERE status = 'queued') AS queued,
+                   COUNT(*) FILTER (WHERE status = 'running') AS running,
+                   COUNT(*) FILTER (WHERE status = 'done') AS done,
+                   COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+                   ROUND(AVG(duration_ms) FILTER (WHERE status = 'done')) AS avg_ms,
+                   PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms)
+                       FILTER (WHERE status = 'done') AS p95_ms,
+                   MAX(duration_ms) FILTER (WHERE status = 'done') AS max_ms
+            FROM jobs
+            WHERE status IN ('queued', 'running')
+               OR finished_at >= CURRENT_TIMESTAMP - interval '24 hours'
+            GROUP BY task
+            ORDER BY task
+        """)
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
@@ -0,0 +1,107 @@
+"""
+loginapp/recommendations.py - "Recommended for you" events from volunteer interests
+
+This module provides:
+- RECOMMENDED_EVENTS: a volunteer's best-matching upcoming events (home, /events)
+- recommended_events(cur, volunteer_id, limit): run it
+- score_events(conn, event_ids): score new or edited events (score_events job)
+- rebuild_recommendations(conn): rebuild the tag index and every score
+
+Interests and event text are turned into tags in the database (text_tags()
+in create_database.sql: English word stems, hyphens joined). Triggers on
+users and events keep user_tags and event_tags current; only volunteers are
+tagged. A volunteer whose interests change is rescored by the trigger, while
+new and edited events are scored against every volunteer by the score_events
+job the leader routes queue, so creating a long series does not do that work
+in the request. A tag shared with the event name scores 2; one shared with
+the location or description scores 1. Reading suggestions is one scan of
+idx_event_recommendations_score. Events the volunteer is already registered
+or waitlisted for are left out.
+
+Scores for events that have since passed or been cancelled stay until the
+event is archived or the index is rebuilt; the query ignores them.
+"""
+
+from .statements import statement
+
+RECOMMENDED_EVENTS = statement('recommended_events', """
+    SELECT e.event_id, e.event_name, e.event_date, e.start_time, e.location, r.score
+    FROM event_recommendations r
+    JOIN events e ON e.event_id = r.event_id
+    WHERE r.volunteer_id = %s
+      AND e.event_date >= CURRENT_DATE
+      AND e.status = 'scheduled'
+      AND NOT EXISTS (SELECT 1 FROM eventregistrations er
+                      WHERE er.event_id = r.event_id AND er.volunteer_id = r.volunteer_id)
+      AND NOT EXISTS (SELECT 1 FROM event_waitlist w
+                      WHERE w.event_id = r.event_id AND w.volunteer_id = r.volunteer_id)
+    ORDER BY r.score DESC, e.event_date, e.start_time
+    LIMIT %s
+""")
+
+
+def recommended_events(cur, volunteer_id, limit=3):
+    RECOMMENDED_EVENTS.execute(cur, (volunteer_id, limit))
+    return cur.fetchall()
+
+
+def score_events(conn, event_ids):
+    """Replace every volunteer's score for the given events (the caller commits)"""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM event_recommendations WHERE event_id = ANY(%s)", (event_ids,))
+        cur.execute("""
+            INSERT INTO event_recommendations (volunteer_id, event_id, score)
+            SELECT ut.user_id, et.event_id, sum(et.weight)
+            FROM event_tags et
+            JOIN user_tags ut ON ut.tag = et.tag
+            JOIN events e ON e.event_id = et.event_id
+            WHERE et.event_id = ANY(%s)
+              AND e.status = 'scheduled'
+              AND e.event_date >= CURRENT_DATE
+            GROUP BY ut.user_id, et.event_id
+            ON CONFLICT (volunteer_id, event_id) DO UPDATE SET score = EXCLUDED.score
+        """, (event_ids,))
+        return cur.rowcount
+
+
+def rebuild_recommendations(conn):
+    """Recompute tags and scores from scratch in one transaction (also drops past events)"""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM user_tags")
+        cur.execute("""
+            INSERT INTO user_tags (user_id, tag)
+            SELECT DISTINCT u.user_id, t
+            FROM users u, text_tags(u.environmental_interests) t
+            WHERE u.role = 'volunteer'
+        """)
+        users = cur.rowcount
+
+        cur.execute("DELETE FROM event_tags")
+        cur.execute("""
+            INSERT INTO event_tags (event_id, tag, weight)
+            SELECT e.event_id, t.tag, t.weight
+            FROM events e, event_text_tags(e.event_name, e.location, e.description) t
+        """)
+        events = cur.rowcount
+
+        cur.execute("DELETE FROM event_recommendations")
+        cur.execute("""
+            INSERT INTO event_recommendations (volunteer_id, event_id, score)
+            SELECT ut.user_id, et.event_id, sum(et.weight)
+            FROM event_tags et
+            JOIN user_tags ut ON ut.tag = et.tag
+            JOIN events e ON e.event_id = et.event_id
+            WHERE e.status = 'scheduled'
+              AND e.event_date >= CURRENT_DATE
+            GROUP BY ut.user_id, et.event_id
+        """)
+        scores = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return users, events, scores
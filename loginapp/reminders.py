@@ -0,0 +1,298 @@
+"""
+loginapp/reminders.py - Day-before reminders for registered volunteers
+
+This module provides:
+- FileTransport / SMTPTransport: pluggable delivery (TRANSPORTS registry)
+- RateLimiter: token bucket shared by all sending threads
+- dispatch_reminders(app, ...): stream due reminders, render and send them
+
+Pipeline:
+1. A server-side (named) cursor streams due registrations for the target
+   date in batches, so tens of thousands of rows never sit in memory
+2. Each batch is rendered with templates/emails/reminder.txt
+3. Batches are sent by a thread pool; every thread claims its rows in
+   reminder_sends (INSERT ... ON CONFLICT) before sending, so a rerun or a
+   second dispatcher does not send the same reminder twice. sent_at is set
+   after each successful send; a claim still unsent after CLAIM_LEASE (its
+   dispatcher crashed) is taken over by the next run, so a reminder is sent
+   at least once. A failed send releases its claim and is retried by the
+   next run.
+
+Run it daily from cron (or queue the 'send_reminders' job):
+    flask --app run send-reminders --workers 8 --rate 50
+"""
+
+import os
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from email.header import Header
+from email.mime.text import MIMEText
+
+from flask import current_app
+from psycopg2.extras import RealDictCursor
+
+from . import db
+
+REMINDER_KIND = 'day_before'
+CLAIM_LEASE = 30 * 60    # seconds before an unsent claim is taken over
+
+DUE_REMINDERS_QUERY = """
+    SELECT er.event_id, er.volunteer_id, u.full_name, u.email,
+           e.event_name, e.event_date, e.start_time, e.duration, e.location,
+           e.supplies, e.safety_instructions
+    FROM events e
+    JOIN eventregistrations er ON er.event_id = e.event_id
+    JOIN users u ON u.user_id = er.volunteer_id
+    LEFT JOIN reminder_sends rs
+           ON rs.event_id = er.event_id AND rs.volunteer_id = er.volunteer_id AND rs.kind = %s
+    WHERE e.event_date = %s
+      AND e.status = 'scheduled'
+      AND u.status = 'active'
+      AND (rs.event_id IS NULL
+           OR (rs.sent_at IS NULL AND rs.claimed_at < CURRENT_TIMESTAMP - %s * interval '1 second'))
+    ORDER BY er.event_id, er.volunteer_id
+"""
+
+
+class FileTransport:
+    """Writes each message to an .eml file in an outbox folder (testing / staging)"""
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        os.makedirs(outbox, exist_ok=True)
+
+    def send(self, message):
+        path = os.path.join(self.outbox, f"{uuid.uuid4().hex}.eml")
+        with open(path, 'wb') as f:
+            f.write(message.as_bytes())
+
+    def close(self):
+        pass
+
+
+class SMTPTransport:
+    """Sends through an SMTP server, keeping one connection open per thread"""
+
+    def __init__(self, host, port=587, username=None, password=None, use_tls=True):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.use_tls = use_tls
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        smtp = getattr(self._local, 'smtp', None)
+        if smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            self._local.smtp = smtp
+            with self._lock:
+                self._connections.append(smtp)
+        return smtp
+
+    def send(self, message):
+        try:
+            self._connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self._local.smtp = None
+            self._connection().send_message(message)
+
+    def close(self):
+        for smtp in self._connections:
+            try:
+                smtp.quit()
+            except smtplib.SMTPException:
+                pass
+
+
+# REMINDER_TRANSPORT config value -> factory(app config)
+TRANSPORTS = {
+    'file': lambda config: FileTransport(config['REMINDER_OUTBOX']),
+    'smtp': lambda config: SMTPTransport(config['SMTP_HOST'], config.get('SMTP_PORT', 587),
+                                         config.get('SMTP_USERNAME'), config.get('SMTP_PASSWORD'),
+                                         config.get('SMTP_USE_TLS', True)),
+}
+
+
+class RateLimiter:
+    """Token bucket: at most 'rate' acquisitions per second across all threads"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def relative_day(event_date, today):
+    """'today', 'tomorrow' or 'on Friday 23 October' - when the event is, as seen on 'today'"""
+    days = (event_date - today).days
+    if days == 0:
+        return 'today'
+    if days == 1:
+        return 'tomorrow'
+    return f"on {event_date.strftime('%A %d %B')}"
+
+
+def render_batch(rows, sender, today=None):
+    """
+    Build one message per due reminder (needs an app context).
+    MIMEText (compat32 policy) is used rather than EmailMessage, whose header
+    parsing costs several times more than rendering the template.
+    """
+    template = current_app.jinja_env.get_template('emails/reminder.txt')
+    today = today or date.today()
+    messages = []
+    for row in rows:
+        text = template.render(r=row, when=relative_day(row['event_date'], today))
+        message = MIMEText(text, 'plain', 'utf-8')
+        message['From'] = sender
+        message['To'] = row['email']
+        message['Subject'] = Header(f"Reminder: {row['event_name']} on "
+                                    f"{row['event_date'].strftime('%a %d %b')}", 'utf-8')
+        messages.append((row, message))
+    return messages
+
+
+def dispatch_reminders(app, transport=None, target_date=None, batch_size=500,
+                       workers=4, rate=50):
+    """
+    Send day-before reminders for every registration on 'target_date'.
+    The message says when the event is relative to the day it is sent
+    ('tomorrow' for the default target, the date for any other).
+
+    Args:
+        app: Flask application (config, templates)
+        transport: object with send(message) / close(); default from REMINDER_TRANSPORT
+        target_date (date): Event date to remind about (default: tomorrow)
+        batch_size (int): Rows fetched, rendered and sent per batch
+        workers (int): Sending threads
+        rate (float): Maximum messages per second overall (0 = unlimited)
+
+    Returns:
+        dict: {'sent': n, 'skipped': n, 'failed': n}
+    """
+    target_date = target_date or date.today() + timedelta(days=1)
+    transport = transport or TRANSPORTS[app.config['REMINDER_TRANSPORT']](app.config)
+    limiter = RateLimiter(rate)
+    counts = {'sent': 0, 'skipped': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+
+    local = threading.local()
+    thread_conns = []
+
+    def thread_conn():
+        if getattr(local, 'conn', None) is None:
+            local.conn = db.pool.getconn()
+            with counts_lock:
+                thread_conns.append(local.conn)
+        return local.conn
+
+    def send_batch(batch):
+        conn = thread_conn()
+        keys = [(row['event_id'], row['volunteer_id']) for row, _ in batch]
+
+        # Claim first: rows another dispatcher sent or holds a live claim on
+        # are not returned; an expired unsent claim is taken over
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO reminder_sends AS rs (event_id, volunteer_id, kind)
+                SELECT event_id, volunteer_id, %s
+                FROM unnest(%s::int[], %s::int[]) AS k(event_id, volunteer_id)
+                ON CONFLICT (event_id, volunteer_id, kind) DO UPDATE
+                    SET claimed_at = CURRENT_TIMESTAMP
+                    WHERE rs.sent_at IS NULL
+                      AND rs.claimed_at < CURRENT_TIMESTAMP - %s * interval '1 second'
+                RETURNING event_id, volunteer_id
+            """, (REMINDER_KIND, [k[0] for k in keys], [k[1] for k in keys], CLAIM_LEASE))
+            claimed = {tuple(r) for r in cur.fetchall()}
+        conn.commit()
+
+        sent, failed = 0, []
+        for row, message in batch:
+            key = (row['event_id'], row['volunteer_id'])
+            if key not in claimed:
+                continue
+            limiter.acquire()
+            try:
+                transport.send(message)
+            except Exception as e:
+                print(f"Reminder to {row['email']} failed: {e}")
+                failed.append(key)
+                continue
+            sent += 1
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE reminder_sends SET sent_at = CURRENT_TIMESTAMP
+                    WHERE event_id = %s AND volunteer_id = %s AND kind = %s
+                """, (*key, REMINDER_KIND))
+            conn.commit()
+
+        if failed:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM reminder_sends
+                    WHERE kind = %s AND sent_at IS NULL
+                      AND (event_id, volunteer_id) IN (
+                          SELECT * FROM unnest(%s::int[], %s::int[]))
+                """, (REMINDER_KIND, [k[0] for k in failed], [k[1] for k in failed]))
+            conn.commit()
+
+        with counts_lock:
+            counts['sent'] += sent
+            counts['failed'] += len(failed)
+            counts['skipped'] += len(batch) - len(claimed)
+
+    stream_conn = db.pool.getconn()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            with app.app_context():
+                # Named cursor: rows are streamed from the server batch by batch
+                with stream_conn.cursor(name='due_reminders', cursor_factory=RealDictCursor) as cur:
+                    cur.itersize = batch_size
+                    cur.execute(DUE_REMINDERS_QUERY, (REMINDER_KIND, target_date, CLAIM_LEASE))
+                    while True:
+                        rows = cur.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        batch = render_batch(rows, app.config['REMINDER_SENDER'])
+                        futures.append(executor.submit(send_batch, batch))
+                        # Keep rendering at most a few batches ahead of the senders
+                        while sum(not f.done() for f in futures) > workers * 2:
+                            time.sleep(0.05)
+                stream_conn.commit()
+            for f in futures:
+                f.result()
+    finally:
+        stream_conn.rollback()
+        db.pool.putconn(stream_conn)
+        for conn in thread_conns:
+            conn.rollback()
+            db.pool.putconn(conn)
+        transport.close()
+
+    return counts
+
@@ -1,15 +1,52 @@
 # app/routes/admin.py
 
+import psycopg2.errors
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
-from psycopg2.extras import RealDictCursor
-from datetime import date
-from ..db import get_db
+from psycopg2.extras import RealDictCursor, Json
+from datetime import date, datetime
+from ..db import get_db, gather, fetchone, fetchall, CompactCursor
+from ..jobs import enqueue
+from ..sessions import principals
 from ..utils.decorators import login_required, role_required
+from ..utils.cache import data_fingerprint
+from ..utils.coalesce import flights
+from ..user_import import import_users_csv, REQUIRED_COLUMNS, OPTIONAL_COLUMNS
 import os
 import uuid
 
 admin_bp = Blueprint('admin', __name__)
 
+# Upper bound on rows touched by one bulk action (keeps lock time short)
+MAX_BULK_ITEMS = 500
+
+# Seconds before the reports snapshot is recomputed by the job worker
+REPORTS_MAX_AGE = 300
+
+
+def _selected_ids(field):
+    """Parse the checked row ids from a bulk-action form"""
+    ids = []
+    for value in request.form.getlist(field):
+        if value.isdigit():
+            ids.append(int(value))
+    return list(dict.fromkeys(ids))  # de-duplicate, keep order
+
+
+# /admin/users, newest first; USER_SEARCH narrows it to a search term
+USER_LIST = """
+    SELECT user_id, username, full_name, email, role, status, created_at
+    FROM users
+    WHERE 1=1
+"""
+
+USER_SEARCH = """
+    AND (
+        username ILIKE %s OR
+        full_name ILIKE %s OR
+        email ILIKE %s
+    )
+"""
+
 
 @admin_bp.route('/users')
 @login_required
@@ -19,23 +56,13 @@ def manage_users():
     search = request.args.get('search', '').strip()
 
     conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor(cursor_factory=CompactCursor)
 
-    query = """
-        SELECT user_id, username, full_name, email, role, status, created_at
-        FROM users
-        WHERE 1=1
-    """
+    query = USER_LIST
     params = []
 
     if search:
-        query += """
-            AND (
-                username ILIKE %s OR
-                full_name ILIKE %s OR
-                email ILIKE %s
-            )
-        """
+        query += USER_SEARCH
         like_pattern = f"%{search}%"
         params.extend([like_pattern, like_pattern, like_pattern])
 
@@ -48,11 +75,50 @@ def manage_users():
     return render_template('admin_users.html', users=users_list, search=search)
 
 
-@admin_bp.route('/toggle_user_status/<int:user_id>', methods=['GET'])
+@admin_bp.route('/import_users', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def import_users():
+    """Bulk-create volunteer / leader accounts from an uploaded CSV file"""
+    report = None
+
+    if request.method == 'POST':
+        file = request.files.get('csv_file')
+        if not file or not file.filename.lower().endswith('.csv'):
+            flash('Please choose a .csv file to import', 'danger')
+            return redirect(url_for('admin.import_users'))
+
+        try:
+            report = import_users_csv(get_db(), file.stream,
+                                      rounds=current_app.config.get('BCRYPT_LOG_ROUNDS', 12))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.import_users'))
+        except psycopg2.errors.QueryCanceled:
+            raise   # over the time budget: answered with 503 (admission.py)
+        except Exception as e:
+            flash(f'Import failed: {str(e)}', 'danger')
+            print(f"User import error: {e}")
+            return redirect(url_for('admin.import_users'))
+
+        created = sum(1 for r in report if r['status'] == 'created')
+        flash(f'{created} of {len(report)} user(s) imported', 'success' if created else 'warning')
+
+    return render_template('admin_import_users.html',
+                           report=report,
+                           required_columns=REQUIRED_COLUMNS,
+                           optional_columns=OPTIONAL_COLUMNS)
+
+
+@admin_bp.route('/toggle_user_status/<int:user_id>', methods=['POST'])
 @login_required
 @role_required('admin')
 def toggle_user_status(user_id):
-    """Toggle user status (active / inactive)"""
+    """Set user status to the one the admin asked for (active / inactive)"""
+    new_status = request.form.get('status')
+    if new_status not in ('active', 'inactive'):
+        flash('Invalid status', 'danger')
+        return redirect(url_for('admin.manage_users'))
     if user_id == session['user_id']:
         flash('Cannot deactivate yourself', 'danger')
         return redirect(url_for('admin.manage_users'))
@@ -60,36 +126,115 @@ def toggle_user_status(user_id):
     conn = get_db()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("SELECT status FROM users WHERE user_id = %s", (user_id,))
-    user = cur.fetchone()
-
-    if not user:
-        flash('User not found', 'danger')
+    # The form carries the status the admin chose, so a double click or two
+    # admins acting on the same row set it once instead of flipping it back
+    cur.execute("""
+        UPDATE users
+        SET status = %s
+        WHERE user_id = %s AND status <> %s
+        RETURNING user_id
+    """, (new_status, user_id, new_status))
+    changed = cur.fetchone()
+
+    if not changed:
+        cur.execute("SELECT status FROM users WHERE user_id = %s", (user_id,))
+        user = cur.fetchone()
+        conn.rollback()
         cur.close()
+        if not user:
+            flash('User not found', 'danger')
+        else:
+            flash(f'User is already {new_status}', 'info')
         return redirect(url_for('admin.manage_users'))
 
-    new_status = 'inactive' if user['status'] == 'active' else 'active'
-
-    cur.execute("""
-        UPDATE users 
-        SET status = %s 
-        WHERE user_id = %s
-    """, (new_status, user_id))
-
     conn.commit()
     cur.close()
+    # Other processes hear about it from the users trigger (NOTIFY)
+    principals.invalidate_user(user_id)
 
     flash(f'User status updated to {new_status}', 'success')
     return redirect(url_for('admin.manage_users'))
 
 
+@admin_bp.route('/users/bulk', methods=['POST'])
+@login_required
+@role_required('admin')
+def bulk_user_status():
+    """Activate or deactivate many users with one set-based UPDATE"""
+    action = request.form.get('action')
+    new_status = {'activate': 'active', 'deactivate': 'inactive'}.get(action)
+    user_ids = _selected_ids('user_ids')
+
+    if not new_status or not user_ids:
+        flash('Select at least one user and an action', 'warning')
+        return redirect(url_for('admin.manage_users'))
+    if len(user_ids) > MAX_BULK_ITEMS:
+        flash(f'At most {MAX_BULK_ITEMS} users can be changed at once', 'danger')
+        return redirect(url_for('admin.manage_users'))
+
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # The outer SELECT sees the rows as they were before the UPDATE,
+        # which is what we need to explain rows that were not changed.
+        cur.execute("""
+            WITH requested AS (
+                SELECT unnest(%s::int[]) AS user_id
+            ),
+            changed AS (
+                UPDATE users u
+                SET status = %s
+                FROM requested r
+                WHERE u.user_id = r.user_id
+                  AND u.user_id <> %s
+                  AND u.status <> %s
+                RETURNING u.user_id
+            )
+            SELECT r.user_id AS id, u.username AS label,
+                   CASE
+                       WHEN u.user_id IS NULL THEN 'User not found'
+                       WHEN r.user_id = %s THEN 'Cannot change your own account'
+                       WHEN c.user_id IS NULL THEN 'Already ' || u.status
+                       ELSE 'Now ' || %s
+                   END AS message,
+                   c.user_id IS NOT NULL AS changed
+            FROM requested r
+            LEFT JOIN users u ON u.user_id = r.user_id
+            LEFT JOIN changed c ON c.user_id = r.user_id
+            ORDER BY r.user_id
+        """, (user_ids, new_status, session['user_id'], new_status,
+              session['user_id'], new_status))
+        results = cur.fetchall()
+        conn.commit()
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        flash(f'Bulk update failed: {str(e)}', 'danger')
+        return redirect(url_for('admin.manage_users'))
+    finally:
+        cur.close()
+
+    for r in results:
+        if r['changed']:
+            principals.invalidate_user(r['id'])
+
+    changed = sum(1 for r in results if r['changed'])
+    flash(f'{changed} of {len(results)} user(s) set to {new_status}', 'success')
+    return render_template('admin_bulk_results.html',
+                           title='Bulk User Update',
+                           results=results,
+                           back_url=url_for('admin.manage_users'))
+
+
 @admin_bp.route('/events')
 @login_required
 @role_required('admin')
 def manage_all_events():
     """Manage all events on the platform (admin overview)"""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    conn = get_db(readonly=True)
+    cur = conn.cursor(cursor_factory=CompactCursor)
 
     cur.execute("""
         SELECT e.*,
@@ -109,16 +254,72 @@ def manage_all_events():
                            today=today)
 
 
-@admin_bp.route('/reports')
+@admin_bp.route('/events/bulk', methods=['POST'])
 @login_required
 @role_required('admin')
-def reports():
-    """Platform-wide statistics and reports"""
+def bulk_cancel_events():
+    """Cancel many events with one set-based statement"""
+    event_ids = _selected_ids('event_ids')
+
+    if request.form.get('action') != 'cancel' or not event_ids:
+        flash('Select at least one event to cancel', 'warning')
+        return redirect(url_for('admin.manage_all_events'))
+    if len(event_ids) > MAX_BULK_ITEMS:
+        flash(f'At most {MAX_BULK_ITEMS} events can be cancelled at once', 'danger')
+        return redirect(url_for('admin.manage_all_events'))
+
     conn = get_db()
     cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # Status flip only; the job worker moves the registrations,
+        # outcomes and feedback out later in small batches
+        cur.execute("""
+            WITH requested AS (
+                SELECT unnest(%s::int[]) AS event_id
+            ),
+            cancelled AS (
+                UPDATE events e
+                SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
+                FROM requested r
+                WHERE e.event_id = r.event_id AND e.status = 'scheduled'
+                RETURNING e.event_id
+            )
+            SELECT r.event_id AS id, e.event_name AS label,
+                   CASE WHEN e.event_id IS NULL THEN 'Event not found'
+                        WHEN c.event_id IS NULL THEN 'Already cancelled'
+                        ELSE 'Cancelled' END AS message,
+                   c.event_id IS NOT NULL AS changed
+            FROM requested r
+            LEFT JOIN events e ON e.event_id = r.event_id
+            LEFT JOIN cancelled c ON c.event_id = r.event_id
+            ORDER BY r.event_id
+        """, (event_ids,))
+        results = cur.fetchall()
+        if any(r['changed'] for r in results):
+            enqueue(cur, 'purge_cancelled_events', dedupe_key='all')
+        conn.commit()
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        flash(f'Bulk cancel failed: {str(e)}', 'danger')
+        return redirect(url_for('admin.manage_all_events'))
+    finally:
+        cur.close()
 
+    changed = sum(1 for r in results if r['changed'])
+    flash(f'{changed} of {len(results)} event(s) cancelled', 'success')
+    return render_template('admin_bulk_results.html',
+                           title='Bulk Event Cancellation',
+                           results=results,
+                           back_url=url_for('admin.manage_all_events'))
+
+
+# The reports page's queries; none depends on another, so they can run concurrently
+REPORT_QUERIES = {
     # User statistics
-    cur.execute("""
+    'user_stats': fetchone("""
         SELECT 
             COUNT(*) AS total_users,
             COUNT(CASE WHEN role = 'volunteer' THEN 1 END) AS volunteer,
@@ -126,40 +327,98 @@ def reports():
             COUNT(CASE WHEN role = 'admin' THEN 1 END) AS admin,
             COUNT(CASE WHEN status = 'active' THEN 1 END) AS active_users
         FROM users
-    """)
-    user_stats = cur.fetchone()
+    """),
 
-    # Event statistics
-    cur.execute("""
+    # Event statistics (*_history views include archived events)
+    'event_stats': fetchone("""
         SELECT 
             COUNT(*) AS total_events,
             COUNT(CASE WHEN event_date >= CURRENT_DATE THEN 1 END) AS upcoming,
             COUNT(CASE WHEN event_date < CURRENT_DATE THEN 1 END) AS past
-        FROM events
-    """)
-    event_stats = cur.fetchone()
+        FROM events_history
+    """),
 
     # Total registrations and feedback
-    cur.execute("SELECT COUNT(*) AS total_registrations FROM eventregistrations")
-    total_reg = cur.fetchone()['total_registrations']
+    'total_reg': fetchone("SELECT COUNT(*) AS total_registrations FROM eventregistrations_history"),
 
-    cur.execute("SELECT AVG(rating) AS avg_rating FROM feedback")
-    avg_rating = cur.fetchone()['avg_rating'] or 0
+    # Kept per event by stats.feedback_added, so this never scans feedback
+    'avg_rating': fetchone("""
+        SELECT SUM(rating_sum)::numeric / NULLIF(SUM(rating_count), 0) AS avg_rating
+        FROM event_feedback_stats
+    """),
 
     # Recent events with outcomes
-    cur.execute("""
+    'recent_events': fetchall("""
         SELECT e.event_name, e.event_date, e.location,
                COALESCE(o.num_attendees, 0) AS num_attendees,
                COALESCE(o.bags_collected, 0) AS bags_collected,
-               (SELECT COUNT(*) FROM eventregistrations WHERE event_id = e.event_id) AS registrations
-        FROM events e
-        LEFT JOIN eventoutcomes o ON e.event_id = o.event_id
+               (SELECT COUNT(*) FROM eventregistrations_history WHERE event_id = e.event_id) AS registrations
+        FROM events_history e
+        LEFT JOIN eventoutcomes_history o ON e.event_id = o.event_id
         ORDER BY e.event_date DESC
         LIMIT 5
-    """)
-    recent_events = cur.fetchall()
+    """),
+
+    # Most active volunteers (volunteer_stats is maintained incrementally)
+    'top_volunteers': fetchall("""
+        SELECT u.full_name, vs.events_attended, vs.minutes_volunteered, vs.bags_collected
+        FROM volunteer_stats vs
+        JOIN users u ON u.user_id = vs.volunteer_id
+        WHERE vs.events_attended > 0
+        ORDER BY vs.minutes_volunteered DESC
+        LIMIT 5
+    """),
+
+    # Leaderboards: outcome_leaderboard holds one row per location / leader / month
+    'top_locations': fetchall("""
+        SELECT location, SUM(events_recorded)::int AS events,
+               SUM(bags_collected)::int AS bags_collected, SUM(recyclables_sorted)::int AS recyclables_sorted
+        FROM outcome_leaderboard
+        GROUP BY location
+        ORDER BY bags_collected DESC, location
+        LIMIT 5
+    """),
+
+    'top_leaders': fetchall("""
+        SELECT u.full_name, t.events, t.bags_collected, t.recyclables_sorted
+        FROM (
+            SELECT event_leader_id, SUM(events_recorded)::int AS events,
+                   SUM(bags_collected)::int AS bags_collected, SUM(recyclables_sorted)::int AS recyclables_sorted
+            FROM outcome_leaderboard
+            GROUP BY event_leader_id
+        ) t
+        JOIN users u ON u.user_id = t.event_leader_id
+        ORDER BY t.bags_collected DESC, u.full_name
+        LIMIT 5
+    """),
 
-    cur.close()
+    'monthly_outcomes': fetchall("""
+        SELECT to_char(month, 'YYYY-MM') AS month, SUM(events_recorded)::int AS events,
+               SUM(bags_collected)::int AS bags_collected, SUM(recyclables_sorted)::int AS recyclables_sorted
+        FROM outcome_leaderboard
+        WHERE month >= date_trunc('month', CURRENT_DATE) - interval '5 months'
+        GROUP BY month
+        ORDER BY month DESC
+    """),
+}
+
+
+def compute_reports(cur=None):
+    """
+    Run the platform-wide report queries: one after another on cur, or
+    concurrently through gather() when cur is None (inside a request).
+
+    Returns:
+        dict: {'stats': {...}, 'recent_events': [...]} (JSON-serialisable)
+    """
+    if cur is None:
+        results = gather(*REPORT_QUERIES.values())
+    else:
+        results = [work(cur) for work in REPORT_QUERIES.values()]
+    r = dict(zip(REPORT_QUERIES, results))
+    user_stats, event_stats = r['user_stats'], r['event_stats']
+    total_reg = r['total_reg']['total_registrations']
+    avg_rating = r['avg_rating']['avg_rating'] or 0
 
     # Prepare stats for template
     stats = {
@@ -174,9 +433,85 @@ def reports():
         'upcoming_events': event_stats['upcoming'],
         'past_events': event_stats['past'],
         'total_registrations': total_reg,
-        'avg_rating': round(avg_rating, 1) if avg_rating else 'N/A',
+        'avg_rating': float(round(avg_rating, 1)) if avg_rating else 'N/A',
     }
 
+    return {'stats': stats, 'recent_events': r['recent_events'], 'top_volunteers': r['top_volunteers'],
+            'leaderboard': {'locations': r['top_locations'], 'leaders': r['top_leaders'],
+                            'months': r['monthly_outcomes']}}
+
+
+def save_report_snapshot(cur, name, data):
+    """Store (or replace) a computed report; the caller commits"""
+    cur.execute("""
+        INSERT INTO report_snapshots (name, data, computed_at)
+        VALUES (%s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE
+        SET data = EXCLUDED.data, computed_at = EXCLUDED.computed_at
+    """, (name, Json(data, dumps=current_app.json.dumps)))
+
+
+def _compute_reports_snapshot():
+    """Compute and store the reports; returns (data, computed_at)"""
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        data = compute_reports()
+        save_report_snapshot(cur, 'admin_reports', data)
+        conn.commit()
+        return data, datetime.now()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _enqueue_reports_refresh():
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        enqueue(cur, 'refresh_reports', dedupe_key='admin_reports')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+@admin_bp.route('/reports')
+@login_required
+@role_required('admin')
+def reports():
+    """Platform-wide statistics and reports"""
+    # Served from the last snapshot (a replica may answer this read);
+    # a stale one is refreshed by the job worker
+    cur = get_db(readonly=True).cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT data, computed_at,
+               computed_at < CURRENT_TIMESTAMP - %s * interval '1 second' AS stale
+        FROM report_snapshots
+        WHERE name = 'admin_reports'
+    """, (REPORTS_MAX_AGE,))
+    snapshot = cur.fetchone()
+    cur.close()
+
+    if snapshot is None:
+        # No snapshot yet: concurrent requests share one computation
+        data, computed_at = flights.do('admin_reports', _compute_reports_snapshot)
+    elif snapshot['stale']:
+        flights.do('admin_reports_refresh', _enqueue_reports_refresh)
+
+    if snapshot is not None:
+        data, computed_at = snapshot['data'], snapshot['computed_at']
+        for event in data['recent_events']:
+            event['event_date'] = date.fromisoformat(event['event_date'])
+
     return render_template('admin_reports.html',
-                           stats=stats,
-                           recent_events=recent_events)
+                           stats=data['stats'],
+                           recent_events=data['recent_events'],
+                           top_volunteers=data.get('top_volunteers', []),
+                           leaderboard=data.get('leaderboard', {}),
+                           computed_at=computed_at,
+                           reports_version=data_fingerprint(data))
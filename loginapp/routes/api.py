@@ -0,0 +1,229 @@
+# loginapp/routes/api.py
+"""
+Versioned JSON API (/api/v1) for mobile and kiosk clients.
+
+Reuses the queries behind /events, /leader/event_detail and /my_participation.
+- Cursor pagination: pass the returned 'next_cursor' back as ?cursor=...
+- Field selection:   ?fields=event_id,event_name,event_date
+- Responses carry a weak ETag (If-None-Match -> 304) and are gzip-compressed
+  when the client accepts it.
+"""
+
+import base64
+import gzip
+import json
+from datetime import date, time
+
+from flask import Blueprint, request, session, jsonify, abort
+from psycopg2.extras import RealDictCursor
+
+from ..db import get_db
+from ..utils.decorators import api_role_required
+from .events import SEATS_LEFT, upcoming_events_query
+from .leader import fetch_event_detail
+from .user import PARTICIPATION_FIELDS, PARTICIPATION_FROM
+
+api_bp = Blueprint('api', __name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+GZIP_MIN_BYTES = 1024
+
+# Public field name -> SQL expression (events e JOIN users u)
+EVENT_FIELDS = {
+    'event_id': 'e.event_id',
+    'event_name': 'e.event_name',
+    'location': 'e.location',
+    'event_date': 'e.event_date',
+    'start_time': 'e.start_time',
+    'duration': 'e.duration',
+    'description': 'e.description',
+    'supplies': 'e.supplies',
+    'safety_instructions': 'e.safety_instructions',
+    'event_leader_id': 'e.event_leader_id',
+    'leader_name': 'u.full_name',
+    'created_at': 'e.created_at',
+    'status': 'e.status',
+    'capacity': 'e.capacity',
+    'seats_left': SEATS_LEFT,
+}
+# Computed by the shared query rather than selected from a column
+EXTRA_EVENT_FIELDS = {'registered', 'waitlisted'}
+
+# Sort keys needed to build the next cursor; selected under these aliases
+CURSOR_COLUMNS = 'e.event_date AS cursor_date, e.start_time AS cursor_time, e.event_id AS cursor_id'
+PARTICIPATION_CURSOR_COLUMNS = 'e.event_date AS cursor_date, e.event_id AS cursor_id'
+
+
+def _requested_fields(allowed, extra=()):
+    """Parse ?fields=a,b,c against the allowed set (all fields if absent)"""
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return list(allowed) + list(extra)
+
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed and f not in extra]
+    if unknown:
+        abort(400, description=f"unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def _page_size():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        abort(400, description='limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, time)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _cursor_int(value):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError
+    return value
+
+
+def _decode_cursor(*parsers):
+    """Decode ?cursor= into its values, each checked by its parser (e.g. date.fromisoformat)"""
+    token = request.args.get('cursor')
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError):
+        abort(400, description='invalid cursor')
+
+
+def _project(rows, fields):
+    """Keep only the requested keys, in the requested order (drops the cursor_* sort keys)"""
+    return [{f: row[f] for f in fields} for row in rows]
+
+
+@api_bp.errorhandler(400)
+def bad_request(error):
+    return jsonify(error=error.description), 400
+
+
+@api_bp.after_request
+def conditional_and_compressed(response):
+    """Weak ETag + 304 handling, then gzip for clients that accept it"""
+    if response.status_code != 200 or response.mimetype != 'application/json':
+        return response
+
+    # Per-user data: clients may keep it but must revalidate every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+
+    # Weak, because the gzip and identity encodings share the same ETag
+    response.add_etag(weak=True)
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) >= GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@api_bp.route('/events')
+@api_role_required('volunteer')
+def list_events():
+    """Upcoming events (same filters as /events), cursor-paginated"""
+    fields = _requested_fields(EVENT_FIELDS, EXTRA_EVENT_FIELDS)
+    limit = _page_size()
+    cursor = _decode_cursor(date.fromisoformat, time.fromisoformat, _cursor_int)
+
+    event_date = request.args.get('date', '')
+    if event_date:
+        try:
+            date.fromisoformat(event_date)
+        except ValueError:
+            abort(400, description='date must be YYYY-MM-DD')
+
+    select = ', '.join([f"{EVENT_FIELDS[f]} AS {f}" for f in fields if f in EVENT_FIELDS]
+                       + [CURSOR_COLUMNS])
+    query, params = upcoming_events_query(session['user_id'],
+                                          request.args.get('location', '').strip(),
+                                          event_date,
+                                          select=select)
+    if cursor:
+        query += " AND (e.event_date, e.start_time, e.event_id) > (%s, %s, %s)"
+        params.extend(cursor)
+    query += " ORDER BY e.event_date, e.start_time, e.event_id LIMIT %s"
+    params.append(limit + 1)
+
+    cur = get_db(readonly=True).cursor(cursor_factory=RealDictCursor)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last['cursor_date'], last['cursor_time'], last['cursor_id'])
+
+    return jsonify(data=_project(rows, fields), next_cursor=next_cursor)
+
+
+@api_bp.route('/events/<int:event_id>')
+@api_role_required('event_leader')
+def event_detail(event_id):
+    """Event with registrations and outcome (same data as /leader/event_detail)"""
+    fields = _requested_fields(EVENT_FIELDS)
+    select = ', '.join(f"{EVENT_FIELDS[f]} AS {f}" for f in fields)
+
+    cur = get_db().cursor(cursor_factory=RealDictCursor)
+    event, registrations, outcome = fetch_event_detail(cur, event_id, select=select)
+    cur.close()
+
+    if not event:
+        return jsonify(error='event not found'), 404
+
+    return jsonify(data={
+        'event': event,
+        'registrations': registrations,
+        'outcome': outcome,
+    })
+
+
+@api_bp.route('/me/participation')
+@api_role_required('volunteer')
+def my_participation():
+    """Current user's registrations (same data as /my_participation), newest first"""
+    allowed = ['event_id', 'event_name', 'location', 'event_date', 'start_time', 'archived',
+               'status', 'attendance', 'rating', 'comments', 'feedback_submitted']
+    fields = _requested_fields(allowed)
+    limit = _page_size()
+    cursor = _decode_cursor(date.fromisoformat, _cursor_int)
+
+    select = ', '.join([f"{PARTICIPATION_FIELDS[f]} AS {f}" for f in fields] + [PARTICIPATION_CURSOR_COLUMNS])
+    query, params = f"SELECT {select}" + PARTICIPATION_FROM, [session['user_id']]
+    if cursor:
+        query += " AND (e.event_date, e.event_id) < (%s, %s)"
+        params.extend(cursor)
+    query += " ORDER BY e.event_date DESC, e.event_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    cur = get_db(readonly=True).cursor(cursor_factory=RealDictCursor)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['cursor_date'], rows[-1]['cursor_id'])
+
+    return jsonify(data=_project(rows, fields), next_cursor=next_cursor)
@@ -1,16 +1,23 @@
 # app/routes/auth.py
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_bcrypt import generate_password_hash, check_password_hash
 from psycopg2.extras import RealDictCursor
-import os
-import uuid
 from ..db import get_db
+from ..sessions import create_session, revoke_session
+from ..statements import statement
+from ..uploads import save_profile_image, discard_upload
 from ..utils.decorators import login_required
-from ..utils.helpers import allowed_file
 
 auth_bp = Blueprint('auth', __name__)
 
+# Explicit columns: a prepared SELECT * breaks when users gains a column
+LOGIN_USER = statement('login_user', """
+    SELECT user_id, password_hash, role
+    FROM users
+    WHERE username = %s AND status = 'active'
+""")
+
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -21,14 +28,17 @@ def login():
 
         conn = get_db()
         cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("""
-            SELECT * FROM users 
-            WHERE username = %s AND status = 'active'
-        """, (username,))
+        LOGIN_USER.execute(cur, (username,))
         user = cur.fetchone()
-        cur.close()
 
         if user and check_password_hash(user['password_hash'], password):
+            session_id = create_session(cur, user['user_id'])
+            conn.commit()
+            cur.close()
+
+            # New cookie for the new session (never reuse one from before login)
+            session.clear()
+            session['sid'] = session_id
             session['user_id'] = user['user_id']
             session['role'] = user['role']
             session.permanent = True
@@ -43,6 +53,7 @@ def login():
             else:
                 return redirect(url_for('home'))
         else:
+            cur.close()
             flash('Invalid username/password or account is inactive', 'danger')
 
     return render_template('login.html')
@@ -83,15 +94,8 @@ def register():
             return redirect(url_for('auth.register'))
 
         # Handle profile image upload
-        profile_image = 'default_profile.jpg'
-        if 'profile_image' in request.files:
-            file = request.files['profile_image']
-            if file and allowed_file(file.filename):
-                ext = file.filename.rsplit('.', 1)[1].lower()
-                filename = f"{uuid.uuid4()}.{ext}"
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                profile_image = filename
+        uploaded = save_profile_image(request.files.get('profile_image'))
+        profile_image = uploaded or 'default_profile.jpg'
 
         # Create new user account
         password_hash = generate_password_hash(password).decode('utf-8')
@@ -109,6 +113,7 @@ def register():
             return redirect(url_for('auth.login'))
         except Exception as e:
             conn.rollback()
+            discard_upload(uploaded)
             flash(f'Registration failed: {str(e)}', 'danger')
         finally:
             cur.close()
@@ -120,6 +125,12 @@ def register():
 @login_required
 def logout():
     """Log out the current user"""
+    if session.get('sid'):
+        conn = get_db()
+        cur = conn.cursor()
+        revoke_session(cur, session['sid'])
+        conn.commit()
+        cur.close()
     session.clear()
     flash('You have been logged out successfully', 'info')
     return redirect(url_for('auth.login'))
\ No newline at end of file
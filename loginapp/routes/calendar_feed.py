@@ -0,0 +1,116 @@
+# loginapp/routes/calendar_feed.py
+"""
+Tokenised iCalendar (.ics) feeds for calendar apps.
+
+- Volunteers get the events they registered for (same query as /my_participation)
+- Event leaders and admins get the events they organise (as /leader/my_events)
+
+Calendar apps poll every few minutes, so the ETag comes from the owner's
+role, the per-user version in calendar_feeds (bumped by database triggers)
+and today's date.
+An unchanged feed answers 304 after a single primary-key lookup; otherwise
+the events are streamed from a server-side cursor, one VEVENT at a time.
+"""
+
+import secrets
+from datetime import date, datetime, timedelta, timezone
+
+from flask import (Blueprint, Response, request, redirect, url_for, flash, session,
+                   abort, stream_with_context)
+from psycopg2.extras import RealDictCursor
+
+from ..db import get_db
+from ..utils.decorators import login_required
+from ..utils.ical import calendar_header, calendar_footer, vevent
+from .user import PARTICIPATION_QUERY
+
+calendar_bp = Blueprint('calendar', __name__)
+
+# Date window served in a feed, relative to today
+PAST_DAYS = 30
+FUTURE_DAYS = 180
+MAX_EVENTS = 500
+
+LEADER_FEED_QUERY = """
+    SELECT e.event_id, e.event_name, e.location, e.event_date, e.start_time,
+           e.duration, e.description, e.status
+    FROM events e
+    WHERE e.event_leader_id = %s
+"""
+
+
+@calendar_bp.route('/<token>.ics')
+def feed(token):
+    """Calendar feed for the user owning 'token' (no login: the token is the secret)"""
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT f.user_id, f.version, u.role
+        FROM calendar_feeds f
+        JOIN users u ON u.user_id = f.user_id
+        WHERE f.token = %s AND u.status = 'active'
+    """, (token,))
+    owner = cur.fetchone()
+    cur.close()
+
+    if not owner:
+        abort(404)
+
+    today = date.today()
+    etag = f"{owner['user_id']}-{owner['role']}-{owner['version']}-{today.isoformat()}"
+
+    if request.if_none_match.contains_weak(etag):
+        conn.commit()
+        response = Response(status=304)
+    else:
+        if owner['role'] == 'volunteer':
+            query, name = PARTICIPATION_QUERY, 'EcoCleanUp - My Events'
+        else:
+            query, name = LEADER_FEED_QUERY, 'EcoCleanUp - Events I Organise'
+        query += " AND e.event_date BETWEEN %s AND %s ORDER BY e.event_date, e.start_time LIMIT %s"
+        params = (owner['user_id'], today - timedelta(days=PAST_DAYS),
+                  today + timedelta(days=FUTURE_DAYS), MAX_EVENTS)
+        dtstamp = datetime.now(timezone.utc)
+
+        def generate():
+            yield calendar_header(name)
+            with conn.cursor(name='calendar_feed', cursor_factory=RealDictCursor) as events:
+                events.itersize = 100
+                events.execute(query, params)
+                for event in events:
+                    yield vevent(event, dtstamp)
+            conn.commit()
+            yield calendar_footer()
+
+        response = Response(stream_with_context(generate()), mimetype='text/calendar')
+        response.headers['Content-Disposition'] = 'inline; filename="ecocleanup.ics"'
+
+    # DTSTAMP differs between responses, so the ETag is weak
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.max_age = 300
+    return response
+
+
+@calendar_bp.route('/token', methods=['POST'])
+@login_required
+def reset_token():
+    """Create the current user's feed link, or replace it (old link stops working)"""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO calendar_feeds (user_id, token)
+            VALUES (%s, %s)
+            ON CONFLICT (user_id) DO UPDATE
+            SET token = EXCLUDED.token, version = calendar_feeds.version + 1
+        """, (session['user_id'], secrets.token_urlsafe(32)))
+        conn.commit()
+        flash('Your calendar link is ready. Links created earlier no longer work.', 'success')
+    except Exception as e:
+        conn.rollback()
+        flash(f'Could not create calendar link: {str(e)}', 'danger')
+    finally:
+        cur.close()
+
+    return redirect(url_for('user.profile'))
@@ -1,50 +1,154 @@
 # loginapp/routes/events.py
 
+from datetime import date
+
+import psycopg2.errors
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from psycopg2.extras import RealDictCursor
+from .. import seats
+from ..recommendations import recommended_events
 from ..db import get_db
+from ..statements import statement
 from ..utils.decorators import login_required, role_required
+from ..utils.cache import data_fingerprint
+from ..utils.coalesce import StaleWhileRevalidate
 
 events_bp = Blueprint('events', __name__)
 
 
-@events_bp.route('/events')
-@login_required
-def list_events():
-    """Display list of upcoming events with optional filters"""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+# Free seats of a limited event (NULL when the event has no capacity)
+SEATS_LEFT = """
+    CASE WHEN e.capacity IS NOT NULL THEN
+        (SELECT count(*) FROM event_seats s WHERE s.event_id = e.event_id AND s.registration_id IS NULL)
+    END"""
 
-    location_filter = request.args.get('location', '').strip()
-    date_filter = request.args.get('date', '')
 
-    query = """
-        SELECT e.*, u.full_name AS leader_name,
-               CASE WHEN er.volunteer_id IS NOT NULL THEN TRUE ELSE FALSE END AS registered
+def upcoming_events_query(user_id, location='', event_date='',
+                          select=f'e.*, u.full_name AS leader_name, {SEATS_LEFT} AS seats_left'):
+    """
+    Build the upcoming-events query shared by /events and the JSON API.
+    Rows carry 'registered' and 'waitlisted' flags for user_id.
+
+    Args:
+        user_id (int): Current user, used for the 'registered' flag
+        location (str): Optional location filter (substring, case-insensitive)
+        event_date (str): Optional exact date filter (YYYY-MM-DD)
+        select (str): Column list placed before the 'registered' flag
+
+    Returns:
+        tuple: (query, params) - ORDER BY is left to the caller
+    """
+    query = f"""
+        SELECT {select},
+               CASE WHEN er.volunteer_id IS NOT NULL THEN TRUE ELSE FALSE END AS registered,
+               w.volunteer_id IS NOT NULL AS waitlisted
         FROM events e
         JOIN users u ON e.event_leader_id = u.user_id
         LEFT JOIN eventregistrations er 
                ON e.event_id = er.event_id AND er.volunteer_id = %s
+        LEFT JOIN event_waitlist w
+               ON e.event_id = w.event_id AND w.volunteer_id = %s
         WHERE e.event_date >= CURRENT_DATE
+          AND e.status = 'scheduled'
     """
-    params = [session['user_id']]
+    params = [user_id, user_id]
 
-    if location_filter:
+    if location:
         query += " AND e.location ILIKE %s"
-        params.append(f"%{location_filter}%")
+        params.append(f"%{location}%")
 
-    if date_filter:
+    if event_date:
         query += " AND e.event_date = %s"
-        params.append(date_filter)
+        params.append(event_date)
+
+    return query, params
+
+
+# One prepared statement per filter combination of the /events page
+LIST_EVENTS = {
+    (by_location, by_date): statement(
+        'list_events' + ('_location' if by_location else '') + ('_date' if by_date else ''),
+        upcoming_events_query(None, by_location, by_date)[0] + " ORDER BY e.event_date, e.start_time")
+    for by_location in (False, True) for by_date in (False, True)
+}
+
+# The event ids the user is registered / waitlisted for, merged into the shared list
+USER_EVENT_FLAGS = statement('user_event_flags', """
+    SELECT event_id, TRUE AS registered FROM eventregistrations WHERE volunteer_id = %s
+    UNION ALL
+    SELECT event_id, FALSE FROM event_waitlist WHERE volunteer_id = %s
+""")
+
+# The unfiltered list is the same for everyone apart from those flags, so it
+# is computed once per process and reused for a few seconds (places left may
+# lag by that much); when it expires one request refreshes it while the rest
+# are answered from the previous copy
+UPCOMING_EVENTS = StaleWhileRevalidate(max_age=5, stale_for=60)
+
+CONFLICT_CHECK = statement('registration_conflict', """
+    SELECT 1
+    FROM events e
+    JOIN eventregistrations er ON e.event_id = er.event_id
+    WHERE er.volunteer_id = %s
+      AND e.event_date = %s
+      AND e.status = 'scheduled'
+      AND e.start_time < (%s::time + interval '1 minute' * %s)
+      AND (e.start_time + interval '1 minute' * e.duration) > %s
+    LIMIT 1
+""")
+
+
+def _upcoming_for_user(conn, cur, user_id):
+    """The shared upcoming-events list with this user's registered / waitlisted flags"""
+    def load():
+        try:
+            LIST_EVENTS[False, False].execute(cur, (None, None))
+            return cur.fetchall()
+        except Exception:
+            conn.rollback()
+            raise
+
+    shared = UPCOMING_EVENTS.get('unfiltered', load)
+    USER_EVENT_FLAGS.execute(cur, (user_id, user_id))
+    flags = {row['event_id']: row['registered'] for row in cur.fetchall()}
+    return [dict(event,
+                 registered=flags.get(event['event_id']) is True,
+                 waitlisted=flags.get(event['event_id']) is False)
+            for event in shared]
 
-    query += " ORDER BY e.event_date, e.start_time"
 
-    cur.execute(query, params)
-    events = cur.fetchall()
+@events_bp.route('/events')
+@login_required
+def list_events():
+    """Display list of upcoming events with optional filters"""
+    conn = get_db(readonly=True)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    location_filter = request.args.get('location', '').strip()
+    date_filter = request.args.get('date', '')
+    if date_filter:
+        try:
+            date.fromisoformat(date_filter)
+        except ValueError:
+            flash('Date must be YYYY-MM-DD', 'warning')
+            date_filter = ''
+
+    recommended = []
+    if location_filter or date_filter:
+        _, params = upcoming_events_query(session['user_id'], location_filter, date_filter)
+        LIST_EVENTS[bool(location_filter), bool(date_filter)].execute(cur, params)
+        events = cur.fetchall()
+    else:
+        events = _upcoming_for_user(conn, cur, session['user_id'])
+        # Suggestions link to cards on this page, so only with the full list
+        if session.get('role') == 'volunteer':
+            recommended = recommended_events(cur, session['user_id'], limit=5)
     cur.close()
 
     return render_template('events.html',
                            events=events,
+                           events_version=data_fingerprint(events),
+                           recommended=recommended,
                            search_location=location_filter,
                            search_date=date_filter)
 
@@ -63,30 +167,25 @@ def register_event(event_id):
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     try:
-        # Fetch event details
+        # Fetch event details. FOR SHARE makes a concurrent cancel wait for
+        # this signup (and a signup after the cancel find no event).
         cur.execute("""
             SELECT event_id, event_date, start_time, duration, event_name
             FROM events 
-            WHERE event_id = %s AND event_date >= CURRENT_DATE
+            WHERE event_id = %s AND event_date >= CURRENT_DATE AND status = 'scheduled'
+            FOR SHARE
         """, (event_id,))
         event = cur.fetchone()
 
         if not event:
-            flash('Event not found or has already passed', 'danger')
+            conn.rollback()
+            flash('Event not found, cancelled or has already passed', 'danger')
             return redirect(url_for('events.list_events'))
 
-        # Check for time conflict
-        conflict_query = """
-            SELECT 1
-            FROM events e
-            JOIN eventregistrations er ON e.event_id = er.event_id
-            WHERE er.volunteer_id = %s
-              AND e.event_date = %s
-              AND e.start_time < (%s + interval '1 minute' * %s)
-              AND (e.start_time + interval '1 minute' * e.duration) > %s
-            LIMIT 1
-        """
-        cur.execute(conflict_query, (
+        # Check for time conflict; two signups of one volunteer for
+        # overlapping events would otherwise both pass it
+        seats.lock_volunteer(cur, session['user_id'])
+        CONFLICT_CHECK.execute(cur, (
             session['user_id'],
             event['event_date'],
             event['start_time'],
@@ -95,23 +194,27 @@ def register_event(event_id):
         ))
 
         if cur.fetchone():
+            conn.rollback()
             flash('Time conflict: You are already registered for another event at the same time.', 'danger')
             return redirect(url_for('events.list_events'))
 
-        # Attempt to register
-        cur.execute("""
-            INSERT INTO eventregistrations (event_id, volunteer_id)
-            VALUES (%s, %s)
-            ON CONFLICT DO NOTHING
-        """, (event_id, session['user_id']))
-
+        # Attempt to register (takes a seat, or joins the waitlist when full)
+        outcome = seats.register(conn, event_id, session['user_id'])
         conn.commit()
 
-        if cur.rowcount > 0:
+        if outcome == 'registered':
             flash(f'Successfully registered for "{event["event_name"]}"!', 'success')
+        elif outcome == 'waitlisted':
+            position = seats.waitlist_position(conn, event_id, session['user_id'])
+            conn.commit()
+            flash(f'"{event["event_name"]}" is full. You are number {position} on the waitlist '
+                  'and will be registered automatically if a place opens up.', 'info')
         else:
             flash('You are already registered for this event.', 'info')
 
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         flash('Registration failed. Please try again later.', 'danger')
@@ -120,4 +223,33 @@ def register_event(event_id):
     finally:
         cur.close()
 
-    return redirect(url_for('events.list_events'))
\ No newline at end of file
+    return redirect(url_for('events.list_events'))
+
+
+@events_bp.route('/waitlist/<int:event_id>/leave', methods=['POST'])
+@login_required
+@role_required('volunteer')
+def leave_waitlist(event_id):
+    """Take the current volunteer off an event's waitlist"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("DELETE FROM event_waitlist WHERE event_id = %s AND volunteer_id = %s",
+                    (event_id, session['user_id']))
+        conn.commit()
+        if cur.rowcount:
+            flash('You have left the waitlist.', 'success')
+        else:
+            flash('You were not on the waitlist for this event.', 'info')
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        flash('Could not leave the waitlist. Please try again later.', 'danger')
+        print(f"Leave waitlist error for event {event_id}: {e}")
+    finally:
+        cur.close()
+
+    return redirect(url_for('events.list_events'))
@@ -0,0 +1,35 @@
+# loginapp/routes/health.py
+"""
+Readiness probe for the load balancer.
+
+GET /ready answers 200 while this process can take more work and 503 when
+its primary pool is saturated (every slot in use, or logins and
+registrations queueing for one) or the database does not answer. The body
+reports the pool pressure and replica lag so an operator can see why.
+"""
+
+import psycopg2
+from flask import Blueprint, jsonify
+
+from .. import db
+from ..admission import Overloaded
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/ready')
+def ready():
+    """Pool pressure, replica lag and whether this process should get traffic"""
+    pressure = db.gate.pressure()
+    ok = pressure['in_use'] < pressure['capacity'] and not pressure['waiting']['high']
+
+    if ok:
+        try:
+            with db.get_db().cursor() as cur:
+                cur.execute("SELECT 1")
+        except (psycopg2.Error, Overloaded) as e:
+            print(f"Readiness check failed: {e}")
+            ok = False
+
+    replicas = [{'name': r['name'], 'lag': r['lag']} for r in db.replicas.replicas]
+    return jsonify(ready=ok, pool=pressure, replicas=replicas), 200 if ok else 503
@@ -1,37 +1,84 @@
 # app/routes/leader.py
 
+import psycopg2.errors
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from psycopg2.extras import RealDictCursor
-from datetime import date
-from ..db import get_db
+from psycopg2.extras import RealDictCursor, execute_values
+from datetime import date, datetime, timedelta
+import calendar
+import re
+from ..db import get_db, gather, fetchone, fetchall
+from ..jobs import enqueue
+from .. import seats, stats
 from ..utils.decorators import login_required, role_required
 
 leader_bp = Blueprint('leader', __name__)
 
+RECURRENCE_CHOICES = ('weekly', 'fortnightly', 'monthly')
+MAX_OCCURRENCES = 52  # one season of weekly events
+
+
+def _parse_date(value):
+    return datetime.strptime(value.strip(), '%Y-%m-%d').date()
+
+
+def expand_recurrence(first_date, recurrence, repeat_until, skip_dates=()):
+    """
+    List the dates of a recurring series.
+
+    Args:
+        first_date (date): Date of the first occurrence
+        recurrence (str): 'weekly', 'fortnightly' or 'monthly'
+        repeat_until (date): Last possible date (inclusive)
+        skip_dates (iterable of date): Dates to leave out (e.g. public holidays)
+
+    Returns:
+        list[date]: Occurrence dates in order (monthly events on the 29th-31st
+        fall back to the last day of shorter months)
+    """
+    skip = set(skip_dates)
+    dates = []
+    n = 0
+    while len(dates) <= MAX_OCCURRENCES:
+        if recurrence == 'monthly':
+            month_index = first_date.month - 1 + n
+            year, month = first_date.year + month_index // 12, month_index % 12 + 1
+            day = min(first_date.day, calendar.monthrange(year, month)[1])
+            current = date(year, month, day)
+        else:
+            step = 7 if recurrence == 'weekly' else 14
+            current = first_date + timedelta(days=step * n)
+
+        if current > repeat_until:
+            break
+        if current not in skip:
+            dates.append(current)
+        n += 1
+    return dates
+
+
+# Events with registration count and average rating (the leader's list adds WHERE e.event_leader_id)
+MY_EVENTS = """
+    SELECT e.*,
+           (SELECT COUNT(*) FROM eventregistrations WHERE event_id = e.event_id) AS reg_count,
+           fs.rating_sum::numeric / NULLIF(fs.rating_count, 0) AS avg_rating
+    FROM events e
+    LEFT JOIN event_feedback_stats fs ON fs.event_id = e.event_id
+"""
+
 
 @leader_bp.route('/my_events')
 @login_required
 @role_required('event_leader')
 def my_events():
     """Show events organized by the current leader (admin sees all)"""
-    conn = get_db()
+    conn = get_db(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     if session['role'] == 'admin':
-        cur.execute("""
-            SELECT e.*, 
-                   (SELECT COUNT(*) FROM eventregistrations WHERE event_id = e.event_id) AS reg_count
-            FROM events e
-            ORDER BY e.event_date DESC
-        """)
+        cur.execute(MY_EVENTS + " ORDER BY e.event_date DESC")
     else:
-        cur.execute("""
-            SELECT e.*, 
-                   (SELECT COUNT(*) FROM eventregistrations WHERE event_id = e.event_id) AS reg_count
-            FROM events e
-            WHERE e.event_leader_id = %s
-            ORDER BY e.event_date DESC
-        """, (session['user_id'],))
+        cur.execute(MY_EVENTS + " WHERE e.event_leader_id = %s ORDER BY e.event_date DESC",
+                    (session['user_id'],))
 
     events = cur.fetchall()
     cur.close()
@@ -54,28 +101,119 @@ def create_event():
         description = request.form.get('description')
         supplies = request.form.get('supplies')
         safety = request.form.get('safety_instructions')
+        capacity = request.form.get('capacity', '').strip()
+
+        recurrence = request.form.get('recurrence', 'none')
 
         conn = get_db()
         cur = conn.cursor()
 
         try:
-            cur.execute("""
-                INSERT INTO events (
-                    event_name, location, event_date, start_time, duration,
-                    description, supplies, safety_instructions, event_leader_id
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (event_name, location, event_date, start_time, int(duration),
-                  description, supplies, safety, session['user_id']))
-            conn.commit()
-            flash('Event created successfully!', 'success')
-            return redirect(url_for('leader.my_events'))
+            capacity = int(capacity) if capacity else None
+            if recurrence in RECURRENCE_CHOICES:
+                created = _create_series(cur, recurrence, event_name, location, event_date,
+                                         start_time, int(duration), description, supplies, safety,
+                                         capacity)
+                if created:
+                    conn.commit()
+                    flash(f'Event series created: {created} occurrences', 'success')
+                    return redirect(url_for('leader.my_events'))
+                conn.rollback()
+            else:
+                cur.execute("""
+                    INSERT INTO events (
+                        event_name, location, event_date, start_time, duration,
+                        description, supplies, safety_instructions, event_leader_id, capacity
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING event_id
+                """, (event_name, location, event_date, start_time, int(duration),
+                      description, supplies, safety, session['user_id'], capacity))
+                enqueue(cur, 'score_events', {'event_ids': [cur.fetchone()[0]]})
+                conn.commit()
+                flash('Event created successfully!', 'success')
+                return redirect(url_for('leader.my_events'))
+        except psycopg2.errors.QueryCanceled:
+            conn.rollback()
+            raise
         except Exception as e:
             conn.rollback()
             flash(f'Failed to create event: {str(e)}', 'danger')
         finally:
             cur.close()
 
-    return render_template('create_event.html')
+    return render_template('create_event.html', recurrence_choices=RECURRENCE_CHOICES)
+
+
+# The leader's scheduled events overlapping a time slot, for all dates in one query
+LEADER_OVERLAPS = """
+    SELECT e.event_date, e.event_name
+    FROM unnest(%s::date[]) AS d(event_date)
+    JOIN events e ON e.event_date = d.event_date
+    WHERE e.event_leader_id = %s
+      AND e.status = 'scheduled'
+      AND e.event_id <> ALL(%s::int[])
+      AND e.start_time < (%s::time + interval '1 minute' * %s)
+      AND (e.start_time + interval '1 minute' * e.duration) > %s::time
+    ORDER BY e.event_date
+"""
+
+
+def _leader_overlaps(cur, leader_id, dates, start_time, duration, exclude_ids=()):
+    """'date (name), ...' of the first few overlapping events; '' when the slot is free"""
+    with cur.connection.cursor() as plain:
+        plain.execute(LEADER_OVERLAPS, (list(dates), leader_id, list(exclude_ids),
+                                        start_time, duration, start_time))
+        overlaps = plain.fetchall()
+    return ', '.join(f"{d.strftime('%Y-%m-%d')} ({name})" for d, name in overlaps[:5])
+
+
+def _create_series(cur, recurrence, event_name, location, event_date, start_time,
+                   duration, description, supplies, safety, capacity=None):
+    """
+    Expand a recurring event and insert every occurrence in one statement.
+    Flashes the reason and returns 0 if nothing was created.
+    """
+    try:
+        first_date = _parse_date(event_date)
+        repeat_until = _parse_date(request.form.get('repeat_until', ''))
+        skip_dates = [_parse_date(d) for d in re.split(r'[,\s]+', request.form.get('skip_dates', ''))
+                      if d.strip()]
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format', 'danger')
+        return 0
+
+    dates = expand_recurrence(first_date, recurrence, repeat_until, skip_dates)
+    if not dates:
+        flash('The series has no dates - check "Repeat until" and skipped dates', 'danger')
+        return 0
+    if len(dates) > MAX_OCCURRENCES:
+        flash(f'A series can have at most {MAX_OCCURRENCES} occurrences', 'danger')
+        return 0
+
+    overlaps = _leader_overlaps(cur, session['user_id'], dates, start_time, duration)
+    if overlaps:
+        flash(f'The series overlaps your existing events: {overlaps}', 'danger')
+        return 0
+
+    cur.execute("""
+        INSERT INTO eventseries (event_leader_id, recurrence, repeat_until)
+        VALUES (%s, %s, %s)
+        RETURNING series_id
+    """, (session['user_id'], recurrence, repeat_until))
+    series_id = cur.fetchone()[0]
+
+    rows = [(event_name, location, d, start_time, duration, description, supplies,
+             safety, session['user_id'], series_id, capacity) for d in dates]
+    event_ids = execute_values(cur, """
+        INSERT INTO events (
+            event_name, location, event_date, start_time, duration,
+            description, supplies, safety_instructions, event_leader_id, series_id, capacity
+        ) VALUES %s
+        RETURNING event_id
+    """, rows, page_size=len(rows), fetch=True)
+    # Recommendation scores for the whole series, computed by the worker
+    enqueue(cur, 'score_events', {'event_ids': [r[0] for r in event_ids]})
+    return len(rows)
 
 
 @leader_bp.route('/edit_event/<int:event_id>', methods=['GET', 'POST'])
@@ -87,18 +225,135 @@ def edit_event(event_id):
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     # Check ownership or admin
-    cur.execute("SELECT event_leader_id FROM events WHERE event_id = %s", (event_id,))
+    cur.execute("SELECT event_leader_id, series_id, status, duration FROM events WHERE event_id = %s", (event_id,))
     event = cur.fetchone()
     if not event or (session['role'] != 'admin' and event['event_leader_id'] != session['user_id']):
         flash('Permission denied', 'danger')
         cur.close()
         return redirect(url_for('leader.my_events'))
+    if event['status'] == 'cancelled':
+        flash('Cancelled events cannot be edited', 'warning')
+        cur.close()
+        return redirect(url_for('leader.event_detail', event_id=event_id))
 
     if request.method == 'POST':
-        # Update logic here (similar to create_event)
-        # ... (omitted for brevity, implement similar to create_event)
-        flash('Event updated successfully', 'success')
-        return redirect(url_for('leader.event_detail', event_id=event_id))
+        event_name = request.form.get('event_name')
+        location = request.form.get('location')
+        event_date = request.form.get('event_date')
+        start_time = request.form.get('start_time')
+        duration = request.form.get('duration')
+        description = request.form.get('description')
+        supplies = request.form.get('supplies')
+        safety = request.form.get('safety_instructions')
+        capacity = request.form.get('capacity', '').strip()
+
+        try:
+            capacity = int(capacity) if capacity else None
+
+            # The upcoming occurrences the series edit will move to the new time
+            apply_to_series = bool(event['series_id'] and request.form.get('apply_to_series'))
+            if apply_to_series:
+                cur.execute("""
+                    SELECT event_id, event_date
+                    FROM events
+                    WHERE series_id = %s
+                      AND event_id <> %s
+                      AND event_date >= CURRENT_DATE
+                      AND status = 'scheduled'
+                    FOR UPDATE
+                """, (event['series_id'], event_id))
+                occurrences = cur.fetchall()
+                overlaps = _leader_overlaps(
+                    cur, event['event_leader_id'],
+                    [event_date] + [o['event_date'] for o in occurrences], start_time, int(duration),
+                    exclude_ids=[event_id] + [o['event_id'] for o in occurrences])
+                if overlaps:
+                    conn.rollback()
+                    flash(f'The series would overlap other events of its leader: {overlaps}', 'danger')
+                    cur.close()
+                    return redirect(url_for('leader.edit_event', event_id=event_id))
+
+            cur.execute("""
+                UPDATE events e
+                SET event_name = %s, location = %s, event_date = %s, start_time = %s,
+                    duration = %s, description = %s, supplies = %s, safety_instructions = %s,
+                    capacity = %s
+                FROM (
+                    SELECT location, event_date, duration
+                    FROM events
+                    WHERE event_id = %s
+                    FOR UPDATE
+                ) old
+                WHERE e.event_id = %s
+                RETURNING e.location, e.event_date, e.duration, e.event_leader_id,
+                          old.location AS old_location, old.event_date AS old_event_date,
+                          old.duration AS old_duration
+            """, (event_name, location, event_date, start_time, int(duration),
+                  description, supplies, safety, capacity, event_id, event_id))
+            updated = cur.fetchone()
+            duration_deltas = {event_id: updated['duration'] - updated['old_duration']}
+
+            # A recorded outcome moves to the new location / month on the leaderboard
+            cur.execute("""
+                SELECT COALESCE(bags_collected, 0) AS bags_collected,
+                       COALESCE(recyclables_sorted, 0) AS recyclables_sorted
+                FROM eventoutcomes WHERE event_id = %s
+            """, (event_id,))
+            outcome = cur.fetchone()
+            if outcome:
+                bags, recyclables = outcome['bags_collected'], outcome['recyclables_sorted']
+                stats.leaderboard_changed(cur, [
+                    (updated['old_location'], updated['event_leader_id'], updated['old_event_date'],
+                     -1, -bags, -recyclables),
+                    (updated['location'], updated['event_leader_id'], updated['event_date'],
+                     1, bags, recyclables),
+                ])
+
+            # Same details (everything except the date) for the rest of the series
+            updated_series = 0
+            if apply_to_series:
+                cur.execute("""
+                    UPDATE events e
+                    SET event_name = %s, location = %s, start_time = %s, duration = %s,
+                        description = %s, supplies = %s, safety_instructions = %s, capacity = %s
+                    FROM (
+                        SELECT event_id, duration AS old_duration
+                        FROM events
+                        WHERE series_id = %s
+                          AND event_id <> %s
+                          AND event_date >= CURRENT_DATE
+                          AND status = 'scheduled'
+                        FOR UPDATE
+                    ) old
+                    WHERE e.event_id = old.event_id
+                    RETURNING e.event_id, e.duration - old.old_duration AS delta
+                """, (event_name, location, start_time, int(duration), description,
+                      supplies, safety, capacity, event['series_id'], event_id))
+                series_rows = cur.fetchall()
+                duration_deltas.update((r['event_id'], r['delta']) for r in series_rows)
+                updated_series = len(series_rows)
+
+            stats.durations_changed(cur, duration_deltas)
+            enqueue(cur, 'score_events', {'event_ids': list(duration_deltas)})
+
+            # A larger (or removed) capacity lets people in from the waitlist
+            promoted = sum(len(seats.promote(conn, eid)) for eid in duration_deltas)
+
+            conn.commit()
+            if promoted:
+                flash(f'{promoted} volunteer(s) moved from the waitlist into the event', 'info')
+            if updated_series:
+                flash(f'Event and {updated_series} upcoming occurrence(s) in the series updated', 'success')
+            else:
+                flash('Event updated successfully', 'success')
+            cur.close()
+            return redirect(url_for('leader.event_detail', event_id=event_id))
+        except psycopg2.errors.QueryCanceled:
+            conn.rollback()
+            raise
+        except Exception as e:
+            conn.rollback()
+            flash(f'Failed to update event: {str(e)}', 'danger')
 
     cur.execute("SELECT * FROM events WHERE event_id = %s", (event_id,))
     event_data = cur.fetchone()
@@ -107,49 +362,82 @@ def edit_event(event_id):
     return render_template('edit_event.html', event=event_data)
 
 
-@leader_bp.route('/event_detail/<int:event_id>')
-@login_required
-@role_required('event_leader')
-def event_detail(event_id):
-    """View detailed information of an event (registrations, outcomes, etc.)"""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+EVENT_DETAIL = """
+    SELECT {select}
+    FROM events e
+    JOIN users u ON e.event_leader_id = u.user_id
+    WHERE e.event_id = %s
+"""
 
-    # Get event info
-    cur.execute("""
-        SELECT e.*, u.full_name AS leader_name
-        FROM events e
-        JOIN users u ON e.event_leader_id = u.user_id
-        WHERE e.event_id = %s
-    """, (event_id,))
-    event = cur.fetchone()
+EVENT_REGISTRATIONS = """
+    SELECT u.user_id AS volunteer_id, u.full_name, er.attendance
+    FROM eventregistrations er
+    JOIN users u ON er.volunteer_id = u.user_id
+    WHERE er.event_id = %s
+    ORDER BY u.full_name
+"""
+
+EVENT_OUTCOME = "SELECT * FROM eventoutcomes WHERE event_id = %s"
+
+EVENT_FEEDBACK = "SELECT rating_count, rating_sum FROM event_feedback_stats WHERE event_id = %s"
 
+EVENT_WAITLIST = """
+    SELECT u.full_name, w.joined_at
+    FROM event_waitlist w
+    JOIN users u ON u.user_id = w.volunteer_id
+    WHERE w.event_id = %s
+    ORDER BY w.waitlist_id
+"""
+
+
+def fetch_event_detail(cur, event_id, select='e.*, u.full_name AS leader_name'):
+    """
+    Load an event with its registrations and outcome (shared with the JSON API).
+
+    Returns:
+        tuple: (event, registrations, outcome) - event is None if not found
+    """
+    cur.execute(EVENT_DETAIL.format(select=select), (event_id,))
+    event = cur.fetchone()
     if not event:
-        flash('Event not found', 'danger')
-        cur.close()
-        return redirect(url_for('leader.my_events'))
+        return None, [], None
 
     # Get registrations
-    cur.execute("""
-        SELECT u.user_id AS volunteer_id, u.full_name, er.attendance
-        FROM eventregistrations er
-        JOIN users u ON er.volunteer_id = u.user_id
-        WHERE er.event_id = %s
-        ORDER BY u.full_name
-    """, (event_id,))
+    cur.execute(EVENT_REGISTRATIONS, (event_id,))
     registrations = cur.fetchall()
 
     # Get outcome if exists
-    cur.execute("SELECT * FROM eventoutcomes WHERE event_id = %s", (event_id,))
+    cur.execute(EVENT_OUTCOME, (event_id,))
     outcome = cur.fetchone()
 
-    cur.close()
+    return event, registrations, outcome
+
+
+@leader_bp.route('/event_detail/<int:event_id>')
+@login_required
+@role_required('event_leader')
+def event_detail(event_id):
+    """View detailed information of an event (registrations, outcomes, etc.)"""
+    # Independent reads, run concurrently on separate connections
+    event, registrations, outcome, feedback, waitlist = gather(
+        fetchone(EVENT_DETAIL.format(select='e.*, u.full_name AS leader_name'), (event_id,)),
+        fetchall(EVENT_REGISTRATIONS, (event_id,)),
+        fetchone(EVENT_OUTCOME, (event_id,)),
+        fetchone(EVENT_FEEDBACK, (event_id,)),
+        fetchall(EVENT_WAITLIST, (event_id,)),
+    )
+
+    if not event:
+        flash('Event not found', 'danger')
+        return redirect(url_for('leader.my_events'))
 
     today = date.today()
     return render_template('event_detail_leader.html',
                            event=event,
                            registrations=registrations,
                            outcome=outcome,
+                           feedback=feedback,
+                           waitlist=waitlist,
                            today=today)
 
 
@@ -163,29 +451,139 @@ def mark_attendance(event_id, volunteer_id):
     conn = get_db()
     cur = conn.cursor()
 
-    # Check ownership
-    cur.execute("SELECT event_leader_id FROM events WHERE event_id = %s", (event_id,))
+    # Check ownership. FOR SHARE waits for a concurrent outcome save or event
+    # edit, so the stats below see the bags / duration they committed.
+    cur.execute("SELECT event_leader_id, status FROM events WHERE event_id = %s FOR SHARE", (event_id,))
     owner = cur.fetchone()
     if not owner or (session['role'] != 'admin' and owner[0] != session['user_id']):
         flash('Permission denied', 'danger')
         cur.close()
         return redirect(url_for('leader.event_detail', event_id=event_id))
+    if owner[1] == 'cancelled':
+        flash('Attendance cannot be marked for a cancelled event', 'warning')
+        cur.close()
+        return redirect(url_for('leader.event_detail', event_id=event_id))
+
+    try:
+        # Lock the registration so concurrent updates count the change once
+        cur.execute("""
+            SELECT attendance FROM eventregistrations
+            WHERE event_id = %s AND volunteer_id = %s
+            FOR UPDATE
+        """, (event_id, volunteer_id))
+        previous = cur.fetchone()
+
+        if previous:
+            cur.execute("""
+                UPDATE eventregistrations 
+                SET attendance = %s 
+                WHERE event_id = %s AND volunteer_id = %s
+            """, (attendance, event_id, volunteer_id))
+            stats.attendance_changed(cur, event_id, [(volunteer_id, previous[0], attendance)])
+            # Keep a recorded outcome's attendee count in step
+            cur.execute("""
+                UPDATE eventoutcomes
+                SET num_attendees = (SELECT COUNT(*) FROM eventregistrations
+                                     WHERE event_id = %s AND attendance = 'attended')
+                WHERE event_id = %s
+            """, (event_id, event_id))
+        conn.commit()
+        flash('Attendance updated', 'success')
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        flash(f'Failed to update attendance: {str(e)}', 'danger')
+    finally:
+        cur.close()
+
+    return redirect(url_for('leader.event_detail', event_id=event_id))
+
+
+@leader_bp.route('/record_outcome/<int:event_id>', methods=['POST'])
+@login_required
+@role_required('event_leader')
+def record_outcome(event_id):
+    """Record or update the outcome of a past event"""
+    try:
+        bags = int(request.form.get('bags_collected') or 0)
+        recyclables = int(request.form.get('recyclables_sorted') or 0)
+    except ValueError:
+        flash('Bags and recyclables must be whole numbers', 'danger')
+        return redirect(url_for('leader.event_detail', event_id=event_id))
+    if bags < 0 or recyclables < 0:
+        flash('Bags and recyclables cannot be negative', 'danger')
+        return redirect(url_for('leader.event_detail', event_id=event_id))
+    other_achievements = request.form.get('other_achievements') or None
 
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    # Lock the event row: saves for one event run one after another, so the
+    # deltas applied to the aggregates below are exact
     cur.execute("""
-        UPDATE eventregistrations 
-        SET attendance = %s 
-        WHERE event_id = %s AND volunteer_id = %s
-    """, (attendance, event_id, volunteer_id))
-    conn.commit()
-    flash('Attendance updated', 'success')
-    cur.close()
+        SELECT event_leader_id, location, event_date, status
+        FROM events
+        WHERE event_id = %s
+        FOR NO KEY UPDATE
+    """, (event_id,))
+    event = cur.fetchone()
+    if not event or (session['role'] != 'admin' and event['event_leader_id'] != session['user_id']):
+        flash('Permission denied', 'danger')
+        cur.close()
+        return redirect(url_for('leader.my_events'))
+    if event['status'] == 'cancelled' or event['event_date'] >= date.today():
+        flash('Outcomes can be recorded after the event date has passed', 'warning')
+        cur.close()
+        return redirect(url_for('leader.event_detail', event_id=event_id))
+
+    try:
+        cur.execute("""
+            SELECT COALESCE(bags_collected, 0) AS bags_collected,
+                   COALESCE(recyclables_sorted, 0) AS recyclables_sorted
+            FROM eventoutcomes WHERE event_id = %s
+        """, (event_id,))
+        previous = cur.fetchone()
+
+        # Attendee count comes from the attendance the leader has marked
+        cur.execute("""
+            INSERT INTO eventoutcomes (event_id, num_attendees, bags_collected,
+                                       recyclables_sorted, other_achievements)
+            SELECT %s, COUNT(*) FILTER (WHERE attendance = 'attended'), %s, %s, %s
+            FROM eventregistrations
+            WHERE event_id = %s
+            ON CONFLICT (event_id) DO UPDATE
+            SET num_attendees = EXCLUDED.num_attendees,
+                bags_collected = EXCLUDED.bags_collected,
+                recyclables_sorted = EXCLUDED.recyclables_sorted,
+                other_achievements = EXCLUDED.other_achievements,
+                recorded_at = CURRENT_TIMESTAMP
+        """, (event_id, bags, recyclables, other_achievements, event_id))
+
+        old_bags = previous['bags_collected'] if previous else 0
+        old_recyclables = previous['recyclables_sorted'] if previous else 0
+        stats.outcome_changed(cur, event_id, bags - old_bags)
+        stats.leaderboard_changed(cur, [(event['location'], event['event_leader_id'], event['event_date'],
+                                         0 if previous else 1, bags - old_bags,
+                                         recyclables - old_recyclables)])
+        conn.commit()
+        flash('Outcomes saved', 'success')
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        flash(f'Failed to save outcomes: {str(e)}', 'danger')
+    finally:
+        cur.close()
 
     return redirect(url_for('leader.event_detail', event_id=event_id))
 
 
 @leader_bp.route('/cancel_event/<int:event_id>', methods=['POST'])
 @login_required
-@role_required('event_leader', 'admin')
+@role_required('event_leader')
 def cancel_event(event_id):
     """Cancel an event (only by owner or admin)"""
     conn = get_db()
@@ -208,15 +606,26 @@ def cancel_event(event_id):
             flash('Permission denied - you are not the owner of this event', 'danger')
             return redirect(url_for('leader.my_events'))
 
-        # Delete related registrations first (due to foreign key constraints)
-        cur.execute("DELETE FROM eventregistrations WHERE event_id = %s", (event_id,))
-
-        # Delete the event itself
-        cur.execute("DELETE FROM events WHERE event_id = %s", (event_id,))
+        # Status flip only; the job worker moves the registrations out
+        # later in small batches
+        cur.execute("""
+            UPDATE events
+            SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
+            WHERE event_id = %s AND status = 'scheduled'
+        """, (event_id,))
+        cancelled = cur.rowcount
+        if cancelled:
+            enqueue(cur, 'purge_cancelled_events', dedupe_key='all')
 
         conn.commit()
-        flash('Event has been cancelled successfully. All registrations removed.', 'success')
+        if cancelled:
+            flash('Event has been cancelled successfully. Registered volunteers will see the cancellation.', 'success')
+        else:
+            flash('Event was already cancelled', 'info')
 
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         flash(f'Failed to cancel event: {str(e)}', 'danger')
@@ -227,18 +636,65 @@ def cancel_event(event_id):
 
     return redirect(url_for('leader.my_events'))
 
+@leader_bp.route('/cancel_series/<int:series_id>', methods=['POST'])
+@login_required
+@role_required('event_leader')
+def cancel_series(series_id):
+    """Cancel every upcoming occurrence of a recurring series (owner or admin)"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT event_leader_id FROM eventseries WHERE series_id = %s", (series_id,))
+        owner = cur.fetchone()
+
+        if not owner:
+            flash('Event series not found', 'danger')
+            return redirect(url_for('leader.my_events'))
+
+        if session['role'] != 'admin' and owner[0] != session['user_id']:
+            flash('Permission denied - you are not the owner of this series', 'danger')
+            return redirect(url_for('leader.my_events'))
+
+        # Past occurrences keep their history
+        cur.execute("""
+            UPDATE events
+            SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
+            WHERE series_id = %s AND event_date >= CURRENT_DATE AND status = 'scheduled'
+        """, (series_id,))
+        cancelled = cur.rowcount
+        if cancelled:
+            enqueue(cur, 'purge_cancelled_events', dedupe_key='all')
+
+        conn.commit()
+        flash(f'{cancelled} upcoming occurrence(s) of the series cancelled.', 'success')
+
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        flash(f'Failed to cancel series: {str(e)}', 'danger')
+        print(f"Cancel series error: {e}")
+
+    finally:
+        cur.close()
+
+    return redirect(url_for('leader.my_events'))
+
+
 @leader_bp.route('/remove_volunteer/<int:event_id>/<int:volunteer_id>', methods=['POST'])
 @login_required
-@role_required('event_leader', 'admin')
+@role_required('event_leader')
 def remove_volunteer(event_id, volunteer_id):
     """Remove a volunteer from an event (only by event leader or admin)"""
     conn = get_db()
     cur = conn.cursor()
 
     try:
-        # 檢查事件是否存在 + 擁有權
+        # 檢查事件是否存在 + 擁有權 (FOR SHARE: waits for a concurrent event edit or outcome save)
         cur.execute("""
-            SELECT event_leader_id FROM events WHERE event_id = %s
+            SELECT event_leader_id, event_date < CURRENT_DATE FROM events WHERE event_id = %s FOR SHARE
         """, (event_id,))
         owner = cur.fetchone()
 
@@ -250,18 +706,33 @@ def remove_volunteer(event_id, volunteer_id):
             flash('Permission denied - you are not the event owner', 'danger')
             return redirect(url_for('leader.event_detail', event_id=event_id))
 
+        # Attendance and feedback of a past event hang off the registration
+        if owner[1]:
+            flash('This event has already taken place - mark the volunteer absent instead', 'warning')
+            return redirect(url_for('leader.event_detail', event_id=event_id))
+
         # 刪除該志工的註冊記錄
         cur.execute("""
             DELETE FROM eventregistrations 
             WHERE event_id = %s AND volunteer_id = %s
+            RETURNING attendance
         """, (event_id, volunteer_id))
+        removed = cur.fetchone()
 
-        if cur.rowcount == 0:
+        if removed is None:
             flash('This volunteer was not registered for the event', 'info')
         else:
+            stats.attendance_changed(cur, event_id, [(volunteer_id, removed[0], None)])
+            # The freed seat goes to the first volunteer on the waitlist
+            promoted = seats.promote(conn, event_id)
             conn.commit()
             flash('Volunteer removed from the event successfully', 'success')
+            if promoted:
+                flash('The next volunteer on the waitlist has been registered in their place', 'info')
 
+    except psycopg2.errors.QueryCanceled:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         flash(f'Failed to remove volunteer: {str(e)}', 'danger')
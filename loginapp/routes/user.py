@@ -1,17 +1,47 @@
 # app/routes/user.py
 from datetime import date
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
+import psycopg2.errors
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_bcrypt import check_password_hash, generate_password_hash
-import os
-import uuid
 from psycopg2.extras import RealDictCursor
 from ..db import get_db
+from .. import stats
+from ..jobs import enqueue
 from ..utils.decorators import login_required
-from ..utils.helpers import allowed_file
+from ..uploads import save_profile_image, discard_upload
+from ..utils.helpers import is_strong_password
 
 user_bp = Blueprint('user', __name__)
 
+# Public field name -> SQL expression of a participation row (the JSON API selects a subset)
+PARTICIPATION_FIELDS = {
+    'event_id': 'e.event_id',
+    'event_name': 'e.event_name',
+    'location': 'e.location',
+    'event_date': 'e.event_date',
+    'start_time': 'e.start_time',
+    'duration': 'e.duration',
+    'archived': 'e.archived',
+    'status': 'e.status',
+    'attendance': 'er.attendance',
+    'rating': 'f.rating',
+    'comments': 'f.comments',
+    'feedback_submitted': 'CASE WHEN f.feedback_id IS NOT NULL THEN TRUE ELSE FALSE END',
+}
+
+# A volunteer's registrations with feedback (shared with the JSON API and calendar feed).
+# *_history views include events already moved to cold storage.
+PARTICIPATION_FROM = """
+    FROM eventregistrations_history er
+    JOIN events_history e ON er.event_id = e.event_id
+    LEFT JOIN feedback_history f ON e.event_id = f.event_id AND er.volunteer_id = f.volunteer_id
+    WHERE er.volunteer_id = %s
+"""
+
+PARTICIPATION_QUERY = ("SELECT " + ', '.join(f"{sql} AS {name}" for name, sql in PARTICIPATION_FIELDS.items())
+                       + PARTICIPATION_FROM)
+
 
 @user_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -19,7 +49,16 @@ def profile():
     """View and update user profile"""
     conn = get_db()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM users WHERE user_id = %s", (session['user_id'],))
+    cur.execute("""
+        SELECT u.user_id, u.username, u.full_name, u.email, u.home_address, u.contact_number,
+               u.profile_image, u.environmental_interests, u.role, u.created_at,
+               f.token AS calendar_token,
+               vs.events_attended, vs.minutes_volunteered, vs.bags_collected
+        FROM users u
+        LEFT JOIN calendar_feeds f ON f.user_id = u.user_id
+        LEFT JOIN volunteer_stats vs ON vs.volunteer_id = u.user_id
+        WHERE u.user_id = %s
+    """, (session['user_id'],))
     user = cur.fetchone()
 
     if request.method == 'POST':
@@ -30,15 +69,8 @@ def profile():
         interests = request.form.get('environmental_interests')
 
         # Handle profile image upload
-        profile_image = user['profile_image']
-        if 'profile_image' in request.files:
-            file = request.files['profile_image']
-            if file and allowed_file(file.filename):
-                ext = file.filename.rsplit('.', 1)[1].lower()
-                filename = f"{uuid.uuid4()}.{ext}"
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                profile_image = filename
+        uploaded = save_profile_image(request.files.get('profile_image'))
+        profile_image = uploaded or user['profile_image']
 
         try:
             cur.execute("""
@@ -49,11 +81,19 @@ def profile():
                 WHERE user_id = %s
             """, (full_name, email, home_address, contact_number, interests,
                   profile_image, session['user_id']))
+            # The replaced image is removed from disk by the job worker
+            if user['profile_image'] and profile_image != user['profile_image']:
+                enqueue(cur, 'delete_upload', {'filename': user['profile_image']})
             conn.commit()
             flash('Profile updated successfully', 'success')
             return redirect(url_for('user.profile'))
+        except psycopg2.errors.QueryCanceled:
+            conn.rollback()
+            discard_upload(uploaded)
+            raise
         except Exception as e:
             conn.rollback()
+            discard_upload(uploaded)
             flash(f'Update failed: {str(e)}', 'danger')
 
     cur.close()
@@ -78,9 +118,7 @@ def change_password():
             flash('Current password is incorrect', 'danger')
         elif new_pw != confirm_pw:
             flash('New passwords do not match', 'danger')
-        elif len(new_pw) < 8 or not any(c.isupper() for c in new_pw) or \
-             not any(c.islower() for c in new_pw) or not any(c.isdigit() for c in new_pw) or \
-             not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>/? " for c in new_pw):
+        elif not is_strong_password(new_pw):
             flash('New password must be at least 8 characters with upper, lower, digit and special character', 'danger')
         else:
             new_hash = generate_password_hash(new_pw).decode('utf-8')
@@ -98,24 +136,30 @@ def change_password():
 @login_required
 def my_participation():
     """Show user's event participation history"""
-    conn = get_db()
+    conn = get_db(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
+    cur.execute(PARTICIPATION_QUERY + " ORDER BY e.event_date DESC", (session['user_id'],))
+    registrations = cur.fetchall()
+
+    # Upcoming events this volunteer is queueing for, with their place in line
     cur.execute("""
         SELECT e.event_id, e.event_name, e.location, e.event_date, e.start_time,
-               er.attendance, f.rating, f.comments,
-               CASE WHEN f.feedback_id IS NOT NULL THEN TRUE ELSE FALSE END AS feedback_submitted
-        FROM eventregistrations er
-        JOIN events e ON er.event_id = e.event_id
-        LEFT JOIN feedback f ON e.event_id = f.event_id AND er.volunteer_id = f.volunteer_id
-        WHERE er.volunteer_id = %s
-        ORDER BY e.event_date DESC
+               (SELECT count(*) FROM event_waitlist ahead
+                WHERE ahead.event_id = w.event_id AND ahead.waitlist_id <= w.waitlist_id) AS position
+        FROM event_waitlist w
+        JOIN events e ON e.event_id = w.event_id
+        WHERE w.volunteer_id = %s
+          AND e.event_date >= CURRENT_DATE
+          AND e.status = 'scheduled'
+        ORDER BY e.event_date, e.start_time
     """, (session['user_id'],))
-    registrations = cur.fetchall()
+    waitlist = cur.fetchall()
     cur.close()
 
     today = date.today()
-    return render_template('my_participation.html', registrations=registrations, today=today)
+    return render_template('my_participation.html', registrations=registrations,
+                           waitlist=waitlist, today=today)
 
 
 @user_bp.route('/submit_feedback/<int:event_id>', methods=['GET', 'POST'])
@@ -133,21 +177,45 @@ def submit_feedback(event_id):
         cur.close()
         return redirect(url_for('user.my_participation'))
 
-    # Get event info
-    cur.execute("SELECT event_name, event_date FROM events WHERE event_id = %s", (event_id,))
+    # Only volunteers who attended a past event can rate it. FOR SHARE keeps
+    # the registration from being changed or removed until the insert commits.
+    cur.execute("""
+        SELECT e.event_name, e.event_date, e.status
+        FROM eventregistrations er
+        JOIN events e ON e.event_id = er.event_id
+        WHERE er.event_id = %s AND er.volunteer_id = %s
+          AND er.attendance = 'attended'
+          AND e.event_date < CURRENT_DATE
+          AND e.status <> 'cancelled'
+        FOR SHARE OF er
+    """, (event_id, session['user_id']))
     event = cur.fetchone()
+    if not event:
+        conn.rollback()
+        flash('Feedback is not available for this event', 'warning')
+        cur.close()
+        return redirect(url_for('user.my_participation'))
 
     if request.method == 'POST':
         rating = request.form.get('rating')
         comments = request.form.get('comments')
 
         try:
+            # A double submit inserts nothing the second time, so it is counted once
             cur.execute("""
                 INSERT INTO feedback (event_id, volunteer_id, rating, comments)
                 VALUES (%s, %s, %s, %s)
+                ON CONFLICT DO NOTHING
             """, (event_id, session['user_id'], int(rating), comments))
+            if cur.rowcount:
+                stats.feedback_added(cur, event_id, int(rating))
+                flash('Feedback submitted successfully', 'success')
+            else:
+                flash('You have already submitted feedback for this event', 'info')
             conn.commit()
-            flash('Feedback submitted successfully', 'success')
+        except psycopg2.errors.QueryCanceled:
+            conn.rollback()
+            raise
         except Exception:
             conn.rollback()
             flash('Error submitting feedback', 'danger')
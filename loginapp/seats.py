@@ -0,0 +1,230 @@
+"""
+loginapp/seats.py - Event capacity: seat allocation and the waitlist
+
+This module provides:
+- register(conn, event_id, volunteer_id): register, holding a seat if the event is limited,
+  or join the waitlist when it is full
+- promote(conn, event_id): move volunteers from the front of the waitlist into free seats
+- waitlist_position(conn, event_id, volunteer_id)
+- lock_volunteer(cur, volunteer_id): serialise changes to one volunteer's registrations
+
+A limited event has one event_seats row per seat (the sync_event_seats trigger
+keeps them in step with events.capacity). A registration claims the lowest
+free seat with FOR UPDATE SKIP LOCKED, so a burst of signups for one event
+locks a different seat row each instead of queueing on the event row. The
+seat points at the registration (ON DELETE SET NULL), so deleting a
+registration frees its seat; callers then run promote(), which serves the
+waitlist strictly in arrival order.
+
+Time clashes are checked before a registration is inserted, so two signups
+of the same volunteer for overlapping events must not run side by side:
+register_event holds lock_volunteer() (a transaction-level advisory lock)
+from its clash check to commit. promote() only try-locks, skipping a
+volunteer whose own signup is in flight, so it never waits while holding
+seat rows.
+
+Functions run in the caller's transaction; the caller commits.
+"""
+
+# Retries when every free seat was locked by signups that then took it
+CLAIM_ATTEMPTS = 3
+
+CLAIM_SEAT = """
+    UPDATE event_seats
+    SET registration_id = %s
+    WHERE (event_id, seat_no) = (
+        SELECT event_id, seat_no
+        FROM event_seats
+        WHERE event_id = %s AND registration_id IS NULL
+        ORDER BY seat_no
+        LIMIT 1
+        FOR UPDATE {lock}
+    )
+    RETURNING seat_no
+"""
+
+# Advisory lock namespace (first key) for lock_volunteer(); the second key is the user_id
+VOLUNTEER_LOCK = 45001
+
+# Another registration of volunteer_id overlapping event e
+CLASH = """
+    EXISTS (
+        SELECT 1
+        FROM eventregistrations er
+        JOIN events o ON o.event_id = er.event_id
+        WHERE er.volunteer_id = {volunteer_id}
+          AND o.event_id <> e.event_id
+          AND o.event_date = e.event_date
+          AND o.status = 'scheduled'
+          AND o.start_time < e.start_time + interval '1 minute' * e.duration
+          AND o.start_time + interval '1 minute' * o.duration > e.start_time
+    )
+"""
+
+# First waitlisted volunteer without a clashing registration by then
+NEXT_IN_LINE = f"""
+    SELECT w.waitlist_id, w.volunteer_id
+    FROM event_waitlist w
+    JOIN events e ON e.event_id = w.event_id
+    WHERE w.event_id = %s
+      AND w.volunteer_id <> ALL (%s::int[])
+      AND NOT {CLASH.format(volunteer_id='w.volunteer_id')}
+    ORDER BY w.waitlist_id
+    LIMIT 1
+    FOR UPDATE OF w SKIP LOCKED
+"""
+
+HAS_CLASH = f"""
+    SELECT {CLASH.format(volunteer_id='%s')}
+    FROM events e
+    WHERE e.event_id = %s
+"""
+
+
+def lock_volunteer(cur, volunteer_id):
+    """Block until no other transaction is changing this volunteer's registrations"""
+    cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (VOLUNTEER_LOCK, volunteer_id))
+
+
+def _claim_seat(cur, event_id, registration_id):
+    """Give the registration the lowest free seat; None when the event is full"""
+    for _ in range(CLAIM_ATTEMPTS):
+        cur.execute(CLAIM_SEAT.format(lock='SKIP LOCKED'), (registration_id, event_id))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        # Free seats we skipped are held by signups still in flight; wait for one
+        cur.execute("""
+            SELECT EXISTS (SELECT 1 FROM event_seats WHERE event_id = %s AND registration_id IS NULL)
+        """, (event_id,))
+        if not cur.fetchone()[0]:
+            return None
+        cur.execute(CLAIM_SEAT.format(lock=''), (registration_id, event_id))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+    return None
+
+
+def waitlist_position(conn, event_id, volunteer_id):
+    """1-based place in the event's waitlist, or None if not waitlisted"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT count(*)
+            FROM event_waitlist w
+            JOIN event_waitlist mine
+              ON mine.event_id = w.event_id AND mine.volunteer_id = %s
+            WHERE w.event_id = %s AND w.waitlist_id <= mine.waitlist_id
+        """, (volunteer_id, event_id))
+        return cur.fetchone()[0] or None
+
+
+def register(conn, event_id, volunteer_id):
+    """
+    Register a volunteer for an event, or waitlist them if it is full.
+
+    Returns:
+        str: 'registered', 'waitlisted' or 'already_registered'
+    """
+    with conn.cursor() as cur:
+        cur.execute("SAVEPOINT seat_claim")
+        cur.execute("""
+            INSERT INTO eventregistrations (event_id, volunteer_id)
+            VALUES (%s, %s)
+            ON CONFLICT DO NOTHING
+            RETURNING registration_id
+        """, (event_id, volunteer_id))
+        row = cur.fetchone()
+        if row is None:
+            cur.execute("RELEASE SAVEPOINT seat_claim")
+            return 'already_registered'
+
+        # Read only now: the insert holds KEY SHARE on the event row, so a
+        # concurrent change from unlimited to limited has either committed
+        # (we see the capacity) or waits for us (and seats this registration)
+        cur.execute("SELECT capacity FROM events WHERE event_id = %s", (event_id,))
+        if cur.fetchone()[0] is None:
+            cur.execute("RELEASE SAVEPOINT seat_claim")
+            return 'registered'
+
+        if _claim_seat(cur, event_id, row[0]) is not None:
+            cur.execute("RELEASE SAVEPOINT seat_claim")
+            cur.execute("DELETE FROM event_waitlist WHERE event_id = %s AND volunteer_id = %s",
+                        (event_id, volunteer_id))
+            return 'registered'
+
+        cur.execute("ROLLBACK TO SAVEPOINT seat_claim")
+        cur.execute("""
+            INSERT INTO event_waitlist (event_id, volunteer_id)
+            VALUES (%s, %s)
+            ON CONFLICT DO NOTHING
+        """, (event_id, volunteer_id))
+        return 'waitlisted'
+
+
+def promote(conn, event_id):
+    """
+    Fill free seats of an upcoming event from the front of its waitlist
+    (every eligible waitlisted volunteer if the event is no longer limited).
+
+    Returns:
+        list: volunteer_ids registered, in waitlist order
+    """
+    promoted = []
+    skipped = []    # signing up elsewhere right now, or clashing since they were picked
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT capacity FROM events
+            WHERE event_id = %s AND status = 'scheduled' AND event_date >= CURRENT_DATE
+        """, (event_id,))
+        event = cur.fetchone()
+        if event is None:
+            return promoted
+        limited = event[0] is not None
+
+        while True:
+            seat_no = None
+            if limited:
+                cur.execute("""
+                    SELECT seat_no FROM event_seats
+                    WHERE event_id = %s AND registration_id IS NULL
+                    ORDER BY seat_no
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                """, (event_id,))
+                row = cur.fetchone()
+                if row is None:
+                    break
+                seat_no = row[0]
+
+            cur.execute(NEXT_IN_LINE, (event_id, skipped))
+            row = cur.fetchone()
+            if row is None:
+                break
+            waitlist_id, volunteer_id = row
+
+            # Their own signup may have committed a clash since NEXT_IN_LINE ran
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", (VOLUNTEER_LOCK, volunteer_id))
+            if not cur.fetchone()[0]:
+                skipped.append(volunteer_id)
+                continue
+            cur.execute(HAS_CLASH, (volunteer_id, event_id))
+            if cur.fetchone()[0]:
+                skipped.append(volunteer_id)
+                continue
+
+            cur.execute("DELETE FROM event_waitlist WHERE waitlist_id = %s", (waitlist_id,))
+            cur.execute("""
+                INSERT INTO eventregistrations (event_id, volunteer_id)
+                VALUES (%s, %s)
+                ON CONFLICT DO NOTHING
+                RETURNING registration_id
+            """, (event_id, volunteer_id))
+            row = cur.fetchone()
+            if row is None:
+                continue    # registered meanwhile; the seat is still ours for the next one
+            if limited:
+                cur.execute("UPDATE event_seats SET registration_id = %s WHERE event_id = %s AND seat_no = %s",
+                            (row[0], event_id, seat_no))
+            promoted.append(volunteer_id)
+    return promoted
@@ -0,0 +1,189 @@
+"""
+loginapp/sessions.py - Server-side login sessions with a cached user principal
+
+This module provides:
+- Principal: the compact view of the logged-in user (id, name, role)
+- PrincipalCache: bounded in-memory LRU of principals, keyed by session_id
+- create_session(cur, user_id) / revoke_session(cur, session_id)
+- init_sessions(app): load g.principal once at the start of every request
+
+Sessions live in the user_sessions table; the signed cookie holds only the
+random session_id (plus user_id / role copies for templates, refreshed from
+the principal on every request). A cache hit costs no database round trip.
+
+Invalidation: a trigger on users sends NOTIFY principal_changed <user_id>
+when a role, status or name changes and deletes the sessions of
+deactivated users. The process's database listener (db.listen) drops those
+users from its cache, so the change applies to their next request. The
+cache TTL bounds staleness if the listener is disconnected.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from flask import current_app, g, session
+
+from . import db
+
+Principal = namedtuple('Principal', 'user_id username full_name role')
+
+NOTIFY_CHANNEL = 'principal_changed'
+CACHE_TTL = 60          # seconds a cached principal is trusted without the listener
+
+PRINCIPAL_QUERY = """
+    SELECT u.user_id, u.username, u.full_name, u.role,
+           EXTRACT(EPOCH FROM s.expires_at - CURRENT_TIMESTAMP) AS seconds_left
+    FROM user_sessions s
+    JOIN users u ON u.user_id = s.user_id
+    WHERE s.session_id = %s
+      AND s.expires_at > CURRENT_TIMESTAMP
+      AND u.status = 'active'
+"""
+
+
+class PrincipalCache:
+    """Thread-safe LRU of session_id -> Principal with per-user invalidation"""
+
+    def __init__(self, max_entries=10000, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # session_id -> (expires_at, principal)
+        self._by_user = {}              # user_id -> {session_id, ...}
+        self._lock = threading.Lock()
+        self.generation = 0             # bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(session_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, session_id, principal, max_age=None, generation=None):
+        """Cache a principal; skipped if an invalidation ran since 'generation' was read"""
+        ttl = self.ttl if max_age is None else min(self.ttl, max_age)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if session_id in self._entries:
+                self._remove(session_id)
+            self._entries[session_id] = (time.monotonic() + ttl, principal)
+            self._by_user.setdefault(principal.user_id, set()).add(session_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, session_id):
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self.generation += 1
+            for session_id in self._by_user.pop(user_id, ()):
+                self._entries.pop(session_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, session_id):
+        _, principal = self._entries.pop(session_id)
+        sessions = self._by_user.get(principal.user_id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._by_user[principal.user_id]
+
+
+principals = PrincipalCache()
+
+
+def _principal_changed(payload):
+    """NOTIFY principal_changed <user_id>; None after a listener reconnect"""
+    if payload is None:
+        principals.clear()
+    else:
+        principals.invalidate_user(int(payload))
+
+
+def create_session(cur, user_id):
+    """Insert a session row for a successful login; returns the new session_id"""
+    session_id = secrets.token_urlsafe(32)
+    lifetime = current_app.permanent_session_lifetime
+    if not isinstance(lifetime, timedelta):
+        lifetime = timedelta(seconds=lifetime)
+    cur.execute("DELETE FROM user_sessions WHERE user_id = %s AND expires_at <= CURRENT_TIMESTAMP",
+                (user_id,))
+    cur.execute("""
+        INSERT INTO user_sessions (session_id, user_id, expires_at)
+        VALUES (%s, %s, CURRENT_TIMESTAMP + %s * interval '1 second')
+    """, (session_id, user_id, lifetime.total_seconds()))
+    return session_id
+
+
+def revoke_session(cur, session_id):
+    """Delete a session row (logout); other processes drop it on commit. The caller commits."""
+    cur.execute("""
+        WITH revoked AS (
+            DELETE FROM user_sessions WHERE session_id = %s RETURNING user_id
+        )
+        SELECT pg_notify(%s, user_id::text) FROM revoked
+    """, (session_id, NOTIFY_CHANNEL))
+    principals.discard(session_id)
+
+
+def load_principal(session_id):
+    """Principal for a session_id: from the cache, else one indexed query"""
+    principal = principals.get(session_id)
+    if principal is not None:
+        return principal
+
+    generation = principals.generation
+    with db.get_db().cursor() as cur:
+        cur.execute(PRINCIPAL_QUERY, (session_id,))
+        row = cur.fetchone()
+    if row is None:
+        return None
+
+    principal = Principal(*row[:4])
+    principals.set(session_id, principal, max_age=float(row[4]), generation=generation)
+    return principal
+
+
+def _load_request_principal():
+    g.principal = None
+    if 'user_id' not in session:
+        return
+
+    session_id = session.get('sid')
+    principal = load_principal(session_id) if session_id else None
+    if principal is None:
+        # Logged out elsewhere, expired, deactivated or a pre-session cookie
+        session.clear()
+        return
+
+    g.principal = principal
+    # Templates and routes read these; keep them in step with the database
+    if session.get('role') != principal.role:
+        session['role'] = principal.role
+    if session.get('user_id') != principal.user_id:
+        session['user_id'] = principal.user_id
+
+
+def init_sessions(app):
+    """Resolve the logged-in user before every request"""
+    db.listen(NOTIFY_CHANNEL, _principal_changed)
+    app.before_request(_load_request_principal)
@@ -0,0 +1,130 @@
+"""
+loginapp/statements.py - Named server-side prepared statements
+
+This module provides:
+- Statement: a named query that is PREPAREd once per pooled connection
+- statement(name, sql): register a Statement (the registry is STATEMENTS)
+- init_statements(app): read PREPARED_STATEMENTS and listen for schema changes
+
+The hot queries (login lookup, registration conflict check, home reminders,
+/events list) are parsed and planned by PostgreSQL on every plain execute().
+A registered statement is written with the usual %s placeholders; the first
+time a connection runs it, it is sent as PREPARE name AS ... ($1, $2, ...)
+and from then on only EXECUTE name(...) goes over the wire, so the server
+reuses the parsed query and, after a few executions, a cached plan.
+
+Schema changes: migrate.py sends NOTIFY schema_changed after applying
+migrations. That bumps 'generation', and every connection runs DEALLOCATE ALL
+before its next registered statement, so no plan outlives the schema it was
+built for. A statement that is missing on the server anyway (DEALLOCATE or
+DISCARD run by someone else) is re-prepared and, if it was the first
+statement of its transaction, retried.
+
+Set PREPARED_STATEMENTS = False (e.g. behind a transaction-pooling
+pgbouncer, where session state is not kept) to run the same SQL unprepared.
+"""
+
+import re
+import threading
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+from . import db
+
+NOTIFY_CHANNEL = 'schema_changed'
+
+# name -> Statement
+STATEMENTS = {}
+
+# Run registered statements unprepared when False (set from app config)
+enabled = True
+
+# Bumped on schema change; connections prepared under an older one start over
+generation = 0
+_generation_lock = threading.Lock()
+
+_PLACEHOLDER = re.compile(r'%(s|%)')
+
+
+class Statement:
+    """A query executed by name on connections that have prepared it"""
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.nparams = 0
+
+        def number(match):
+            if match.group(1) == '%':
+                return '%'
+            self.nparams += 1
+            return f'${self.nparams}'
+
+        self.prepare_sql = f"PREPARE {name} AS {_PLACEHOLDER.sub(number, sql)}"
+        args = ', '.join(['%s'] * self.nparams)
+        self.execute_sql = f"EXECUTE {name} ({args})" if args else f"EXECUTE {name}"
+
+    def execute(self, cur, params=()):
+        """Run the statement on cur; fetch the rows from cur as usual"""
+        conn = cur.connection
+        if not enabled or not isinstance(conn, db.AppConnection):
+            cur.execute(self.sql, params)
+            return
+
+        first_in_transaction = (conn.info.transaction_status
+                                == psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+        try:
+            self._execute(cur, params)
+        except (psycopg2.errors.InvalidSqlStatementName,
+                psycopg2.errors.FeatureNotSupported) as e:
+            # Deallocated behind our back, or the plan's result type changed
+            # before the schema_changed notification arrived
+            if (isinstance(e, psycopg2.errors.FeatureNotSupported)
+                    and 'cached plan' not in str(e)):
+                raise
+            conn.prepared.clear()
+            conn.prepared_generation = -1
+            if not first_in_transaction:
+                raise
+            conn.rollback()
+            self._execute(cur, params)
+
+    def _execute(self, cur, params):
+        conn = cur.connection
+        if conn.prepared_generation != generation:
+            if conn.prepared or conn.prepared_generation == -1:
+                cur.execute("DEALLOCATE ALL")
+            conn.prepared.clear()
+            conn.prepared_generation = generation
+        if self.name not in conn.prepared:
+            cur.execute(self.prepare_sql)
+            conn.prepared.add(self.name)
+        cur.execute(self.execute_sql, params)
+
+
+def statement(name, sql):
+    """Register (or look up) the statement called name"""
+    existing = STATEMENTS.get(name)
+    if existing is not None:
+        if existing.sql != sql:
+            raise ValueError(f"Statement {name!r} is already registered with different SQL")
+        return existing
+    STATEMENTS[name] = Statement(name, sql)
+    return STATEMENTS[name]
+
+
+def _schema_changed(payload):
+    """NOTIFY schema_changed, or None after a listener reconnect"""
+    global generation
+    with _generation_lock:
+        generation += 1
+
+
+def init_statements(app):
+    """Enable prepared statements per app config and follow schema changes"""
+    global enabled
+    app.config.setdefault('PREPARED_STATEMENTS', True)
+    enabled = app.config['PREPARED_STATEMENTS']
+    db.listen(NOTIFY_CHANNEL, _schema_changed)
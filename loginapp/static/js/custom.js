@@ -41,4 +41,13 @@ document.addEventListener('DOMContentLoaded', function () {
             }
         });
     });
+
+    // 5. "Select all" checkbox for bulk-action tables
+    document.querySelectorAll('[data-select-all]').forEach(master => {
+        master.addEventListener('change', function () {
+            document.querySelectorAll(`input[name="${this.dataset.selectAll}"]`).forEach(box => {
+                box.checked = master.checked;
+            });
+        });
+    });
 });
\ No newline at end of file
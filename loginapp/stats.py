@@ -0,0 +1,180 @@
+"""
+loginapp/stats.py - Incrementally maintained feedback and impact aggregates
+
+This module provides:
+- feedback_added(cur, event_id, rating): per-event rating count / sum
+- attendance_changed(cur, event_id, changes): per-volunteer attended
+  events, minutes and bags after attendance is marked
+- durations_changed(cur, deltas): minutes after an event's duration is edited
+- outcome_changed(cur, event_id, bags_delta): bags for everyone who attended
+- leaderboard_changed(cur, rows): bags / recyclables per location, leader
+  and month, in one batched upsert
+- rebuild_stats(conn): recompute all three tables from the *_history views
+
+The update functions use the caller's cursor and never commit, so the
+aggregates change in the same transaction as the row they summarise.
+Pages then read one row by primary key instead of scanning feedback or
+registrations.
+"""
+
+
+def feedback_added(cur, event_id, rating):
+    cur.execute("""
+        INSERT INTO event_feedback_stats (event_id, rating_count, rating_sum)
+        VALUES (%s, 1, %s)
+        ON CONFLICT (event_id) DO UPDATE
+        SET rating_count = event_feedback_stats.rating_count + 1,
+            rating_sum = event_feedback_stats.rating_sum + EXCLUDED.rating_sum,
+            updated_at = CURRENT_TIMESTAMP
+    """, (event_id, rating))
+
+
+def attendance_changed(cur, event_id, changes):
+    """
+    Args:
+        changes: iterable of (volunteer_id, old_attendance, new_attendance)
+    """
+    deltas = {}
+    for volunteer_id, old, new in changes:
+        delta = (new == 'attended') - (old == 'attended')
+        if delta:
+            deltas[volunteer_id] = deltas.get(volunteer_id, 0) + delta
+    if not deltas:
+        return
+
+    cur.execute("""
+        INSERT INTO volunteer_stats AS vs
+            (volunteer_id, events_attended, minutes_volunteered, bags_collected)
+        SELECT d.volunteer_id, d.delta, d.delta * e.duration,
+               d.delta * COALESCE((SELECT o.bags_collected FROM eventoutcomes o
+                                   WHERE o.event_id = e.event_id), 0)
+        FROM unnest(%s::int[], %s::int[]) AS d(volunteer_id, delta)
+        JOIN events e ON e.event_id = %s
+        ON CONFLICT (volunteer_id) DO UPDATE
+        SET events_attended = vs.events_attended + EXCLUDED.events_attended,
+            minutes_volunteered = vs.minutes_volunteered + EXCLUDED.minutes_volunteered,
+            bags_collected = vs.bags_collected + EXCLUDED.bags_collected,
+            updated_at = CURRENT_TIMESTAMP
+    """, (list(deltas), list(deltas.values()), event_id))
+
+
+def durations_changed(cur, deltas):
+    """
+    Args:
+        deltas: {event_id: new_duration - old_duration}
+    """
+    deltas = {event_id: d for event_id, d in deltas.items() if d}
+    if not deltas:
+        return
+
+    cur.execute("""
+        UPDATE volunteer_stats vs
+        SET minutes_volunteered = vs.minutes_volunteered + t.minutes,
+            updated_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT er.volunteer_id, SUM(d.delta) AS minutes
+            FROM unnest(%s::int[], %s::int[]) AS d(event_id, delta)
+            JOIN eventregistrations er
+              ON er.event_id = d.event_id AND er.attendance = 'attended'
+            GROUP BY er.volunteer_id
+        ) t
+        WHERE vs.volunteer_id = t.volunteer_id
+    """, (list(deltas), list(deltas.values())))
+
+
+def outcome_changed(cur, event_id, bags_delta):
+    """Credit a change in an event's bags_collected to everyone who attended it"""
+    if not bags_delta:
+        return
+
+    cur.execute("""
+        UPDATE volunteer_stats vs
+        SET bags_collected = vs.bags_collected + %s,
+            updated_at = CURRENT_TIMESTAMP
+        FROM eventregistrations er
+        WHERE er.event_id = %s
+          AND er.attendance = 'attended'
+          AND vs.volunteer_id = er.volunteer_id
+    """, (bags_delta, event_id))
+
+
+def leaderboard_changed(cur, rows):
+    """
+    Args:
+        rows: iterable of (location, event_leader_id, event_date,
+              events_delta, bags_delta, recyclables_delta); rows for the
+              same location / leader / month are summed before the upsert
+    """
+    totals = {}
+    for location, leader_id, event_date, events, bags, recyclables in rows:
+        key = (location, leader_id, event_date.replace(day=1))
+        old = totals.get(key, (0, 0, 0))
+        totals[key] = (old[0] + events, old[1] + bags, old[2] + recyclables)
+    totals = {key: t for key, t in totals.items() if any(t)}
+    if not totals:
+        return
+
+    keys, values = list(totals), list(totals.values())
+    cur.execute("""
+        INSERT INTO outcome_leaderboard AS lb
+            (location, event_leader_id, month, events_recorded, bags_collected, recyclables_sorted)
+        SELECT * FROM unnest(%s::varchar[], %s::int[], %s::date[], %s::int[], %s::int[], %s::int[])
+        ON CONFLICT (month, location, event_leader_id) DO UPDATE
+        SET events_recorded = lb.events_recorded + EXCLUDED.events_recorded,
+            bags_collected = lb.bags_collected + EXCLUDED.bags_collected,
+            recyclables_sorted = lb.recyclables_sorted + EXCLUDED.recyclables_sorted,
+            updated_at = CURRENT_TIMESTAMP
+    """, ([k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys],
+          [v[0] for v in values], [v[1] for v in values], [v[2] for v in values]))
+
+
+def rebuild_stats(conn):
+    """Recompute the aggregate tables from scratch in one transaction"""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM event_feedback_stats")
+        cur.execute("""
+            INSERT INTO event_feedback_stats (event_id, rating_count, rating_sum)
+            SELECT event_id, COUNT(*), SUM(rating)
+            FROM feedback_history
+            GROUP BY event_id
+        """)
+        events = cur.rowcount
+
+        cur.execute("DELETE FROM volunteer_stats")
+        cur.execute("""
+            INSERT INTO volunteer_stats (volunteer_id, events_attended, minutes_volunteered, bags_collected)
+            SELECT er.volunteer_id, COUNT(*), SUM(e.duration), SUM(COALESCE(o.bags_collected, 0))
+            FROM eventregistrations_history er
+            JOIN users u ON u.user_id = er.volunteer_id
+            JOIN events_history e ON e.event_id = er.event_id
+            LEFT JOIN (
+                SELECT DISTINCT ON (event_id) event_id, bags_collected
+                FROM eventoutcomes_history
+                ORDER BY event_id, recorded_at DESC
+            ) o ON o.event_id = er.event_id
+            WHERE er.attendance = 'attended'
+            GROUP BY er.volunteer_id
+        """)
+        volunteers = cur.rowcount
+
+        cur.execute("DELETE FROM outcome_leaderboard")
+        cur.execute("""
+            INSERT INTO outcome_leaderboard
+                (location, event_leader_id, month, events_recorded, bags_collected, recyclables_sorted)
+            SELECT e.location, e.event_leader_id, date_trunc('month', e.event_date)::date,
+                   COUNT(*), SUM(COALESCE(o.bags_collected, 0)), SUM(COALESCE(o.recyclables_sorted, 0))
+            FROM eventoutcomes_history o
+            JOIN events_history e ON e.event_id = o.event_id
+            JOIN users u ON u.user_id = e.event_leader_id
+            GROUP BY 1, 2, 3
+        """)
+        leaderboard = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return events, volunteers, leaderboard
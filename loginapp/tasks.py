@@ -0,0 +1,79 @@
+"""
+loginapp/tasks.py - Job handlers for the background worker
+
+Each handler takes (conn, payload) and runs inside an app context; the
+worker commits after a handler returns (see loginapp/jobs.py).
+
+Contains:
+- purge_cancelled_events: archive cancelled events and their dependents
+- archive_events: move completed events into cold storage
+- refresh_reports: recompute the admin reports snapshot
+- delete_upload: remove a replaced profile image from disk
+- gc_uploads: remove profile images no user refers to any more
+- send_reminders: day-before reminders for registered volunteers
+- purge_expired_sessions: delete login sessions past their expiry
+- score_events: score new or edited events against every volunteer's interests
+- rebuild_recommendations: rebuild the interest tag index (drops past events)
+"""
+
+from datetime import date
+
+from flask import current_app
+from psycopg2.extras import RealDictCursor
+
+from .archive import archive_past_events, purge_cancelled_events
+from .jobs import task
+from .recommendations import rebuild_recommendations, score_events
+from .reminders import dispatch_reminders
+from .routes.admin import compute_reports, save_report_snapshot
+from .uploads import collect_garbage, delete_if_unreferenced
+
+
+@task('purge_cancelled_events')
+def purge_cancelled_events_task(conn, payload):
+    purge_cancelled_events(conn, payload.get('batch_size', 500), payload.get('pause', 0.0))
+
+
+@task('archive_events')
+def archive_events_task(conn, payload):
+    older_than_days = payload.get('older_than_days', current_app.config['ARCHIVE_AFTER_DAYS'])
+    archive_past_events(conn, older_than_days, payload.get('batch_size', 100), payload.get('pause', 0.0))
+
+
+@task('refresh_reports')
+def refresh_reports_task(conn, payload):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        save_report_snapshot(cur, 'admin_reports', compute_reports(cur))
+
+
+@task('delete_upload')
+def delete_upload_task(conn, payload):
+    delete_if_unreferenced(conn, payload['filename'])
+
+
+@task('gc_uploads')
+def gc_uploads_task(conn, payload):
+    collect_garbage(conn, payload.get('grace_hours', 24) * 3600)
+
+
+@task('send_reminders')
+def send_reminders_task(conn, payload):
+    target_date = date.fromisoformat(payload['date']) if payload.get('date') else None
+    dispatch_reminders(current_app._get_current_object(), target_date=target_date,
+                       workers=payload.get('workers', 4), rate=payload.get('rate', 50))
+
+
+@task('purge_expired_sessions')
+def purge_expired_sessions_task(conn, payload):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM user_sessions WHERE expires_at <= CURRENT_TIMESTAMP")
+
+
+@task('score_events')
+def score_events_task(conn, payload):
+    score_events(conn, payload['event_ids'])
+
+
+@task('rebuild_recommendations')
+def rebuild_recommendations_task(conn, payload):
+    rebuild_recommendations(conn)
@@ -0,0 +1,115 @@
+"""
+loginapp/uploads.py - Profile image files on disk
+
+This module provides:
+- save_profile_image(file): store an uploaded image under a fresh UUID name
+- discard_upload(filename): remove a file saved by a request that then failed
+- delete_if_unreferenced(conn, filename): remove a replaced image (delete_upload job)
+- collect_garbage(conn, ...): sweep UPLOAD_FOLDER for images no user refers to
+
+Every upload gets a new name, so files are never overwritten; the old one is
+removed by the delete_upload job once the profile change has committed. Files
+left behind anyway (a failed insert before inline cleanup existed, a worker
+that never ran the job, a crash between save and commit) are found by
+collect_garbage(). It streams users.profile_image once with a server-side
+cursor, then walks the folder with os.scandir(). Only names this module
+generates are candidates, and only once they are older than the grace period,
+so an image saved by a request that has not committed yet is never taken.
+
+Run it from cron via the Flask CLI:
+    flask --app run gc-uploads --grace-hours 24
+"""
+
+import os
+import re
+import time
+import uuid
+
+from flask import current_app
+
+from .utils.helpers import allowed_file
+
+DEFAULT_IMAGE = 'default_profile.jpg'
+
+# Names produced by save_profile_image(); anything else in the folder is left alone
+UPLOAD_NAME = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[a-z]+$')
+
+
+def save_profile_image(file):
+    """Save an uploaded image; returns its new filename, or None if there is no usable file"""
+    if not file or not allowed_file(file.filename):
+        return None
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    filename = f"{uuid.uuid4()}.{ext}"
+    file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+    return filename
+
+
+def _remove(path):
+    """Delete a file; returns the bytes freed (0 if it was already gone)"""
+    try:
+        size = os.stat(path).st_size
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+def discard_upload(filename):
+    """Remove an image saved earlier in a request whose database change was rolled back"""
+    if filename and UPLOAD_NAME.match(filename):
+        _remove(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+
+
+def delete_if_unreferenced(conn, filename):
+    """Remove a replaced image unless a user still refers to it; returns bytes freed"""
+    # basename() keeps the job from reaching outside the upload folder
+    filename = os.path.basename(filename or '')
+    if not filename or filename == DEFAULT_IMAGE:
+        return 0
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM users WHERE profile_image = %s LIMIT 1", (filename,))
+        if cur.fetchone():
+            return 0
+
+    return _remove(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+
+
+def _referenced_images(conn, batch_size):
+    """Every filename in users.profile_image, fetched batch_size rows at a time"""
+    referenced = set()
+    with conn.cursor(name='gc_uploads_referenced') as cur:
+        cur.itersize = batch_size
+        cur.execute("SELECT DISTINCT profile_image FROM users WHERE profile_image IS NOT NULL")
+        for (filename,) in cur:
+            referenced.add(filename)
+    conn.commit()
+    return referenced
+
+
+def collect_garbage(conn, grace_seconds=24 * 3600, batch_size=5000, dry_run=False):
+    """
+    Delete upload files that no user refers to and that are older than grace_seconds.
+
+    Returns:
+        dict: scanned / removed / kept file counts and reclaimed_bytes
+              (what would be removed when dry_run is True)
+    """
+    referenced = _referenced_images(conn, batch_size)
+    cutoff = time.time() - grace_seconds
+    counts = {'scanned': 0, 'removed': 0, 'kept': 0, 'reclaimed_bytes': 0}
+
+    with os.scandir(current_app.config['UPLOAD_FOLDER']) as entries:
+        for entry in entries:
+            if not UPLOAD_NAME.match(entry.name) or not entry.is_file(follow_symlinks=False):
+                continue
+            counts['scanned'] += 1
+            stat = entry.stat(follow_symlinks=False)
+            if entry.name in referenced or stat.st_mtime > cutoff:
+                counts['kept'] += 1
+                continue
+            freed = stat.st_size if dry_run else _remove(entry.path)
+            counts['removed'] += 1
+            counts['reclaimed_bytes'] += freed
+    return counts
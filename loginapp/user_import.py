@@ -0,0 +1,227 @@
+"""
+loginapp/user_import.py - Bulk user import from CSV (admin onboarding)
+
+This module provides:
+- import_users_csv(conn, stream, ...): validate, hash and insert users in bulk
+
+Pipeline:
+1. Stream the CSV once, validating each row (required fields, password
+   policy, role, duplicates inside the file)
+2. Find username/email collisions with existing users in ONE query, then
+   end that transaction
+3. Hash the remaining passwords across a process pool (bcrypt is CPU-bound;
+   minutes for a large file) with no transaction open
+4. In a new transaction, COPY the rows into a temporary staging table and
+   merge them into users with a single INSERT ... SELECT ... ON CONFLICT DO
+   NOTHING, which also catches users created while the passwords were hashed
+
+Every input row ends up in the report with status 'created' or 'error'.
+"""
+
+import csv
+import io
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from .utils.helpers import is_strong_password
+
+REQUIRED_COLUMNS = ('username', 'password', 'full_name', 'email')
+OPTIONAL_COLUMNS = ('home_address', 'contact_number', 'environmental_interests', 'role')
+IMPORTABLE_ROLES = ('volunteer', 'event_leader')
+MAX_ROWS = 5000
+
+# Same limits as the users table
+FIELD_LIMITS = {'username': 50, 'full_name': 100, 'email': 255,
+                'home_address': 255, 'contact_number': 20}
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+STAGING_COLUMNS = ('line_no', 'username', 'password_hash', 'full_name', 'email',
+                   'home_address', 'contact_number', 'environmental_interests', 'role')
+
+
+def _hash_password(args):
+    """Runs in a worker process (must be a top-level function)"""
+    password, rounds = args
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _validate_row(row):
+    """Return an error message for a CSV row, or None if it is valid"""
+    missing = [c for c in REQUIRED_COLUMNS if not row.get(c)]
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    for column, limit in FIELD_LIMITS.items():
+        if row.get(column) and len(row[column]) > limit:
+            return f"{column} is longer than {limit} characters"
+    if not EMAIL_PATTERN.match(row['email']):
+        return 'Invalid email address'
+    if not is_strong_password(row['password']):
+        return 'Password must be at least 8 characters with upper, lower, digit and special character'
+    if row['role'] not in IMPORTABLE_ROLES:
+        return f"Role must be one of: {', '.join(IMPORTABLE_ROLES)}"
+    return None
+
+
+def parse_rows(stream):
+    """
+    Stream the uploaded CSV and validate row by row.
+
+    Returns:
+        tuple: (valid_rows, report) - report holds the rejected rows
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+
+    header = [h.strip() for h in (reader.fieldnames or [])]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+    reader.fieldnames = header
+
+    valid, report = [], []
+    seen_usernames, seen_emails = set(), set()
+
+    for row in reader:
+        line_no = reader.line_num
+        if len(valid) + len(report) >= MAX_ROWS:
+            raise ValueError(f"CSV has more than {MAX_ROWS} rows - split it into smaller files")
+
+        row = {c: (row.get(c) or '').strip() for c in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+        row['role'] = row['role'] or 'volunteer'
+        row['line_no'] = line_no
+
+        error = _validate_row(row)
+        if not error and row['username'] in seen_usernames:
+            error = 'Username appears more than once in the file'
+        if not error and row['email'] in seen_emails:
+            error = 'Email appears more than once in the file'
+
+        if error:
+            report.append({'line_no': line_no, 'username': row['username'],
+                           'status': 'error', 'message': error})
+            continue
+
+        seen_usernames.add(row['username'])
+        seen_emails.add(row['email'])
+        valid.append(row)
+
+    return valid, report
+
+
+def find_collisions(cur, rows):
+    """Usernames and emails that already exist - one set-based query"""
+    cur.execute("""
+        SELECT username, email
+        FROM users
+        WHERE username = ANY(%s) OR email = ANY(%s)
+    """, ([r['username'] for r in rows], [r['email'] for r in rows]))
+    taken = cur.fetchall()
+    return {u for u, _ in taken}, {e for _, e in taken}
+
+
+def hash_passwords(rows, rounds, workers=None):
+    """Hash every row's password in parallel; returns hashes in row order"""
+    jobs = [(r['password'], rounds) for r in rows]
+    if len(jobs) <= 1:
+        return [_hash_password(job) for job in jobs]
+
+    workers = workers or min(os.cpu_count() or 1, len(jobs))
+    # 'spawn': forking a threaded web worker can copy locks held by other threads
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        return list(executor.map(_hash_password, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def import_users_csv(conn, stream, rounds=12, workers=None):
+    """
+    Import users from a CSV file stream.
+
+    Args:
+        conn: psycopg2 connection (committed on success, rolled back on error)
+        stream: binary file-like object with the CSV
+        rounds (int): bcrypt cost factor (same as Flask-Bcrypt's BCRYPT_LOG_ROUNDS)
+        workers (int): hashing processes (default: CPU count)
+
+    Returns:
+        list[dict]: one entry per CSV row - line_no, username, status, message
+    """
+    rows, report = parse_rows(stream)
+    if not rows:
+        return report
+
+    cur = conn.cursor()
+    try:
+        taken_usernames, taken_emails = find_collisions(cur, rows)
+        fresh = []
+        for row in rows:
+            if row['username'] in taken_usernames:
+                message = 'Username already taken'
+            elif row['email'] in taken_emails:
+                message = 'Email already registered'
+            else:
+                fresh.append(row)
+                continue
+            report.append({'line_no': row['line_no'], 'username': row['username'],
+                           'status': 'error', 'message': message})
+        # Not idle in transaction while bcrypt runs
+        conn.rollback()
+
+        if fresh:
+            for row, password_hash in zip(fresh, hash_passwords(fresh, rounds, workers)):
+                row['password_hash'] = password_hash
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in fresh:
+                writer.writerow([row[c] if row[c] != '' else None for c in STAGING_COLUMNS])
+            buffer.seek(0)
+
+            cur.execute("""
+                CREATE TEMP TABLE import_users_staging (
+                    line_no INTEGER,
+                    username VARCHAR(50),
+                    password_hash TEXT,
+                    full_name VARCHAR(100),
+                    email VARCHAR(255),
+                    home_address VARCHAR(255),
+                    contact_number VARCHAR(20),
+                    environmental_interests TEXT,
+                    role user_role
+                ) ON COMMIT DROP
+            """)
+            cur.copy_expert(f"COPY import_users_staging ({', '.join(STAGING_COLUMNS)}) "
+                            f"FROM STDIN WITH (FORMAT csv)", buffer)
+
+            # Rows that lost a race with a concurrent signup are skipped here
+            cur.execute("""
+                INSERT INTO users (username, password_hash, full_name, email, home_address,
+                                   contact_number, environmental_interests, role)
+                SELECT username, password_hash, full_name, email, home_address,
+                       contact_number, environmental_interests, role
+                FROM import_users_staging
+                ORDER BY line_no
+                ON CONFLICT DO NOTHING
+                RETURNING username
+            """)
+            created = {r[0] for r in cur.fetchall()}
+
+            for row in fresh:
+                if row['username'] in created:
+                    report.append({'line_no': row['line_no'], 'username': row['username'],
+                                   'status': 'created', 'message': f"Created as {row['role']}"})
+                else:
+                    report.append({'line_no': row['line_no'], 'username': row['username'],
+                                   'status': 'error', 'message': 'Username or email already exists'})
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return sorted(report, key=lambda r: r['line_no'])
@@ -0,0 +1,126 @@
+"""
+loginapp/utils/cache.py - Template fragment caching
+
+Contains:
+- FragmentCache: bounded in-memory LRU for rendered HTML fragments
+- FragmentCacheExtension: Jinja extension adding the {% cache %} tag
+- data_fingerprint: turn query results into a cache key component
+
+Template usage:
+    {% cache 'navbar', session.role %} ... {% endcache %}
+    {% cache 'events-list', session.user_id, events_version %} ... {% endcache %}
+
+Every argument becomes part of the key, so vary on role / user / data version
+by passing them in. Routes compute the data version with data_fingerprint()
+from the rows they already fetched, which keeps all worker processes
+consistent without any cross-process invalidation.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """
+    Thread-safe LRU cache of rendered fragments.
+    Bounded both by entry count and by total characters stored.
+    """
+
+    def __init__(self, max_entries=1024, max_chars=8 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        size = len(value)
+        if size > self.max_chars:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._chars += size
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._chars -= len(value)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds {% cache key, ... %} ... {% endcache %} to the Jinja environment"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(
+            fragment_cache=FragmentCache(),
+            fragment_cache_enabled=True,
+        )
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render_cached', [nodes.List(key_parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        if not self.environment.fragment_cache_enabled:
+            return caller()
+
+        key = tuple(key_parts)
+        cache = self.environment.fragment_cache
+        rv = cache.get(key)
+        if rv is None:
+            rv = caller()
+            cache.set(key, rv)
+        return rv
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def data_fingerprint(*values):
+    """
+    Cheap version number for query results (lists of dict rows, dicts, scalars).
+    Changes whenever any value in the data changes.
+    """
+    return hash(_freeze(values))
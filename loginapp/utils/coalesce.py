@@ -0,0 +1,144 @@
+"""
+loginapp/utils/coalesce.py - Request coalescing for expensive shared results
+
+Contains:
+- SingleFlight: concurrent calls with the same key share one computation
+- StaleWhileRevalidate: keeps the last result; while it is stale one caller
+  refreshes it and everyone else is answered with the previous value
+- flights: the process-wide SingleFlight used by the routes
+
+Usage:
+    rows = flights.do(('home-upcoming', user_id), load_rows)
+
+    EVENTS = StaleWhileRevalidate(max_age=5, stale_for=60)
+    rows = EVENTS.get('upcoming', load_rows)
+
+When a cold page (after a deploy, or once its cache or snapshot expires) is
+hit by many requests at once, each one would otherwise run the same queries.
+With SingleFlight the first caller runs them and the others block until its
+result (or exception) is ready. Results are shared between threads, so
+callers must treat them as read-only.
+
+Coalescing is per process: with several workers each one computes at most
+once at a time.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Run every computation directly when False (for benchmarks)
+enabled = True
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key"""
+
+    def __init__(self):
+        self._calls = {}    # key -> Future of the call in flight
+        self._lock = threading.Lock()
+        self.calls = 0      # computations run
+        self.shared = 0     # callers answered by another caller's computation
+
+    def _join(self, key):
+        """(future, leader): leader is True if the caller must run the computation"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.calls += 1
+            return future, True
+
+    def _run(self, key, future, fn):
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def do(self, key, fn):
+        """fn(), or the result of the identical call already running"""
+        if not enabled:
+            return fn()
+        future, leader = self._join(key)
+        if leader:
+            return self._run(key, future, fn)
+        return future.result()
+
+
+class StaleWhileRevalidate:
+    """
+    Bounded in-memory cache of computed values.
+    Fresh for max_age seconds; for stale_for seconds after that the old value
+    is served while a single caller recomputes it. Older entries (and cold
+    keys) are computed through SingleFlight, so concurrent callers wait for one result.
+    """
+
+    def __init__(self, max_age, stale_for, max_entries=64):
+        self.max_age = max_age
+        self.stale_for = stale_for
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (computed_at, value)
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        if not enabled:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[0] if entry is not None else None
+            if age is not None and age < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if age is not None and age < self.max_age + self.stale_for:
+            future, leader = self._flights._join(key)
+            if not leader:
+                with self._lock:
+                    self.stale_hits += 1
+                return entry[1]
+            try:
+                return self._flights._run(key, future, lambda: self._compute(key, compute))
+            except Exception as e:
+                # Keep serving the old value; the next caller tries again
+                print(f"Refreshing {key!r} failed, serving the stale value: {e}")
+                return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return self._flights.do(key, lambda: self._compute(key, compute))
+
+    def _compute(self, key, compute):
+        value = compute()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key (or everything); the next get() recomputes it"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+flights = SingleFlight()
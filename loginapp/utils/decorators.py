@@ -4,10 +4,18 @@ app/utils/decorators.py - Custom Flask decorators for authentication and authori
 Contains:
 - login_required: Ensure user is logged in
 - role_required: Role-based access control with hierarchy
+- api_role_required: Same checks for JSON endpoints (401/403 instead of redirects)
+
+All three check g.principal, which loginapp/sessions.py loads from the
+server-side session before each request, rather than the role copied
+into the cookie at login.
 """
 
 from functools import wraps
-from flask import flash, redirect, url_for, session
+from flask import flash, redirect, url_for, g, jsonify
+
+# Role levels: volunteer (1) < event_leader (2) < admin (3)
+ROLE_HIERARCHY = {'volunteer': 1, 'event_leader': 2, 'admin': 3}
 
 
 def login_required(f):
@@ -17,7 +25,7 @@ def login_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if g.get('principal') is None:
             flash('Please log in first', 'warning')
             return redirect(url_for('auth.login'))  # 假设登录路由在 auth 蓝图
         return f(*args, **kwargs)
@@ -34,18 +42,13 @@ def role_required(*min_roles):
         @role_required('event_leader')  # leader + admin
         @role_required('admin')         # only admin
     """
-    role_hierarchy = {'volunteer': 1, 'event_leader': 2, 'admin': 3}
+    role_hierarchy = ROLE_HIERARCHY
 
     def decorator(f):
         @wraps(f)
         @login_required
         def decorated_function(*args, **kwargs):
-            user_role = session.get('role')
-            if not user_role:
-                flash('Session expired. Please log in again.', 'danger')
-                return redirect(url_for('auth.login'))
-
-            user_level = role_hierarchy.get(user_role, 0)
+            user_level = role_hierarchy.get(g.principal.role, 0)
             required_level = max(role_hierarchy.get(r, 0) for r in min_roles)
 
             if user_level < required_level:
@@ -54,4 +57,29 @@ def role_required(*min_roles):
 
             return f(*args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def api_role_required(*min_roles):
+    """
+    Decorator: login + role check for JSON API endpoints.
+    Responds with 401 / 403 JSON errors instead of flashing and redirecting.
+
+    Usage:
+        @api_role_required('volunteer')     # any logged-in user
+        @api_role_required('event_leader')  # leader + admin
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            principal = g.get('principal')
+            if principal is None:
+                return jsonify(error='authentication required'), 401
+
+            required_level = max(ROLE_HIERARCHY.get(r, 0) for r in min_roles)
+            if ROLE_HIERARCHY.get(principal.role, 0) < required_level:
+                return jsonify(error='permission denied'), 403
+
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -3,7 +3,7 @@ app/utils/helpers.py - General helper functions for the application
 
 Contains:
 - allowed_file: Validate file extensions for uploads
-- (you can add more helpers here later)
+- is_strong_password: Password policy shared by change_password and bulk import
 """
 
 from flask import current_app
@@ -23,4 +23,26 @@ def allowed_file(filename):
         return False
 
     return '.' in filename and \
-        filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
\ No newline at end of file
+        filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+# Characters accepted as the "special character" in passwords
+PASSWORD_SPECIALS = "!@#$%^&*()_+-=[]{}|;:,.<>/? "
+
+
+def is_strong_password(password):
+    """
+    Check the platform password policy: at least 8 characters with an upper-case
+    letter, a lower-case letter, a digit and a special character.
+
+    Args:
+        password (str): Plain-text password
+
+    Returns:
+        bool: True if the password satisfies the policy
+    """
+    return bool(password) and len(password) >= 8 and \
+        any(c.isupper() for c in password) and \
+        any(c.islower() for c in password) and \
+        any(c.isdigit() for c in password) and \
+        any(c in PASSWORD_SPECIALS for c in password)
@@ -0,0 +1,83 @@
+"""
+app/utils/ical.py - Minimal iCalendar (RFC 5545) writer for event feeds
+
+Contains:
+- calendar_header / calendar_footer: VCALENDAR wrapper lines
+- vevent: one VEVENT for an event row
+
+Every function returns ready-to-send text (CRLF line endings, long lines
+folded), so a feed can be streamed one event at a time.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+PRODID = '-//EcoCleanUp Hub//Event Calendar//EN'
+UID_DOMAIN = 'ecocleanup.example'
+
+
+def escape_text(value):
+    """Escape a TEXT property value"""
+    return (str(value or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Fold a content line at 75 octets, as required by RFC 5545"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Never split a multi-byte UTF-8 character
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start, limit = end, 74  # continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def calendar_header(name):
+    return ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+    ))
+
+
+def calendar_footer():
+    return 'END:VCALENDAR\r\n'
+
+
+def vevent(event, dtstamp=None):
+    """
+    Serialise one event row (event_id, event_name, event_date, start_time,
+    duration, location; optional description, status) as a VEVENT.
+    Times are written as floating local time, like the rest of the site.
+    """
+    start = datetime.combine(event['event_date'], event['start_time'])
+    end = start + timedelta(minutes=event['duration'] or 0)
+    dtstamp = dtstamp or datetime.now(timezone.utc)
+
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:event-{event['event_id']}@{UID_DOMAIN}",
+        f"DTSTAMP:{dtstamp.strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+        f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}",
+        f"SUMMARY:{escape_text(event['event_name'])}",
+        f"LOCATION:{escape_text(event['location'])}",
+    ]
+    if event.get('description'):
+        lines.append(f"DESCRIPTION:{escape_text(event['description'])}")
+    if event.get('status') == 'cancelled':
+        lines.append('STATUS:CANCELLED')
+    else:
+        lines.append('STATUS:CONFIRMED')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
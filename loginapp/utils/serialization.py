@@ -0,0 +1,51 @@
+"""
+app/utils/serialization.py - Compact JSON encoding for API responses
+
+Contains:
+- AppJSONProvider: Flask JSON provider used by jsonify()
+
+Dates, times and datetimes are written as ISO 8601 strings, Decimals
+(e.g. AVG() results) as numbers, and output has no extra whitespace.
+If the optional 'orjson' package is installed it is used for speed;
+otherwise the standard library json module is used.
+"""
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj):
+    """Fallback for types neither encoder handles natively"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class AppJSONProvider(JSONProvider):
+    """Compact, date/time-aware JSON (orjson when available)"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default,
+                                option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('separators', (',', ':'))
+        kwargs.setdefault('ensure_ascii', False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
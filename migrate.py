@@ -0,0 +1,422 @@
+# migrate.py
+"""
+migrate.py - Versioned schema migrations for EcoCleanUp Hub
+
+This file lives in the project ROOT directory (next to run.py).
+create_database.sql builds a fresh database; the files in 'migrations/' bring
+an existing (live) database up to the same schema without taking it offline.
+
+Migration files are named '<version>_<name>.sql' or '<version>_<name>.py'
+and are applied in version order. Each one must be idempotent
+(IF NOT EXISTS / CREATE OR REPLACE) so it is safe on a fresh database too.
+
+SQL migrations run in a single transaction, unless the file contains the line
+    -- migrate: no-transaction
+in which case every statement runs on its own (required for
+CREATE INDEX CONCURRENTLY).
+
+Every applied migration sends NOTIFY schema_changed so running app processes
+re-prepare their named statements against the new schema.
+
+Python migrations define  upgrade(ctx)  and use ctx.execute() / ctx.backfill()
+so large tables are updated in small, throttled batches.
+
+Usage:
+    python migrate.py status
+    python migrate.py up [--target VERSION] [--dry-run]
+                         [--batch-size N] [--pause SECONDS] [--lock-timeout MS]
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+import time
+
+import psycopg2
+import psycopg2.errors
+
+# Ensure the project root is in sys.path so connect.py can be imported
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+import connect
+
+MIGRATIONS_DIR = os.path.join(project_root, 'migrations')
+NO_TRANSACTION_MARKER = re.compile(r'^--\s*migrate:\s*no-transaction\s*$', re.MULTILINE)
+CONCURRENT_INDEX = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)',
+    re.IGNORECASE)
+
+# How many times a statement (or a transactional file) is retried when it cannot get its lock in time
+LOCK_RETRIES = 5
+
+
+class Migration:
+    """One migration file on disk"""
+
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.version, rest = self.filename.split('_', 1)
+        self.name, self.kind = os.path.splitext(rest)
+        with open(path, 'rb') as f:
+            self.checksum = hashlib.sha1(f.read()).hexdigest()
+
+    def __repr__(self):
+        return f"<Migration {self.version} {self.name}>"
+
+
+class MigrationContext:
+    """
+    Handed to Python migrations as  upgrade(ctx).
+    All writes go through here so dry-run and throttling apply everywhere.
+    """
+
+    def __init__(self, conn, dry_run=False, batch_size=1000, pause=0.1):
+        self.conn = conn
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def execute(self, sql, params=None):
+        """Run one statement in its own transaction (lock-timeout aware)"""
+        if self.dry_run:
+            print(f"    [dry-run] {_one_line(sql)}")
+            return None
+        return run_statement(self.conn, sql, params)
+
+    def backfill(self, table, set_clause, where_clause='TRUE', key='id',
+                 batch_size=None, pause=None):
+        """
+        Update 'table' in primary-key order, 'batch_size' rows per transaction,
+        sleeping 'pause' seconds between batches so live traffic keeps its locks.
+
+        Example:
+            ctx.backfill('events', 'reg_count = 0', 'reg_count IS NULL', key='event_id')
+        """
+        batch_size = batch_size or self.batch_size
+        pause = self.pause if pause is None else pause
+
+        sql = f"""
+            UPDATE {table} SET {set_clause}
+            WHERE {key} IN (
+                SELECT {key} FROM {table}
+                WHERE {key} > %s AND ({where_clause})
+                ORDER BY {key}
+                LIMIT %s
+            )
+            RETURNING {key}
+        """
+        if self.dry_run:
+            print(f"    [dry-run] backfill {table}: SET {set_clause} "
+                  f"WHERE {where_clause} (batches of {batch_size})")
+            return 0
+
+        last_key, total = 0, 0
+        while True:
+            with self.conn.cursor() as cur:
+                cur.execute(sql, (last_key, batch_size))
+                keys = [row[0] for row in cur.fetchall()]
+            self.conn.commit()
+            if not keys:
+                break
+            total += len(keys)
+            last_key = max(keys)
+            print(f"    backfill {table}: {total} rows (up to {key}={last_key})")
+            if pause:
+                time.sleep(pause)
+        return total
+
+
+def get_connection(lock_timeout_ms):
+    """Open a dedicated connection for migrations (never from the app pool)"""
+    conn = psycopg2.connect(
+        dbname=connect.dbname,
+        user=connect.dbuser,
+        password=connect.dbpass,
+        host=connect.dbhost,
+        port=connect.dbport
+    )
+    with conn.cursor() as cur:
+        # Fail fast instead of queueing behind long transactions (and blocking
+        # every query that queues behind us); run_transaction() retries.
+        cur.execute("SET lock_timeout = %s", (f"{int(lock_timeout_ms)}ms",))
+        # Index builds and backfills may legitimately run for a long time
+        cur.execute("SET statement_timeout = 0")
+    conn.commit()
+    return conn
+
+
+def ensure_version_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(20) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum VARCHAR(40) NOT NULL,
+                duration_ms INTEGER,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    conn.commit()
+
+
+def load_migrations():
+    """All migration files in version order"""
+    files = sorted(f for f in os.listdir(MIGRATIONS_DIR)
+                   if f[0].isdigit() and f.endswith(('.sql', '.py')))
+    migrations = [Migration(os.path.join(MIGRATIONS_DIR, f)) for f in files]
+
+    versions = [m.version for m in migrations]
+    duplicates = {v for v in versions if versions.count(v) > 1}
+    if duplicates:
+        raise SystemExit(f"Duplicate migration versions: {', '.join(sorted(duplicates))}")
+    return migrations
+
+
+def applied_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations')")
+        if cur.fetchone()[0] is None:    # dry run against a never-migrated database
+            versions = {}
+        else:
+            cur.execute("SELECT version, checksum FROM schema_migrations")
+            versions = dict(cur.fetchall())
+    conn.commit()    # do not leave a transaction open across migrations
+    return versions
+
+
+def split_statements(sql):
+    """
+    Split a SQL script on top-level semicolons.
+    Quotes, dollar-quoted bodies ($$ ... $$) and comments are respected.
+    """
+    statements, buf = [], []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = n if end == -1 else end
+            buf.append(sql[i:end])
+            i = end
+            continue
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            buf.append(sql[i:end])
+            i = end
+            continue
+        if ch in ("'", '"'):
+            end = i + 1
+            while end < n:
+                if sql[end] == ch:
+                    if end + 1 < n and sql[end + 1] == ch:   # escaped '' or ""
+                        end += 2
+                        continue
+                    break
+                end += 1
+            buf.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        if ch == '$':
+            tag = re.match(r'\$[A-Za-z_]*\$', sql[i:])
+            if tag:
+                end = sql.find(tag.group(0), i + len(tag.group(0)))
+                end = n if end == -1 else end + len(tag.group(0))
+                buf.append(sql[i:end])
+                i = end
+                continue
+        if ch == ';':
+            statements.append(''.join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    statements.append(''.join(buf))
+
+    # Drop chunks that are empty or only contain comments
+    result = []
+    for stmt in statements:
+        code = re.sub(r'--[^\n]*', '', stmt).strip()
+        if code:
+            result.append(stmt.strip())
+    return result
+
+
+def run_statement(conn, sql, params=None):
+    """
+    Execute one statement in its own transaction.
+    Retries with backoff when lock_timeout fires, so an ALTER TABLE never sits
+    in the lock queue in front of normal traffic for long.
+    """
+    return run_transaction(conn, [(sql, params)])
+
+
+def run_transaction(conn, statements):
+    """
+    Execute (sql, params) pairs in one transaction; returns the last rowcount.
+    When lock_timeout fires the whole transaction is rolled back and, after
+    a backoff, re-run from its first statement.
+    """
+    for attempt in range(1, LOCK_RETRIES + 1):
+        try:
+            with conn.cursor() as cur:
+                for sql, params in statements:
+                    cur.execute(sql, params)
+                rowcount = cur.rowcount
+            conn.commit()
+            return rowcount
+        except psycopg2.errors.LockNotAvailable:
+            conn.rollback()
+            if attempt == LOCK_RETRIES:
+                raise
+            wait = 2 ** attempt
+            print(f"    lock timeout, retrying in {wait}s ({attempt}/{LOCK_RETRIES})")
+            time.sleep(wait)
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def drop_invalid_index(conn, sql):
+    """
+    A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    IF NOT EXISTS would then silently accept. Drop it so the build is retried.
+    """
+    match = CONCURRENT_INDEX.search(sql)
+    if not match:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND NOT i.indisvalid
+        """, (match.group(1),))
+        invalid = cur.fetchone()
+    conn.commit()
+    if invalid:
+        print(f"    dropping invalid index {match.group(1)} left by an earlier build")
+        run_statement(conn, f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+
+def apply_sql(conn, migration, dry_run):
+    with open(migration.path, encoding='utf-8') as f:
+        sql = f.read()
+    statements = split_statements(sql)
+    transactional = not NO_TRANSACTION_MARKER.search(sql)
+
+    if dry_run:
+        mode = 'single transaction' if transactional else 'one statement at a time'
+        print(f"    [dry-run] {len(statements)} statement(s), {mode}")
+        for stmt in statements:
+            print(f"    [dry-run] {_one_line(stmt)}")
+        return
+
+    if transactional:
+        run_transaction(conn, [(stmt, None) for stmt in statements])
+    else:
+        conn.autocommit = True
+        try:
+            for stmt in statements:
+                print(f"    {_one_line(stmt)}")
+                drop_invalid_index(conn, stmt)
+                run_statement(conn, stmt)
+        finally:
+            conn.autocommit = False
+
+
+def apply_python(conn, migration, ctx):
+    spec = importlib.util.spec_from_file_location(f"migration_{migration.version}", migration.path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(ctx)
+
+
+def record(conn, migration, duration_ms):
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO schema_migrations (version, name, checksum, duration_ms)
+            VALUES (%s, %s, %s, %s)
+        """, (migration.version, migration.name, migration.checksum, duration_ms))
+        # Running app processes drop their prepared statements (loginapp/statements.py)
+        cur.execute("SELECT pg_notify('schema_changed', %s)", (migration.version,))
+    conn.commit()
+
+
+def cmd_status(conn, args):
+    applied = applied_versions(conn)
+    for m in load_migrations():
+        if m.version not in applied:
+            state = 'pending'
+        elif applied[m.version] != m.checksum:
+            state = 'applied (file changed since!)'
+        else:
+            state = 'applied'
+        print(f"  {m.version}  {m.name:<40} {state}")
+
+
+def cmd_up(conn, args):
+    applied = applied_versions(conn)
+    pending = [m for m in load_migrations()
+               if m.version not in applied
+               and (args.target is None or m.version <= args.target)]
+
+    if not pending:
+        print("Database is up to date.")
+        return
+
+    ctx = MigrationContext(conn, dry_run=args.dry_run,
+                           batch_size=args.batch_size, pause=args.pause)
+    for m in pending:
+        print(f"Applying {m.version} {m.name}{' (dry run)' if args.dry_run else ''}...")
+        started = time.monotonic()
+        if m.kind == '.sql':
+            apply_sql(conn, m, args.dry_run)
+        else:
+            apply_python(conn, m, ctx)
+        duration_ms = int((time.monotonic() - started) * 1000)
+
+        if not args.dry_run:
+            record(conn, m, duration_ms)
+            print(f"  done in {duration_ms} ms")
+
+
+def _one_line(sql):
+    text = ' '.join(re.sub(r'--[^\n]*', '', sql).split())
+    return text if len(text) <= 120 else text[:117] + '...'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='EcoCleanUp Hub schema migrations')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('status', help='List migrations and whether they are applied')
+
+    up = sub.add_parser('up', help='Apply pending migrations')
+    up.add_argument('--target', help='Stop after this version')
+    up.add_argument('--dry-run', action='store_true', help='Print what would run, change nothing')
+    up.add_argument('--batch-size', type=int, default=1000, help='Rows per backfill batch')
+    up.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between backfill batches')
+    up.add_argument('--lock-timeout', type=int, default=5000, help='lock_timeout in ms for DDL')
+
+    args = parser.parse_args(argv)
+
+    conn = get_connection(getattr(args, 'lock_timeout', 5000))
+    try:
+        if not getattr(args, 'dry_run', False):
+            ensure_version_table(conn)
+        if args.command == 'status':
+            cmd_status(conn, args)
+        else:
+            cmd_up(conn, args)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+-- 0001: route-driven indexes (same set as create_database.sql)
+-- Built CONCURRENTLY so reads and writes continue during the build.
+-- migrate: no-transaction
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_date_time
+  ON events(event_date, start_time);
+
+-- Superseded by idx_events_date_time
+DROP INDEX CONCURRENTLY IF EXISTS idx_events_date;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_leader_date
+  ON events(event_leader_id, event_date DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_eventregistrations_volunteer
+  ON eventregistrations(volunteer_id, event_id) INCLUDE (attendance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_eventoutcomes_event
+  ON eventoutcomes(event_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedback_volunteer
+  ON feedback(volunteer_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_created_at
+  ON users(created_at DESC);
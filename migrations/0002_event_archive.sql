@@ -0,0 +1,64 @@
+-- 0002: cold storage tables and history views for completed events
+-- (same definitions as create_database.sql). The tables start empty, so
+-- everything here is quick and runs in one transaction.
+
+CREATE TABLE IF NOT EXISTS events_archive (LIKE events);
+DO $$ BEGIN
+  ALTER TABLE events_archive ADD PRIMARY KEY (event_id);
+EXCEPTION WHEN invalid_table_definition THEN NULL;
+END $$;
+ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS eventregistrations_archive (LIKE eventregistrations);
+DO $$ BEGIN
+  ALTER TABLE eventregistrations_archive ADD PRIMARY KEY (registration_id);
+EXCEPTION WHEN invalid_table_definition THEN NULL;
+END $$;
+ALTER TABLE eventregistrations_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS eventoutcomes_archive (LIKE eventoutcomes);
+DO $$ BEGIN
+  ALTER TABLE eventoutcomes_archive ADD PRIMARY KEY (outcome_id);
+EXCEPTION WHEN invalid_table_definition THEN NULL;
+END $$;
+ALTER TABLE eventoutcomes_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS feedback_archive (LIKE feedback);
+DO $$ BEGIN
+  ALTER TABLE feedback_archive ADD PRIMARY KEY (feedback_id);
+EXCEPTION WHEN invalid_table_definition THEN NULL;
+END $$;
+ALTER TABLE feedback_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_eventregistrations_archive_volunteer
+  ON eventregistrations_archive(volunteer_id, event_id) INCLUDE (attendance);
+CREATE INDEX IF NOT EXISTS idx_eventoutcomes_archive_event ON eventoutcomes_archive(event_id);
+CREATE INDEX IF NOT EXISTS idx_feedback_archive_event_volunteer ON feedback_archive(event_id, volunteer_id);
+
+-- History views: hot + archived rows, used by pages that show the past
+-- (user.my_participation, admin.reports)
+CREATE OR REPLACE VIEW events_history AS
+  SELECT event_id, event_name, location, event_date, start_time, duration,
+         event_leader_id, FALSE AS archived
+  FROM events
+  UNION ALL
+  SELECT event_id, event_name, location, event_date, start_time, duration,
+         event_leader_id, TRUE AS archived
+  FROM events_archive;
+
+CREATE OR REPLACE VIEW eventregistrations_history AS
+  SELECT registration_id, event_id, volunteer_id, registered_at, attendance FROM eventregistrations
+  UNION ALL
+  SELECT registration_id, event_id, volunteer_id, registered_at, attendance FROM eventregistrations_archive;
+
+CREATE OR REPLACE VIEW eventoutcomes_history AS
+  SELECT outcome_id, event_id, num_attendees, bags_collected, recyclables_sorted,
+         other_achievements, recorded_at FROM eventoutcomes
+  UNION ALL
+  SELECT outcome_id, event_id, num_attendees, bags_collected, recyclables_sorted,
+         other_achievements, recorded_at FROM eventoutcomes_archive;
+
+CREATE OR REPLACE VIEW feedback_history AS
+  SELECT feedback_id, event_id, volunteer_id, rating, comments, submitted_at FROM feedback
+  UNION ALL
+  SELECT feedback_id, event_id, volunteer_id, rating, comments, submitted_at FROM feedback_archive;
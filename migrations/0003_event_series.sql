@@ -0,0 +1,20 @@
+-- 0003: recurring event series (eventseries + events.series_id)
+-- Runs statement by statement: the new column is nullable without a default
+-- (no table rewrite) and the index is built CONCURRENTLY.
+-- migrate: no-transaction
+
+CREATE TABLE IF NOT EXISTS eventseries (
+  series_id SERIAL PRIMARY KEY,
+  event_leader_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  recurrence VARCHAR(20) NOT NULL CHECK (recurrence IN ('weekly', 'fortnightly', 'monthly')),
+  repeat_until DATE NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS series_id INTEGER
+  REFERENCES eventseries(series_id) ON DELETE SET NULL;
+
+ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS series_id INTEGER;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_series
+  ON events(series_id) WHERE series_id IS NOT NULL;
@@ -0,0 +1,32 @@
+-- 0004: soft-delete for cancelled events (events.status / cancelled_at)
+-- Runs statement by statement: the columns use a constant default (no table
+-- rewrite), the CHECK constraint is added NOT VALID and validated separately
+-- (no exclusive lock during the scan) and the index is built CONCURRENTLY.
+-- migrate: no-transaction
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'scheduled';
+ALTER TABLE events ADD COLUMN IF NOT EXISTS cancelled_at TIMESTAMP;
+
+DO $$ BEGIN
+  ALTER TABLE events ADD CONSTRAINT events_status_check
+    CHECK (status IN ('scheduled', 'cancelled')) NOT VALID;
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+ALTER TABLE events VALIDATE CONSTRAINT events_status_check;
+
+-- Archived rows were all held events; no default, as in create_database.sql
+ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'scheduled';
+ALTER TABLE events_archive ALTER COLUMN status DROP DEFAULT;
+ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS cancelled_at TIMESTAMP;
+
+CREATE OR REPLACE VIEW events_history AS
+  SELECT event_id, event_name, location, event_date, start_time, duration,
+         event_leader_id, FALSE AS archived, status
+  FROM events
+  UNION ALL
+  SELECT event_id, event_name, location, event_date, start_time, duration,
+         event_leader_id, TRUE AS archived, status
+  FROM events_archive;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_cancelled
+  ON events(cancelled_at) WHERE status = 'cancelled';
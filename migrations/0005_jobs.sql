@@ -0,0 +1,30 @@
+-- 0005: background job queue and report snapshots
+-- (same definitions as create_database.sql). New, empty tables only, so
+-- everything runs in one transaction.
+
+CREATE TABLE IF NOT EXISTS jobs (
+  job_id BIGSERIAL PRIMARY KEY,
+  task VARCHAR(100) NOT NULL,
+  payload JSONB NOT NULL DEFAULT '{}',
+  dedupe_key VARCHAR(100),
+  status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP,
+  finished_at TIMESTAMP,
+  duration_ms INTEGER,
+  last_error TEXT,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(run_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(started_at) WHERE status = 'running';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(task, dedupe_key) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at);
+
+CREATE TABLE IF NOT EXISTS report_snapshots (
+  name VARCHAR(50) PRIMARY KEY,
+  data JSONB NOT NULL,
+  computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,11 @@
+-- 0006: idempotency table for event reminders (same definition as
+-- create_database.sql). New, empty table, so one transaction is fine.
+
+CREATE TABLE IF NOT EXISTS reminder_sends (
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  volunteer_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  kind VARCHAR(20) NOT NULL DEFAULT 'day_before',
+  sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (event_id, volunteer_id, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_reminder_sends_volunteer ON reminder_sends(volunteer_id);
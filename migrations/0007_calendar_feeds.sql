@@ -0,0 +1,57 @@
+-- 0007: calendar feed tokens and per-user data versions, kept current by
+-- statement-level triggers (same definitions as create_database.sql).
+-- New table plus triggers; CREATE TRIGGER only takes a brief lock.
+
+CREATE TABLE IF NOT EXISTS calendar_feeds (
+  user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+  token VARCHAR(64) NOT NULL UNIQUE,
+  version BIGINT NOT NULL DEFAULT 0,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Registrations added / removed: bump those volunteers (once per statement)
+CREATE OR REPLACE FUNCTION calendar_bump_volunteers() RETURNS trigger AS $$
+BEGIN
+  UPDATE calendar_feeds f
+  SET version = f.version + 1
+  FROM (SELECT DISTINCT volunteer_id FROM changed_rows) c
+  WHERE f.user_id = c.volunteer_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Events created / changed / removed: bump their leaders and registered volunteers
+CREATE OR REPLACE FUNCTION calendar_bump_events() RETURNS trigger AS $$
+BEGIN
+  UPDATE calendar_feeds f
+  SET version = f.version + 1
+  FROM (
+    SELECT event_leader_id AS user_id FROM changed_rows
+    UNION
+    SELECT er.volunteer_id FROM eventregistrations er JOIN changed_rows c ON c.event_id = er.event_id
+  ) u
+  WHERE f.user_id = u.user_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS calendar_registrations_insert ON eventregistrations;
+CREATE TRIGGER calendar_registrations_insert AFTER INSERT ON eventregistrations
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_volunteers();
+DROP TRIGGER IF EXISTS calendar_registrations_delete ON eventregistrations;
+CREATE TRIGGER calendar_registrations_delete AFTER DELETE ON eventregistrations
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_volunteers();
+DROP TRIGGER IF EXISTS calendar_events_insert ON events;
+CREATE TRIGGER calendar_events_insert AFTER INSERT ON events
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_events();
+DROP TRIGGER IF EXISTS calendar_events_update ON events;
+CREATE TRIGGER calendar_events_update AFTER UPDATE ON events
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_events();
+DROP TRIGGER IF EXISTS calendar_events_delete ON events;
+CREATE TRIGGER calendar_events_delete AFTER DELETE ON events
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION calendar_bump_events();
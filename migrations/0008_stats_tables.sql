@@ -0,0 +1,42 @@
+-- 0008: per-event feedback and per-volunteer impact aggregates, filled from
+-- the *_history views (same definitions as create_database.sql). The
+-- backfill only reads the source tables, so writers are not blocked; run
+-- 'flask --app run rebuild-stats' after deploying the new code to pick up
+-- anything written in between.
+
+CREATE TABLE IF NOT EXISTS event_feedback_stats (
+  event_id INTEGER PRIMARY KEY,
+  rating_count INTEGER NOT NULL DEFAULT 0,
+  rating_sum INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS volunteer_stats (
+  volunteer_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+  events_attended INTEGER NOT NULL DEFAULT 0,
+  minutes_volunteered INTEGER NOT NULL DEFAULT 0,
+  bags_collected INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_volunteer_stats_minutes ON volunteer_stats(minutes_volunteered DESC);
+
+INSERT INTO event_feedback_stats (event_id, rating_count, rating_sum)
+SELECT event_id, COUNT(*), SUM(rating)
+FROM feedback_history
+GROUP BY event_id
+ON CONFLICT (event_id) DO NOTHING;
+
+INSERT INTO volunteer_stats (volunteer_id, events_attended, minutes_volunteered, bags_collected)
+SELECT er.volunteer_id, COUNT(*), SUM(e.duration), SUM(COALESCE(o.bags_collected, 0))
+FROM eventregistrations_history er
+JOIN users u ON u.user_id = er.volunteer_id
+JOIN events_history e ON e.event_id = er.event_id
+LEFT JOIN (
+  SELECT DISTINCT ON (event_id) event_id, bags_collected
+  FROM eventoutcomes_history
+  ORDER BY event_id, recorded_at DESC
+) o ON o.event_id = er.event_id
+WHERE er.attendance = 'attended'
+GROUP BY er.volunteer_id
+ON CONFLICT (volunteer_id) DO NOTHING;
@@ -0,0 +1,50 @@
+-- 0009: one outcome per event, and the outcome leaderboard
+-- (same definitions as create_database.sql).
+-- The unique index is built CONCURRENTLY so outcomes can still be recorded
+-- meanwhile; the constraint then only takes a brief lock to adopt it.
+-- migrate: no-transaction
+
+-- Duplicate outcomes would be counted twice by reports; keep the most
+-- recently recorded one for each event (NULL recorded_at counts as oldest).
+DELETE FROM eventoutcomes o
+USING eventoutcomes newer
+WHERE newer.event_id = o.event_id
+  AND (COALESCE(newer.recorded_at, '-infinity'), newer.outcome_id)
+    > (COALESCE(o.recorded_at, '-infinity'), o.outcome_id);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS eventoutcomes_event_id_key
+  ON eventoutcomes(event_id);
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'eventoutcomes_event_id_key') THEN
+    ALTER TABLE eventoutcomes
+      ADD CONSTRAINT eventoutcomes_event_id_key UNIQUE USING INDEX eventoutcomes_event_id_key;
+  END IF;
+END $$;
+
+-- Superseded by the unique constraint's index
+DROP INDEX CONCURRENTLY IF EXISTS idx_eventoutcomes_event;
+
+CREATE TABLE IF NOT EXISTS outcome_leaderboard (
+  month DATE NOT NULL,
+  location VARCHAR(255) NOT NULL,
+  event_leader_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  events_recorded INTEGER NOT NULL DEFAULT 0,
+  bags_collected INTEGER NOT NULL DEFAULT 0,
+  recyclables_sorted INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (month, location, event_leader_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_outcome_leaderboard_leader ON outcome_leaderboard(event_leader_id);
+
+INSERT INTO outcome_leaderboard
+  (location, event_leader_id, month, events_recorded, bags_collected, recyclables_sorted)
+SELECT e.location, e.event_leader_id, date_trunc('month', e.event_date)::date,
+       COUNT(*), SUM(COALESCE(o.bags_collected, 0)), SUM(COALESCE(o.recyclables_sorted, 0))
+FROM eventoutcomes_history o
+JOIN events_history e ON e.event_id = o.event_id
+JOIN users u ON u.user_id = e.event_leader_id
+GROUP BY 1, 2, 3
+ON CONFLICT (month, location, event_leader_id) DO NOTHING;
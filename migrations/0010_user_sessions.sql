@@ -0,0 +1,42 @@
+-- 0010: server-side login sessions (same definitions as create_database.sql).
+-- Cookies issued before this migration have no session_id, so those
+-- users are asked to log in again.
+
+CREATE TABLE IF NOT EXISTS user_sessions (
+  session_id VARCHAR(64) PRIMARY KEY,
+  user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  expires_at TIMESTAMP NOT NULL
+);
+
+-- Revoking every session of one user; purging expired sessions
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user ON user_sessions(user_id);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions(expires_at);
+
+-- Role / status / name changes: tell every app process to drop its cached
+-- principal (NOTIFY is delivered on commit); deactivated users are logged out
+CREATE OR REPLACE FUNCTION users_principal_changed() RETURNS trigger AS $$
+DECLARE
+  changed_user_id INTEGER;
+BEGIN
+  FOR changed_user_id IN
+    SELECT n.user_id
+    FROM new_rows n
+    JOIN old_rows o ON o.user_id = n.user_id
+    WHERE (n.username, n.full_name, n.role, n.status)
+          IS DISTINCT FROM (o.username, o.full_name, o.role, o.status)
+  LOOP
+    PERFORM pg_notify('principal_changed', changed_user_id::text);
+  END LOOP;
+
+  DELETE FROM user_sessions s
+  USING new_rows n
+  WHERE s.user_id = n.user_id AND n.status <> 'active';
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_principal_update ON users;
+CREATE TRIGGER users_principal_update AFTER UPDATE ON users
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION users_principal_changed();
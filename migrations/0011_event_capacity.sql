@@ -0,0 +1,94 @@
+-- 0011: optional event capacity with seats and a waitlist (same definitions
+-- as create_database.sql). The new column is nullable with no default, so
+-- adding it does not rewrite events; existing events stay unlimited.
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS capacity INTEGER;
+DO $$ BEGIN
+  ALTER TABLE events ADD CONSTRAINT events_capacity_check CHECK (capacity > 0);
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS capacity INTEGER;
+
+CREATE TABLE IF NOT EXISTS event_seats (
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  seat_no INTEGER NOT NULL,
+  registration_id INTEGER UNIQUE REFERENCES eventregistrations(registration_id) ON DELETE SET NULL,
+  PRIMARY KEY (event_id, seat_no)
+);
+
+-- Free seats of one event, lowest seat first
+CREATE INDEX IF NOT EXISTS idx_event_seats_free ON event_seats(event_id, seat_no) WHERE registration_id IS NULL;
+
+CREATE TABLE IF NOT EXISTS event_waitlist (
+  waitlist_id SERIAL PRIMARY KEY,
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  volunteer_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (event_id, volunteer_id)
+);
+
+-- Front of the queue of one event; a volunteer's waitlist entries (users ON DELETE CASCADE)
+CREATE INDEX IF NOT EXISTS idx_event_waitlist_queue ON event_waitlist(event_id, waitlist_id);
+CREATE INDEX IF NOT EXISTS idx_event_waitlist_volunteer ON event_waitlist(volunteer_id);
+
+-- One seat row per seat of events.capacity; refuses to drop below the seats in use
+CREATE OR REPLACE FUNCTION sync_event_seats() RETURNS trigger AS $$
+DECLARE
+  seat_count INTEGER;
+  removed INTEGER;
+BEGIN
+  IF NEW.capacity IS NULL THEN
+    DELETE FROM event_seats WHERE event_id = NEW.event_id;
+    RETURN NULL;
+  END IF;
+
+  SELECT count(*) INTO seat_count FROM event_seats WHERE event_id = NEW.event_id;
+  IF seat_count = 0 THEN
+    IF TG_OP = 'UPDATE' THEN
+      -- Wait for signups in flight (they hold KEY SHARE on this row), then
+      -- give the current registrations the first seats in signup order
+      PERFORM 1 FROM events WHERE event_id = NEW.event_id FOR UPDATE;
+      IF (SELECT count(*) FROM eventregistrations WHERE event_id = NEW.event_id) > NEW.capacity THEN
+        RAISE EXCEPTION 'Capacity % is below the number of registered volunteers', NEW.capacity
+          USING ERRCODE = 'check_violation';
+      END IF;
+    END IF;
+    INSERT INTO event_seats (event_id, seat_no, registration_id)
+    SELECT NEW.event_id, s.n, r.registration_id
+    FROM generate_series(1, NEW.capacity) AS s(n)
+    LEFT JOIN (
+      SELECT registration_id, row_number() OVER (ORDER BY registration_id) AS n
+      FROM eventregistrations
+      WHERE event_id = NEW.event_id
+    ) r ON r.n = s.n;
+  ELSIF NEW.capacity > seat_count THEN
+    INSERT INTO event_seats (event_id, seat_no)
+    SELECT NEW.event_id, m.top + s.n
+    FROM (SELECT max(seat_no) AS top FROM event_seats WHERE event_id = NEW.event_id) m,
+         generate_series(1, NEW.capacity - seat_count) AS s(n);
+  ELSIF NEW.capacity < seat_count THEN
+    DELETE FROM event_seats
+    WHERE event_id = NEW.event_id
+      AND seat_no IN (
+        SELECT seat_no FROM event_seats
+        WHERE event_id = NEW.event_id AND registration_id IS NULL
+        ORDER BY seat_no DESC
+        LIMIT seat_count - NEW.capacity
+        FOR UPDATE
+      );
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    IF removed < seat_count - NEW.capacity THEN
+      RAISE EXCEPTION 'Capacity % is below the number of registered volunteers', NEW.capacity
+        USING ERRCODE = 'check_violation';
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS events_seats_insert ON events;
+CREATE TRIGGER events_seats_insert AFTER INSERT ON events
+  FOR EACH ROW WHEN (NEW.capacity IS NOT NULL) EXECUTE FUNCTION sync_event_seats();
+DROP TRIGGER IF EXISTS events_seats_update ON events;
+CREATE TRIGGER events_seats_update AFTER UPDATE OF capacity ON events
+  FOR EACH ROW WHEN (OLD.capacity IS DISTINCT FROM NEW.capacity) EXECUTE FUNCTION sync_event_seats();
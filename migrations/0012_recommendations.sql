@@ -0,0 +1,134 @@
+-- 0012: tag index and precomputed interest-based recommendations (same
+-- definitions as create_database.sql), then the index is filled in for the
+-- existing users and events. Safe to rerun: the backfill replaces it.
+
+CREATE TABLE IF NOT EXISTS user_tags (
+  user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  tag TEXT NOT NULL,
+  PRIMARY KEY (user_id, tag)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_tags_tag ON user_tags(tag);
+
+CREATE TABLE IF NOT EXISTS event_tags (
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  tag TEXT NOT NULL,
+  weight SMALLINT NOT NULL, -- 2 when the tag is in the event name, otherwise 1
+  PRIMARY KEY (event_id, tag)
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_tags_tag ON event_tags(tag);
+
+CREATE TABLE IF NOT EXISTS event_recommendations (
+  volunteer_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  event_id INTEGER NOT NULL REFERENCES events(event_id) ON DELETE CASCADE,
+  score INTEGER NOT NULL,
+  PRIMARY KEY (volunteer_id, event_id)
+);
+
+-- A volunteer's best matches first; rescoring one event (events ON DELETE CASCADE)
+CREATE INDEX IF NOT EXISTS idx_event_recommendations_score ON event_recommendations(volunteer_id, score DESC, event_id);
+CREATE INDEX IF NOT EXISTS idx_event_recommendations_event ON event_recommendations(event_id);
+
+-- Word stems of free text; 'clean-up' and 'cleanups' both become 'cleanup'
+CREATE OR REPLACE FUNCTION text_tags(txt TEXT) RETURNS SETOF TEXT AS $$
+  SELECT lexeme
+  FROM unnest(to_tsvector('english', regexp_replace(coalesce(txt, ''), '(\w)-(\w)', '\1\2', 'g')))
+  WHERE lexeme ~ '^[a-z]{3,}$'
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION event_text_tags(event_name TEXT, location TEXT, description TEXT)
+RETURNS TABLE (tag TEXT, weight SMALLINT) AS $$
+  SELECT t.tag, max(t.weight)::SMALLINT
+  FROM (
+    SELECT text_tags(event_name) AS tag, 2 AS weight
+    UNION ALL
+    SELECT text_tags(location || ' ' || coalesce(description, '')), 1
+  ) t
+  GROUP BY t.tag
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION users_refresh_tags() RETURNS trigger AS $$
+BEGIN
+  DELETE FROM user_tags WHERE user_id = NEW.user_id;
+  INSERT INTO user_tags (user_id, tag)
+  SELECT DISTINCT NEW.user_id, t FROM text_tags(NEW.environmental_interests) t;
+
+  DELETE FROM event_recommendations WHERE volunteer_id = NEW.user_id;
+  INSERT INTO event_recommendations (volunteer_id, event_id, score)
+  SELECT NEW.user_id, et.event_id, sum(et.weight)
+  FROM user_tags ut
+  JOIN event_tags et ON et.tag = ut.tag
+  JOIN events e ON e.event_id = et.event_id
+  WHERE ut.user_id = NEW.user_id
+    AND e.status = 'scheduled'
+    AND e.event_date >= CURRENT_DATE
+  GROUP BY et.event_id
+  ON CONFLICT (volunteer_id, event_id) DO UPDATE SET score = EXCLUDED.score;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_tags_insert ON users;
+CREATE TRIGGER users_tags_insert AFTER INSERT ON users
+  FOR EACH ROW WHEN (NEW.environmental_interests IS NOT NULL) EXECUTE FUNCTION users_refresh_tags();
+DROP TRIGGER IF EXISTS users_tags_update ON users;
+CREATE TRIGGER users_tags_update AFTER UPDATE OF environmental_interests ON users
+  FOR EACH ROW WHEN (OLD.environmental_interests IS DISTINCT FROM NEW.environmental_interests)
+  EXECUTE FUNCTION users_refresh_tags();
+
+CREATE OR REPLACE FUNCTION events_refresh_tags() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT'
+     OR (OLD.event_name, OLD.location, OLD.description)
+        IS DISTINCT FROM (NEW.event_name, NEW.location, NEW.description) THEN
+    DELETE FROM event_tags WHERE event_id = NEW.event_id;
+    INSERT INTO event_tags (event_id, tag, weight)
+    SELECT NEW.event_id, t.tag, t.weight
+    FROM event_text_tags(NEW.event_name, NEW.location, NEW.description) t;
+  END IF;
+
+  DELETE FROM event_recommendations WHERE event_id = NEW.event_id;
+  IF NEW.status = 'scheduled' AND NEW.event_date >= CURRENT_DATE THEN
+    INSERT INTO event_recommendations (volunteer_id, event_id, score)
+    SELECT ut.user_id, NEW.event_id, sum(et.weight)
+    FROM event_tags et
+    JOIN user_tags ut ON ut.tag = et.tag
+    WHERE et.event_id = NEW.event_id
+    GROUP BY ut.user_id
+    ON CONFLICT (volunteer_id, event_id) DO UPDATE SET score = EXCLUDED.score;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS events_tags_insert ON events;
+CREATE TRIGGER events_tags_insert AFTER INSERT ON events
+  FOR EACH ROW EXECUTE FUNCTION events_refresh_tags();
+DROP TRIGGER IF EXISTS events_tags_update ON events;
+CREATE TRIGGER events_tags_update AFTER UPDATE OF event_name, location, description, status, event_date ON events
+  FOR EACH ROW
+  WHEN ((OLD.event_name, OLD.location, OLD.description, OLD.status, OLD.event_date)
+        IS DISTINCT FROM (NEW.event_name, NEW.location, NEW.description, NEW.status, NEW.event_date))
+  EXECUTE FUNCTION events_refresh_tags();
+
+-- Backfill (what `flask --app run rebuild-recommendations` does)
+DELETE FROM user_tags;
+INSERT INTO user_tags (user_id, tag)
+SELECT DISTINCT u.user_id, t
+FROM users u, text_tags(u.environmental_interests) t;
+
+DELETE FROM event_tags;
+INSERT INTO event_tags (event_id, tag, weight)
+SELECT e.event_id, t.tag, t.weight
+FROM events e, event_text_tags(e.event_name, e.location, e.description) t;
+
+DELETE FROM event_recommendations;
+INSERT INTO event_recommendations (volunteer_id, event_id, score)
+SELECT ut.user_id, et.event_id, sum(et.weight)
+FROM event_tags et
+JOIN user_tags ut ON ut.tag = et.tag
+JOIN events e ON e.event_id = et.event_id
+WHERE e.status = 'scheduled'
+  AND e.event_date >= CURRENT_DATE
+GROUP BY ut.user_id, et.event_id;
@@ -0,0 +1,6 @@
+-- 0013: heartbeat of running jobs (same definition as create_database.sql).
+-- The column is nullable with no default, so adding it does not rewrite
+-- jobs; jobs already running are judged by started_at until their next
+-- heartbeat.
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
@@ -0,0 +1,8 @@
+-- 0014: reminder claims with a lease (same definition as create_database.sql).
+-- A row is now written when a dispatcher claims a reminder and sent_at is set
+-- once the message is out, so a claim left by a crashed dispatcher is taken
+-- over after the lease. The constant default does not rewrite the table;
+-- existing rows keep their sent_at and count as sent.
+
+ALTER TABLE reminder_sends ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE reminder_sends ALTER COLUMN sent_at DROP DEFAULT;
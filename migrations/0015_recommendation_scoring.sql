@@ -0,0 +1,70 @@
+-- 0015: only volunteers are tagged and scored, and new or edited events are
+-- scored by the score_events job instead of a per-row trigger (same
+-- definitions as create_database.sql). Leaders' and admins' tags and scores
+-- are removed. Safe to rerun.
+
+CREATE OR REPLACE FUNCTION users_refresh_tags() RETURNS trigger AS $$
+BEGIN
+  DELETE FROM user_tags WHERE user_id = NEW.user_id;
+  DELETE FROM event_recommendations WHERE volunteer_id = NEW.user_id;
+  -- Only volunteers are shown suggestions
+  IF NEW.role <> 'volunteer' THEN
+    RETURN NULL;
+  END IF;
+
+  INSERT INTO user_tags (user_id, tag)
+  SELECT DISTINCT NEW.user_id, t FROM text_tags(NEW.environmental_interests) t;
+
+  INSERT INTO event_recommendations (volunteer_id, event_id, score)
+  SELECT NEW.user_id, et.event_id, sum(et.weight)
+  FROM user_tags ut
+  JOIN event_tags et ON et.tag = ut.tag
+  JOIN events e ON e.event_id = et.event_id
+  WHERE ut.user_id = NEW.user_id
+    AND e.status = 'scheduled'
+    AND e.event_date >= CURRENT_DATE
+  GROUP BY et.event_id
+  ON CONFLICT (volunteer_id, event_id) DO UPDATE SET score = EXCLUDED.score;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_tags_insert ON users;
+CREATE TRIGGER users_tags_insert AFTER INSERT ON users
+  FOR EACH ROW WHEN (NEW.environmental_interests IS NOT NULL AND NEW.role = 'volunteer')
+  EXECUTE FUNCTION users_refresh_tags();
+DROP TRIGGER IF EXISTS users_tags_update ON users;
+CREATE TRIGGER users_tags_update AFTER UPDATE OF environmental_interests, role ON users
+  FOR EACH ROW
+  WHEN ((OLD.environmental_interests, OLD.role) IS DISTINCT FROM (NEW.environmental_interests, NEW.role))
+  EXECUTE FUNCTION users_refresh_tags();
+
+-- Tags only: scoring an event against every volunteer is left to the
+-- score_events job the routes queue (see loginapp/recommendations.py)
+CREATE OR REPLACE FUNCTION events_refresh_tags() RETURNS trigger AS $$
+BEGIN
+  DELETE FROM event_tags WHERE event_id = NEW.event_id;
+  INSERT INTO event_tags (event_id, tag, weight)
+  SELECT NEW.event_id, t.tag, t.weight
+  FROM event_text_tags(NEW.event_name, NEW.location, NEW.description) t;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS events_tags_insert ON events;
+CREATE TRIGGER events_tags_insert AFTER INSERT ON events
+  FOR EACH ROW EXECUTE FUNCTION events_refresh_tags();
+DROP TRIGGER IF EXISTS events_tags_update ON events;
+CREATE TRIGGER events_tags_update AFTER UPDATE OF event_name, location, description ON events
+  FOR EACH ROW
+  WHEN ((OLD.event_name, OLD.location, OLD.description)
+        IS DISTINCT FROM (NEW.event_name, NEW.location, NEW.description))
+  EXECUTE FUNCTION events_refresh_tags();
+
+DELETE FROM event_recommendations r
+USING users u
+WHERE u.user_id = r.volunteer_id AND u.role <> 'volunteer';
+
+DELETE FROM user_tags t
+USING users u
+WHERE u.user_id = t.user_id AND u.role <> 'volunteer';
@@ -134,3 +134,37 @@ VALUES
 (10,19,4,'Huge turnout, very satisfying.', NOW()-INTERVAL'11 days'),
 (11,1,5,'Kids had a blast!', NOW()-INTERVAL'12 days'),
 (12,2,5,'Port Hills never disappoints.', NOW()-INTERVAL'13 days');
+
+-- ======================
+-- 6. AGGREGATES (kept up to date by the app from here on)
+-- ======================
+INSERT INTO event_feedback_stats (event_id, rating_count, rating_sum)
+SELECT event_id, COUNT(*), SUM(rating)
+FROM feedback
+GROUP BY event_id;
+
+INSERT INTO volunteer_stats (volunteer_id, events_attended, minutes_volunteered, bags_collected)
+SELECT er.volunteer_id, COUNT(*), SUM(e.duration), SUM(COALESCE(o.bags_collected, 0))
+FROM eventregistrations er
+JOIN events e ON e.event_id = er.event_id
+LEFT JOIN eventoutcomes o ON o.event_id = er.event_id
+WHERE er.attendance = 'attended'
+GROUP BY er.volunteer_id;
+
+INSERT INTO outcome_leaderboard
+  (location, event_leader_id, month, events_recorded, bags_collected, recyclables_sorted)
+SELECT e.location, e.event_leader_id, date_trunc('month', e.event_date)::date,
+       COUNT(*), SUM(COALESCE(o.bags_collected, 0)), SUM(COALESCE(o.recyclables_sorted, 0))
+FROM eventoutcomes o
+JOIN events e ON e.event_id = o.event_id
+GROUP BY 1, 2, 3;
+
+-- Recommendations for upcoming events (new events are scored by a background job)
+INSERT INTO event_recommendations (volunteer_id, event_id, score)
+SELECT ut.user_id, et.event_id, sum(et.weight)
+FROM event_tags et
+JOIN user_tags ut ON ut.tag = et.tag
+JOIN events e ON e.event_id = et.event_id
+WHERE e.status = 'scheduled'
+  AND e.event_date >= CURRENT_DATE
+GROUP BY ut.user_id, et.event_id;
@@ -0,0 +1,143 @@
+"""
+tests/test_query_plans.py - EXPLAIN checks for the queries behind each page
+
+Runs EXPLAIN for the route queries against a seeded database and fails when a
+table is read with a sequential scan, or when a query does not use the index
+it was given. Point QUERY_PLAN_DSN at a database built from create_database.sql
+and populate_database.sql (or migrated with migrate.py); without it the tests
+are skipped:
+
+    QUERY_PLAN_DSN="dbname=ecocleanup_test" python -m pytest tests/test_query_plans.py
+
+The sample data is small enough that PostgreSQL would rightly scan every table,
+so each EXPLAIN runs with enable_seqscan off: a Seq Scan that is still chosen
+means no index can serve the query.
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from loginapp import HOME_UPCOMING
+from loginapp.recommendations import RECOMMENDED_EVENTS
+from loginapp.routes import leader
+from loginapp.routes.admin import USER_LIST, USER_SEARCH
+from loginapp.routes.auth import LOGIN_USER
+from loginapp.routes.calendar_feed import LEADER_FEED_QUERY
+from loginapp.routes.events import CONFLICT_CHECK, LIST_EVENTS, USER_EVENT_FLAGS, upcoming_events_query
+from loginapp.routes.user import PARTICIPATION_QUERY
+
+DSN = os.environ.get('QUERY_PLAN_DSN')
+
+pytestmark = pytest.mark.skipif(not DSN, reason='QUERY_PLAN_DSN is not set')
+
+
+# Sample ids: the busiest volunteer, leader and event of the seeded data
+SAMPLE_IDS = """
+    SELECT (SELECT volunteer_id FROM eventregistrations
+            GROUP BY volunteer_id ORDER BY count(*) DESC, volunteer_id LIMIT 1),
+           (SELECT event_leader_id FROM events
+            GROUP BY event_leader_id ORDER BY count(*) DESC, event_leader_id LIMIT 1),
+           (SELECT event_id FROM eventregistrations
+            GROUP BY event_id ORDER BY count(*) DESC, event_id LIMIT 1),
+           (SELECT username FROM users ORDER BY user_id LIMIT 1)
+"""
+
+
+def _list_events(by_location, by_date):
+    def params(ids):
+        return upcoming_events_query(ids['volunteer'], 'park' if by_location else '',
+                                     date.today().isoformat() if by_date else '')[1]
+    return LIST_EVENTS[by_location, by_date].sql, params
+
+
+# (name, query, params(ids), indexes the plan must use, tables it may scan)
+# Tables that may be scanned are read in full by design (every row is shown).
+QUERIES = [
+    ('login', LOGIN_USER.sql, lambda ids: (ids['username'],), {'users_username_key'}, set()),
+    ('home_upcoming', HOME_UPCOMING.sql, lambda ids: (ids['volunteer'],),
+     {'idx_eventregistrations_volunteer'}, set()),
+    # Either the score index or the primary key serves it, depending on how many scores there are
+    ('recommended_events', RECOMMENDED_EVENTS.sql, lambda ids: (ids['volunteer'], 5), set(), set()),
+    *[(f'list_events{"_location" * loc}{"_date" * day}', *_list_events(loc, day),
+       {'idx_events_date_time'}, set())
+      for loc in (False, True) for day in (False, True)],
+    ('user_event_flags', USER_EVENT_FLAGS.sql, lambda ids: (ids['volunteer'], ids['volunteer']),
+     {'idx_eventregistrations_volunteer', 'idx_event_waitlist_volunteer'}, set()),
+    ('registration_conflict', CONFLICT_CHECK.sql,
+     lambda ids: (ids['volunteer'], date.today(), '10:00', 120, '10:00'),
+     {'idx_eventregistrations_volunteer'}, set()),
+    ('my_participation', PARTICIPATION_QUERY + " ORDER BY e.event_date DESC", lambda ids: (ids['volunteer'],),
+     {'idx_eventregistrations_volunteer', 'idx_eventregistrations_archive_volunteer'}, set()),
+    ('leader_my_events', leader.MY_EVENTS + " WHERE e.event_leader_id = %s ORDER BY e.event_date DESC",
+     lambda ids: (ids['leader'],), {'idx_events_leader_date'}, set()),
+    ('admin_my_events', leader.MY_EVENTS + " ORDER BY e.event_date DESC", lambda ids: (),
+     set(), {'events'}),
+    ('event_detail', leader.EVENT_DETAIL.format(select='e.*, u.full_name AS leader_name'),
+     lambda ids: (ids['event'],), {'events_pkey', 'users_pkey'}, set()),
+    ('event_registrations', leader.EVENT_REGISTRATIONS, lambda ids: (ids['event'],),
+     {'eventregistrations_event_id_volunteer_id_key'}, set()),
+    ('event_outcome', leader.EVENT_OUTCOME, lambda ids: (ids['event'],),
+     {'eventoutcomes_event_id_key'}, set()),
+    ('event_feedback', leader.EVENT_FEEDBACK, lambda ids: (ids['event'],),
+     {'event_feedback_stats_pkey'}, set()),
+    ('event_waitlist', leader.EVENT_WAITLIST, lambda ids: (ids['event'],),
+     {'idx_event_waitlist_queue'}, set()),
+    ('calendar_feed', LEADER_FEED_QUERY + " ORDER BY e.event_date", lambda ids: (ids['leader'],),
+     {'idx_events_leader_date'}, set()),
+    ('manage_users', USER_LIST + " ORDER BY created_at DESC", lambda ids: (),
+     {'idx_users_created_at'}, set()),
+    # ILIKE '%term%' cannot use a btree index; the search reads every user
+    ('manage_users_search', USER_LIST + USER_SEARCH + " ORDER BY created_at DESC",
+     lambda ids: ('%vol%',) * 3, set(), {'users'}),
+]
+
+
+@pytest.fixture(scope='module')
+def conn():
+    conn = psycopg2.connect(DSN)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope='module')
+def ids(conn):
+    with conn.cursor() as cur:
+        cur.execute(SAMPLE_IDS)
+        volunteer, leader_id, event, username = cur.fetchone()
+    conn.rollback()
+    if None in (volunteer, leader_id, event):
+        pytest.skip('the database has no sample registrations')
+    return {'volunteer': volunteer, 'leader': leader_id, 'event': event, 'username': username}
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from _nodes(child)
+
+
+def explain(conn, query, params):
+    """The JSON plan's nodes for query, planned with sequential scans disabled"""
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cur.fetchone()[0][0]['Plan']
+    conn.rollback()
+    return list(_nodes(plan))
+
+
+@pytest.mark.parametrize('name, query, params, indexes, may_scan', QUERIES, ids=[q[0] for q in QUERIES])
+def test_query_plan(conn, ids, name, query, params, indexes, may_scan):
+    nodes = explain(conn, query, params(ids))
+    scanned = {n['Relation Name'] for n in nodes if n['Node Type'] == 'Seq Scan'}
+    used = {n['Index Name'] for n in nodes if 'Index Name' in n}
+
+    assert scanned <= may_scan, f"{name}: sequential scan of {', '.join(sorted(scanned - may_scan))}"
+    assert indexes <= used, f"{name}: does not use {', '.join(sorted(indexes - used))} (uses {sorted(used)})"